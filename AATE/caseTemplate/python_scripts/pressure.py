@@ -14,12 +14,9 @@ os.chdir('..')
 # Load experimental data
 expdata = pd.read_csv('constant/expData/expData.txt', sep='\t', header=None, names=['CrankAngle', 'Psce_avg'])
 
-# Load OpenFOAM data
-fo_file = Path("postProcessing/pTAvg_chamber/0/volFieldValue.dat")
-data = fo.load_data(fo_file, append=True, latest=True, verbose=False)
-data['Cycle'] = (data['Time'] - 360) // 720
-data.loc[data['Cycle'] < 0, 'Cycle'] = 0
-grouped_df = data.groupby('Cycle')
+# Load OpenFOAM data, resampled per cycle onto a common CAD grid
+data = fo.load_data(Path("postProcessing/pTAvg_chamber"), append=True, latest=True, verbose=False)
+ensemble = fo.cycle_ensemble(data, 'volAverage(p)', repeat=720, start=-360, resolution=0.1)
 
 # Initialize plot
 fig, ax = plt.subplots(figsize=(4, 4))
@@ -27,21 +24,14 @@ fig, ax = plt.subplots(figsize=(4, 4))
 # Plot experimental data
 ax.plot(expdata['CrankAngle'] + 360, expdata['Psce_avg'] / 101325, alpha=0.5, color='k', label='Experiment')
 
-label_added = False  # Flag variable to track label addition
-color = plt.cm.rainbow(np.linspace(0, 1, 10))
-pmin = float('inf')  # Initialize pmin with infinity
-n_cycle = 0
-
 # Plot OpenFOAM data
-for cycle, data_cycle in grouped_df:
-    label = os.path.basename(os.getcwd()) if not label_added else ""
-    label_added = True
-    ax.plot(data_cycle['Time'] - 720 * cycle, data_cycle['volAverage(p)'] / 101325,
-            alpha=0.5, color=color[int(cycle)], linestyle='dashed', label=label)
-
-    deltap = np.abs(np.max(data_cycle['volAverage(p)']) - np.max(expdata['Psce_avg']))
-    pmin = min(pmin, deltap)
-    n_cycle = cycle
+ax.set_prop_cycle(color=plt.cm.rainbow(np.linspace(0, 1, 10)))
+lines = ax.plot(ensemble.cad, ensemble.values.T / 101325, alpha=0.5, linestyle='dashed')
+lines[0].set_label(os.path.basename(os.getcwd()))
+
+peaks, _ = ensemble.peaks()
+pmin = np.nanmin(np.abs(peaks - np.max(expdata['Psce_avg'])))
+n_cycle = ensemble.cycles[-1]
 
 # Set plot attributes
 ax.set_xlabel('CAD')
@@ -21,14 +21,15 @@ fig.subplots_adjust(right=0.75)
 ax2 = ax.twinx()
 ax3 = ax.twinx()
 ax3.spines['left'].set_position(('axes', 1.15))
+# Load all function object data of the case concurrently
+case = fo.load_case('.', objects=['userTimeStep', 'cpuTime', 'maxCo', 'multiValveEngineState'])
+
 # Load deltaT data
-FO_FILE = Path("postProcessing/userTimeStep/0/userTimeStep.dat")
-data = fo.load_data(FO_FILE, append=True, latest=True, verbose=False)
+data = case['userTimeStep']
 p1 = ax.plot(data.Time, data.deltaT, alpha=0.5, linewidth=0.8, color='b', label='deltaT')
 
 # Load CPU time data
-FO_FILE = Path("postProcessing/cpuTime/0/time.dat")
-data = fo.load_data(FO_FILE, append=True, latest=True, verbose=False)
+data = case['cpuTime']
 cpu = np.diff(data.cpu)
 cpu[cpu < 0] = 0.0
 cputime = datetime.timedelta(seconds=np.sum(cpu))
@@ -36,15 +37,11 @@ print(f"Total CPU time is: {cputime} at {np.max(data.Time)} CAD!")
 print(f"This is roughly {cputime / (np.max(data.Time) - np.min(data.Time)) * 720} hours per cycle")
 
 # Load max(Co) data
-FO_FILE = Path("postProcessing/maxCo/0/volFieldValue.dat")
-data = fo.load_data(FO_FILE, append=True, latest=True, verbose=False)
+data = case['maxCo']
 p2 = ax2.plot(data.Time, data['max(Co)'], alpha=0.5, linewidth=0.8, color='r', label='Max Co')
 
 # Load valve lift data
-FO_FILE = "postProcessing/multiValveEngineState/0/multiValveEngineState.dat"
-df = pd.read_csv(FO_FILE, skiprows=1, sep='\t')
-df.columns = df.columns.str.strip()
-df = df.rename(columns={'# Time': 'Time'})
+df = case['multiValveEngineState']
 
 p3 = ax3.plot(df['Time'], df['exhaustValve lift'] * 1e3, alpha=0.8, linewidth=0.5, color='k')
 ax3.plot(df['Time'], df['intakeValve lift'] * 1e3, alpha=0.8, linewidth=0.5, color='k')
@@ -1,11 +1,16 @@
+import hashlib
+import json
 import sys
-import numpy as np
+from collections import OrderedDict
+from pathlib import Path
 
-from scipy.spatial import cKDTree
+import numpy as np
 
 from pyaate.engine import injectors
+from pyaate.engine import snapshot
 from pyaate.engine import units
 from pyaate.engine import valves
+from pyaate.meshing import surfaces as surf
 """
 Class structure: Engine, inheriting different types w/o injectors and sparks.
 
@@ -13,6 +18,50 @@ Notes
 - You can have engines without injectors --> class inheritance must be utilised
 """
 
+# Smaller kinematics queries are always evaluated, see Engine.enable_kinematics_cache()
+_MIN_CACHED_SIZE = 1024
+_KINEMATICS = ('position', 'position_from_tdc', 'velocity', 'acceleration', 'volume', 'dvolume')
+
+
+def _object_state(obj, skip=()):
+    """
+    Split the attributes of an object to json-serializable values and numpy arrays.
+    Paths are stored as strings. Attributes of other types are not supported
+    and must be listed in skip (to be restored separately).
+    """
+    attrs = {}
+    arrays = {}
+    for key, value in vars(obj).items():
+        if(key in skip):
+            continue
+        if(isinstance(value, np.ndarray) and value.dtype != object):
+            arrays[key] = value
+            continue
+        if(isinstance(value, np.generic)):
+            value = value.item()
+        elif(isinstance(value, Path)):
+            value = str(value)
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            raise ValueError("Unable to save " + type(obj).__name__ + "." + key + " of type " +
+                             type(value).__name__ + " to a snapshot.")
+        attrs[key] = value
+    return attrs, arrays
+
+
+def _restore_object(cls, attrs, arrays, prefix):
+    """
+    Create an object of class cls from its stored attributes without __init__.
+    """
+    obj = cls.__new__(cls)
+    obj.__dict__.update(attrs)
+    for name, array in arrays.items():
+        if(name.startswith(prefix)):
+            setattr(obj, name[len(prefix):], array)
+    return obj
+
+
 class Engine:
     """
     Class representing the general properties of an any engine.
@@ -31,6 +80,9 @@ class Engine:
         self.compression_ratio = engine_dict['compressionRatio']
         self.rpm = engine_dict['rpm']
         self.valves = valves.ValveSet(valves_dict)
+        self._kinematics_cache = None
+        self._kinematics_cache_size = 0
+        self.surfaces = None
         units.check_length_unit(self.unit_length)
 
         if(self.connecting_rod_length <= 0):
@@ -41,8 +93,17 @@ class Engine:
             raise ValueError("Stroke must be positive.")
         if(self.rpm <= 0):
             raise ValueError("RPM must be positive.")
-        if(self.compression_ratio <= 0):
-            raise ValueError("Compression ratio must be positive.")
+        if(self.compression_ratio <= 1.0):
+            raise ValueError("Compression ratio must be greater than one.")
+        if(self.static_clearance is None):
+            pass
+        elif(self.static_clearance < 0):
+            raise ValueError("Static clearance must be non-negative.")
+        elif(self.piston_area() * self.static_clearance > self.clearance_volume() * (1.0 + 1e-12)):
+            print("Warning: Static clearance " + repr(self.static_clearance) + " exceeds the " +
+                  "clearance height of the compression ratio " +
+                  repr(self.clearance_volume() / self.piston_area()) + ", cylinder volumes " +
+                  "are smaller than piston_area() * piston_position().")
 
     def piston_pos_from_tdc(self, cad):
         """
@@ -53,6 +114,9 @@ class Engine:
         Return:
             pos: position from TDC
         """
+        return self._cached_quantity('position_from_tdc', cad, self._exact_pos_from_tdc)
+
+    def _exact_pos_from_tdc(self, cad):
         theta = np.deg2rad(cad)
         # - r: position from the crank center
         r = self.stroke * np.cos(theta) / 2.0 + np.sqrt(
@@ -76,26 +140,223 @@ class Engine:
         return pos
 
 
-    def piston_velocity(self, cad, dcad=1e-6):
+    def _geometry_key(self):
+        return (self.connecting_rod_length, self.stroke, self.bore, self.static_clearance,
+                self.compression_ratio, self.rpm)
+
+    def enable_kinematics_cache(self, size=8):
         """
-        Return piston velocity by finite difference estimate.
+        Keep the kinematic quantities of the last queried CAD arrays in memory,
+        so that repeated queries of the same crank angles (e.g. the CAD range of
+        a case in a post-processing script) are not evaluated again.
+        Note that this is a result cache, not a tabulation of the kinematics on
+        a uniform CAD grid: interpolation from such a table was measured to be no
+        faster than the vectorized closed-form evaluation. Only a CAD array equal
+        to a previous query is a hit, whereas e.g. a shifted CAD range is
+        evaluated (and cached) again. The entries are keyed by the engine geometry
+        and a hash of the CAD array, each quantity is evaluated only when it is
+        first requested, and the returned values are exact copies.
+        Queries of less than 1024 crank angles (_MIN_CACHED_SIZE) bypass the
+        cache, since their evaluation is cheaper than the lookup.
+        Input:
+            size: number of cached CAD arrays (least recently used are dropped).
+        """
+        if(size < 1):
+            raise ValueError("Kinematics cache size must be positive.")
+        self._kinematics_cache = OrderedDict()
+        self._kinematics_cache_size = int(size)
+
+    def disable_kinematics_cache(self):
+        """
+        Evaluate all kinematics queries again and release the cache.
+        """
+        self._kinematics_cache = None
+        self._kinematics_cache_size = 0
+
+    def _cache_entry(self, cad):
+        """
+        Return the cache entry {quantity: array} of a large CAD query (created
+        empty on a cache miss), or None if the cache is disabled or the query small.
+        """
+        if(self._kinematics_cache is None or np.size(cad) < _MIN_CACHED_SIZE):
+            return None
+        cad = np.ascontiguousarray(cad, dtype=float)
+        key = (self._geometry_key(), cad.shape, hashlib.sha1(cad).hexdigest())
+        cache = self._kinematics_cache
+        if(key in cache):
+            cache.move_to_end(key)
+            return cache[key]
+        entry = {}
+        cache[key] = entry
+        while(len(cache) > self._kinematics_cache_size):
+            cache.popitem(last=False)
+        return entry
+
+    def _cached_quantity(self, name, cad, evaluate):
+        """
+        Return a kinematic quantity from the cache, evaluated by evaluate(cad)
+        only when not cached (or caching is not applicable).
+        """
+        entry = self._cache_entry(cad)
+        if(entry is None):
+            return evaluate(cad)
+        if(name not in entry):
+            entry[name] = evaluate(np.asarray(cad, dtype=float))
+        return entry[name].copy()
+
+    def _crank_terms(self, cad):
+        """
+        Trigonometric terms of the crank-slider mechanism shared by the kinematic
+        quantities: sin(theta), cos(theta) and the connecting rod projection
+        sqrt(l^2 - (stroke / 2 * sin(theta))^2).
+        """
+        theta = np.deg2rad(np.asarray(cad, dtype=float))
+        sin = np.sin(theta)
+        cos = np.cos(theta)
+        root = np.sqrt(np.square(self.connecting_rod_length) - np.square(self.stroke * sin / 2.0))
+        return sin, cos, root
+
+    def _dpos_dtheta(self, sin, cos, root):
+        """
+        Derivative of the piston position from TDC w.r.t. crank angle [length/rad].
+        """
+        a = self.stroke / 2.0
+        return a * sin * (1.0 + a * cos / root)
+
+    def kinematics(self, cad):
+        """
+        Closed-form piston kinematics and cylinder volume evaluated in one
+        vectorized pass, sharing the trigonometric terms.
+        Input:
+            cad: crank angle (float or array)
+        Return:
+            dictionary of arrays:
+                position: piston position from the cylinder head (as piston_position)
+                position_from_tdc: piston position from TDC
+                velocity: piston velocity [length/s], positive towards BDC
+                acceleration: piston acceleration [length/s^2]
+                volume: cylinder volume [length^3], see cylinder_volume()
+                dvolume: volume derivative w.r.t. crank angle [length^3/deg]
+            With enable_kinematics_cache(), repeated queries are served from the cache.
+        """
+        entry = self._cache_entry(cad)
+        if(entry is None):
+            return self._exact_kinematics(cad)
+        if(len(entry) < len(_KINEMATICS)):
+            entry.update(self._exact_kinematics(np.asarray(cad, dtype=float)))
+        return {name: entry[name].copy() for name in _KINEMATICS}
+
+    def _exact_kinematics(self, cad):
+        sin, cos, root = self._crank_terms(cad)
+        a = self.stroke / 2.0
+        omega = np.deg2rad(units.sec_to_deg(1.0, self.rpm))
+        area = self.piston_area()
+
+        pos_from_tdc = self.connecting_rod_length + a - (a * cos + root)
+        dpos = self._dpos_dtheta(sin, cos, root)
+        d2pos = (a * cos + np.square(a) * (np.square(cos) - np.square(sin)) / root +
+                 a ** 4 * np.square(sin * cos) / root ** 3)
+        return {
+            'position': pos_from_tdc + self.static_clearance,
+            'position_from_tdc': pos_from_tdc,
+            'velocity': dpos * omega,
+            'acceleration': d2pos * omega ** 2,
+            'volume': self.clearance_volume() + area * pos_from_tdc,
+            'dvolume': area * np.deg2rad(dpos),
+        }
+
+    def piston_area(self):
+        """
+        Return piston (bore) cross-sectional area.
+        """
+        return np.pi * np.square(self.bore) / 4.0
+
+    def clearance_volume(self):
+        """
+        Return cylinder volume at TDC according to the compression ratio. It
+        includes the piston-head gap of static_clearance and the remaining volume
+        at TDC (e.g. piston bowl and valve recesses), see cylinder_volume().
+        """
+        if(self.compression_ratio <= 1.0):
+            raise ValueError("Compression ratio must be greater than one.")
+        return self.piston_area() * self.stroke / (self.compression_ratio - 1.0)
+
+    def cylinder_volume(self, cad):
+        """
+        Return cylinder volume V = V_c + A * x(cad), where the clearance volume V_c
+        follows from the compression ratio and x is the position from TDC.
+        Equivalently V = A * piston_position(cad) + V_c - A * static_clearance,
+        where the last terms are the volume at TDC outside of the piston-head gap
+        (e.g. piston bowl). A warning is given on construction if it is negative,
+        i.e. static_clearance and the compression ratio disagree.
+        Input:
+            cad: crank angle
+        Return:
+            V: cylinder volume [length^3]
+        """
+        return self._cached_quantity('volume', cad, lambda cad: self.clearance_volume() +
+                                     self.piston_area() * self._exact_pos_from_tdc(cad))
+
+    def volume_derivative(self, cad):
+        """
+        Return the closed-form derivative of the cylinder volume dV/dCAD [length^3/deg].
+        """
+        return self._cached_quantity('dvolume', cad, lambda cad: self.piston_area() *
+                                     np.deg2rad(self._dpos_dtheta(*self._crank_terms(cad))))
+
+    def piston_velocity(self, cad, dcad=None):
+        """
+        Return piston velocity from the closed-form crank-slider derivative.
         Input:
             cad: crank angle
+            dcad: deprecated and ignored, formerly the finite difference step
+                of the velocity estimate.
         Return:
             v: velocity magnitude (>=0 m/s)
         """
-        pos0 = self.piston_position(cad)
-        pos1 = self.piston_position(cad + dcad)
-        dt = units.deg_to_sec(dcad, self.rpm)
-        v = np.abs(pos0 - pos1) / np.abs(dt)
-        return v
+        omega = np.deg2rad(units.sec_to_deg(1.0, self.rpm))
+        return np.abs(self._cached_quantity('velocity', cad, lambda cad: omega *
+                                            self._dpos_dtheta(*self._crank_terms(cad))))
+
+    def piston_acceleration(self, cad):
+        """
+        Return piston acceleration [length/s^2], positive towards BDC.
+        """
+        return self.kinematics(cad)['acceleration']
 
     def is_compressing(self, cad):
-        dt = 1e-4
-        pos1 = self.piston_position(cad)
-        pos2 = self.piston_position(cad + dt)
-        return (pos2 - pos1 < 0.0)
+        """
+        Return True when the piston moves towards the cylinder head. At the dead
+        centers, the direction of the following motion is used.
+        """
+        sin, cos, root = self._crank_terms(cad)
+        dpos = self._dpos_dtheta(sin, cos, root)
+        compressing = np.where(np.abs(sin) < 1e-12, cos < 0.0, dpos < 0.0)
+        if(np.ndim(cad) == 0):
+            return bool(compressing)
+        return compressing
+
+
+    def load_surfaces(self, piston_file, head_file=None, valve_files=None, scale=1.0):
+        """
+        Load the piston, cylinder head and valve surfaces (STL/OBJ) for the
+        detailed clearance computation, see pyaate.meshing.surfaces.
+        Input:
+            piston_file: piston surface at TDC.
+            head_file: cylinder head surface (optional).
+            valve_files: dictionary of {valve name: closed valve surface} (optional).
+            scale: scaling of the coordinates to the engine length unit.
+        """
+        self.surfaces = surf.load_engine_surfaces(
+            piston_file, head_file, valve_files, self.valves, scale=scale)
+        return self.surfaces
 
+    def valve_lifts(self, cad):
+        """
+        Return a dictionary of {valve name: lift array} of the valves with lift profiles.
+        """
+        return {valve.name: valve.interp_lift(cad) for valve in self.valves.valves
+                if valve.lift is not None}
 
     def clearance(self, cad, simple=True, downsample=1.0, verbose=True):
         """
@@ -105,6 +366,8 @@ class Engine:
             cad: crank angle [deg]
             simple: Simple clearance return piston position with a user
             defined offset of self.static_clearance.
+            downsample: fraction of the moving surface points used in the
+            detailed clearance computation (simple=False).
         Return:
             cl: clearance [m]
         """
@@ -122,10 +385,89 @@ class Engine:
 
             return self.piston_position(cad)
         else:
+            if(self.surfaces is None):
+                raise ValueError("Engine surfaces not defined, see load_surfaces().")
             pos_from_tdc = self.piston_pos_from_tdc(cad)
-            cl = self.surfaces.clearance(pos_from_tdc, downsample)
+            cl = self.surfaces.clearance(pos_from_tdc, downsample, self.valve_lifts(cad))
             return cl
 
+    def save(self, path, sources=None):
+        """
+        Save the configured engine (dimensions, valves with their discretized
+        lift profiles, injector with its flow rates) to a binary snapshot file,
+        which is much faster to load than processing the input files again.
+        Loaded surfaces (load_surfaces()) and the kinematics cache contents are
+        not saved, and ValueError is raised for other attributes that cannot be
+        stored (json-serializable values, paths and numeric arrays can).
+        The snapshot stores a hash of the source files (the lift files of the
+        valves and the given sources), and Engine.load() rejects the snapshot if
+        they have changed since.
+        Input:
+            path: snapshot file.
+            sources: list of additional input files, e.g. the engine dictionary.
+        """
+        sources = [str(Path(source).resolve()) for source in (sources or [])]
+        for valve in self.valves.valves:
+            if(valve.lift_file is not None):
+                sources.append(str(Path(valve.lift_file).resolve()))
+        input_hash = snapshot.hash_sources(sources)
+        if(input_hash is None):
+            raise ValueError("Snapshot source files not found: " + repr(sources))
+
+        attrs, arrays = _object_state(
+            self, skip=('valves', 'injector', 'surfaces', '_kinematics_cache'))
+        all_arrays = {'engine/' + key: value for key, value in arrays.items()}
+        meta = {'class': type(self).__name__, 'sources': sources, 'input_hash': input_hash,
+                'engine': attrs, 'valves': [], 'injector': None, 'injector_class': None}
+        for i, valve in enumerate(self.valves.valves):
+            attrs, arrays = _object_state(valve)
+            meta['valves'].append(attrs)
+            all_arrays.update({'valve' + str(i) + '/' + key: value for key, value in arrays.items()})
+        if(getattr(self, 'injector', None) is not None):
+            attrs, arrays = _object_state(self.injector)
+            meta['injector'] = attrs
+            meta['injector_class'] = type(self.injector).__name__
+            all_arrays.update({'injector/' + key: value for key, value in arrays.items()})
+        snapshot.write_snapshot(path, meta, all_arrays)
+
+    @classmethod
+    def load(cls, path, check=True):
+        """
+        Load an engine saved by Engine.save(). The arrays (e.g. valve lifts and
+        injector flow rates) are memory-mapped from the file (copy-on-write).
+        Input:
+            path: snapshot file.
+            check: reject the snapshot if its source files have changed.
+        Return:
+            engine of the saved class (Engine, CIEngine, SIEngine, MultiCylinderEngine).
+        """
+        meta, arrays = snapshot.read_snapshot(path)
+        if(check and snapshot.hash_sources(meta['sources']) != meta['input_hash']):
+            raise ValueError("Engine snapshot " + str(path) + " is outdated, the source " +
+                             "files have changed: " + repr(meta['sources']))
+        classes = {c.__name__: c for c in (Engine, CIEngine, SIEngine, MultiCylinderEngine)}
+        engine_class = classes.get(meta['class'])
+        if(engine_class is None or not issubclass(engine_class, cls)):
+            raise ValueError("Snapshot contains a " + meta['class'] + ", not a " + cls.__name__ + ".")
+
+        engine = _restore_object(engine_class, meta['engine'], arrays, 'engine/')
+        engine.valves = valves.ValveSet(None)
+        for i, attrs in enumerate(meta['valves']):
+            valve = _restore_object(valves.Valve, attrs, arrays, 'valve' + str(i) + '/')
+            engine.valves.valves = np.append(engine.valves.valves, valve)
+        engine.valves.n_valves = len(engine.valves.valves)
+        if(meta['injector'] is not None):
+            injector_class = getattr(injectors, meta['injector_class'], None)
+            if(not isinstance(injector_class, type)):
+                raise ValueError("Unknown injector class in snapshot: " + meta['injector_class'])
+            engine.injector = _restore_object(
+                injector_class, meta['injector'], arrays, 'injector/')
+        engine.surfaces = None
+        engine._kinematics_cache = None
+        if(engine._kinematics_cache_size > 0):
+            engine.enable_kinematics_cache(engine._kinematics_cache_size)
+        return engine
+
 
 class CIEngine(Engine):
     """
@@ -143,3 +485,107 @@ class SIEngine(Engine):
     def __init__(self, engine_dict, valves_dict=None):
         Engine.__init__(self, engine_dict, valves_dict)
         #self.spark = get_spark_info
+
+
+class MultiCylinderEngine(Engine):
+    """
+    Class representing an engine of identical cylinders firing with phase offsets.
+    The single-cylinder methods inherited from Engine describe a cylinder in its
+    own crank angle, whereas the cylinder_* methods evaluate all cylinders at
+    once, returning (n_cylinders, n_cad) arrays.
+    Input:
+        engine_dict: python dictionary of engine information. Optional entries
+            'firingOrder' (list of cylinder numbers) and 'phaseOffsets' (CAD per
+            cylinder) are used if not given as arguments.
+        valves_dict: python dictionary of valve information (Optional).
+        firing_order: cylinder numbers in firing order, e.g. [1, 5, 3, 6, 2, 4].
+            The cylinders fire evenly over the cycle.
+        phase_offsets: CAD offset of each cylinder (numbered 1..n), overriding the
+            even firing intervals, e.g. for V engines.
+        cycle: cycle length [CAD].
+    """
+    def __init__(self, engine_dict, valves_dict=None, firing_order=None, phase_offsets=None,
+                 cycle=720.0):
+        Engine.__init__(self, engine_dict, valves_dict)
+        if(firing_order is None):
+            firing_order = engine_dict.get('firingOrder')
+        if(phase_offsets is None):
+            phase_offsets = engine_dict.get('phaseOffsets')
+        if(firing_order is None and phase_offsets is None):
+            raise ValueError("Firing order or phase offsets must be given.")
+        self.cycle = cycle
+
+        if(phase_offsets is None):
+            firing_order = [int(cyl) for cyl in firing_order]
+            n_cylinders = len(firing_order)
+            if(sorted(firing_order) != list(range(1, n_cylinders + 1))):
+                raise ValueError("Firing order must contain cylinders 1.." + repr(n_cylinders) + ".")
+            phase_offsets = np.empty(n_cylinders)
+            phase_offsets[np.array(firing_order) - 1] = np.arange(n_cylinders) * cycle / n_cylinders
+        else:
+            phase_offsets = np.asarray(phase_offsets, dtype=float)
+            if(firing_order is None):
+                firing_order = list(np.argsort(phase_offsets, kind='stable') + 1)
+            if(len(firing_order) != len(phase_offsets)):
+                raise ValueError("Firing order and phase offsets differ in length.")
+        self.firing_order = [int(cyl) for cyl in firing_order]
+        self.phase_offsets = np.mod(phase_offsets, cycle)
+
+    @property
+    def n_cylinders(self):
+        return len(self.phase_offsets)
+
+    def firing_table(self):
+        """
+        Return a list of (cylinder number, firing position, phase offset [CAD]).
+        """
+        return [(cyl, self.firing_order.index(cyl), float(self.phase_offsets[cyl - 1]))
+                for cyl in range(1, self.n_cylinders + 1)]
+
+    def cylinder_cads(self, cad):
+        """
+        Crank angles of each cylinder in its own cycle.
+        Input:
+            cad: crank angle(s) of cylinder 1 reference.
+        Return:
+            (n_cylinders, n_cad) array.
+        """
+        cad = np.atleast_1d(np.asarray(cad, dtype=float))
+        return cad[None, :] - self.phase_offsets[:, None]
+
+    def cylinder_kinematics(self, cad):
+        """
+        Kinematics of all cylinders in one vectorized evaluation, see Engine.kinematics().
+        Return:
+            dictionary of (n_cylinders, n_cad) arrays.
+        """
+        return self.kinematics(self.cylinder_cads(cad))
+
+    def cylinder_piston_position(self, cad):
+        """
+        Return (n_cylinders, n_cad) piston positions from the cylinder head.
+        """
+        return self.piston_position(self.cylinder_cads(cad))
+
+    def cylinder_volumes(self, cad):
+        """
+        Return (n_cylinders, n_cad) cylinder volumes.
+        """
+        return self.cylinder_volume(self.cylinder_cads(cad))
+
+    def cylinder_valve_lifts(self, cad):
+        """
+        Return a dictionary of {valve name: (n_cylinders, n_cad) lift array}.
+        """
+        return self.valve_lifts(self.cylinder_cads(cad) % self.cycle)
+
+    def cylinder_clearance(self, cad, simple=True, downsample=1.0, verbose=True):
+        """
+        Return (n_cylinders, n_cad) clearances, see Engine.clearance().
+        """
+        cads = self.cylinder_cads(cad)
+        if(simple):
+            return self.clearance(cads, simple=True, verbose=verbose)
+        # consecutive crank angles per cylinder for the surface distance queries
+        cl = self.clearance(cads.ravel(), simple=False, downsample=downsample)
+        return cl.reshape(cads.shape)
@@ -0,0 +1,110 @@
+"""
+Binary snapshot files of configured engine objects (see Engine.save() and
+Engine.load()).
+
+A snapshot is a single file: a short magic line, the length of a json header,
+the json header (object attributes and array descriptors) and the raw array
+data, aligned so that the arrays can be memory-mapped when loading.
+"""
+import hashlib
+import json
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+_MAGIC = b'PYAATE-SNAPSHOT-1\n'
+_ALIGN = 64
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def hash_sources(sources):
+    """
+    Hash the content of the source files of a snapshot.
+    Input:
+        sources: list of file paths.
+    Return:
+        hex digest, or None if a source file does not exist.
+    """
+    digest = hashlib.sha1()
+    for source in sources:
+        try:
+            with open(str(source), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            return None
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def write_snapshot(path, meta, arrays):
+    """
+    Write a snapshot file. The file is written to a temporary file first and
+    then renamed, so that an interrupted write does not leave a truncated snapshot.
+    Input:
+        path: output file.
+        meta: json-serializable dictionary.
+        arrays: dictionary of {name: numpy array}.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    descriptors = {}
+    offset = 0
+    for name, array in arrays.items():
+        descriptors[name] = {'dtype': array.dtype.str, 'shape': list(array.shape),
+                             'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'meta': meta, 'arrays': descriptors}).encode('utf-8')
+    data_start = _aligned(len(_MAGIC) + 8 + len(header))
+
+    path = Path(path)
+    tmp_file = path.with_name(path.name + '.tmp' + str(os.getpid()))
+    try:
+        with open(str(tmp_file), 'wb') as f:
+            f.write(_MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.write(b'\0' * (data_start + descriptors[name]['offset'] - f.tell()))
+                f.write(array.tobytes())
+        os.replace(str(tmp_file), str(path))
+    finally:
+        if tmp_file.exists():
+            tmp_file.unlink()
+
+
+def read_snapshot(path, mmap=True):
+    """
+    Read a snapshot file.
+    Input:
+        path: snapshot file.
+        mmap: memory-map the arrays (copy-on-write) instead of reading them.
+    Return:
+        meta: dictionary.
+        arrays: dictionary of {name: numpy array}.
+    """
+    path = Path(path)
+    with open(str(path), 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("Not an engine snapshot file: " + str(path))
+        header_length = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    data_start = _aligned(len(_MAGIC) + 8 + header_length)
+
+    arrays = {}
+    for name, descriptor in header['arrays'].items():
+        dtype = np.dtype(descriptor['dtype'])
+        shape = tuple(descriptor['shape'])
+        offset = data_start + descriptor['offset']
+        if mmap and len(shape) > 0 and int(np.prod(shape)) > 0:
+            arrays[name] = np.memmap(str(path), dtype=dtype, mode='c', offset=offset,
+                                     shape=shape).view(np.ndarray)
+        else:
+            count = int(np.prod(shape))
+            with open(str(path), 'rb') as f:
+                f.seek(offset)
+                arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+    return header['meta'], arrays
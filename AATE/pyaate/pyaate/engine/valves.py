@@ -1,5 +1,8 @@
+from collections.abc import Mapping
+
 import numpy as np
 from pyaate.engine import units
+from pyaate.openfoam import dictionary as foam
 from scipy.signal import argrelextrema
 import matplotlib.pyplot as plt
 import os
@@ -67,10 +70,11 @@ def adjust_lift(t, lift, diff_lift_timing, diff_open_timing):
     fig.savefig('adjust_lift.png')
     return t_adj, lift_adj
 
-def write_lifts_of(time, lift, name, output_dir=None):
+def write_lifts_of(time, lift, name, output_dir=None, compress=False):
     """
     Write the generated lift profile to a txt file in OpenFOAM format. This file can then be added as an
-    #include statement inside the lift table argument.
+    #include statement inside the lift table argument. With compress=True, the file is gzip-compressed
+    ("<name>.txt.gz"), which OpenFOAM reads transparently. Returns the path of the written file.
     """
     t_unique, indices = np.unique(time.round(decimals=6), return_index=True)
     # Add 0 and 720
@@ -86,9 +90,8 @@ def write_lifts_of(time, lift, name, output_dir=None):
     else:
         file_path = f"{name}.txt"
 
-    with open(file_path, 'w') as file:
-        for t, l in zip(t_unique, lift_unique):
-            file.write(f"({t:.6f}  {l:.6f})\n")
+    return foam.write_table(file_path, np.column_stack((t_unique, lift_unique)),
+                            row_format='(%.6f  %.6f)', compress=compress)
 
 def discretize_lift_profile(t, lift, min_gap, n=256):
     """
@@ -174,7 +177,7 @@ class ValveSet:
 
     def init_valves(self, valves_dict):
         for key_i in valves_dict.keys():
-            if not isinstance(valves_dict[key_i], dict):
+            if not isinstance(valves_dict[key_i], Mapping):
                 print('\n\tWarning: valves[' + repr(key_i) + '] is not a dict type.' +
                     '\n\tSkipping the valve initialisation.\n')
                 continue
@@ -1,6 +1,8 @@
 import numpy as np
 import sys
 
+from pyaate.openfoam import dictionary as foam
+
 
 def get_cad_range(cad_window):
     """
@@ -171,13 +173,15 @@ def predict_remesh_times(
     return cads_to_remesh, cads_to_remesh_valves
 
 
-def write_timings(file, time_names):
+def write_timings(file, time_names, compress=False):
     """
     Writes timings to file.
     Input:
         file: path to output file.
         time_names: string formatted time names.
+        compress: write gzip-compressed output (file + ".gz").
+    Output:
+        path of the written file.
     """
-    with open(file, 'w') as f:
-        for ti in time_names:
-            f.write('%s\n'% (ti))
+    return foam.write_table(file, np.asarray(time_names, dtype=object), fmt='%s',
+                            compress=compress)
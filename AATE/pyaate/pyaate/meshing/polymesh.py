@@ -0,0 +1,296 @@
+"""
+Lazy reader for OpenFOAM polyMesh directories, e.g. constant/polyMesh or the
+mesh library constant/meshToMesh_<CAD>/polyMesh written for engine cases.
+
+Each file (points, faces, owner, neighbour, boundary) is read only when the
+corresponding attribute is first accessed. Binary lists are memory-mapped,
+and the cell/face/point counts are taken from the file headers only, so that
+inspecting a large number of meshes remains cheap.
+"""
+import gzip
+import mmap
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pyaate.openfoam import dict_parser
+from pyaate.openfoam import dictionary
+from pyaate.openfoam import fields
+
+# Number of bytes read for headers
+_HEADER_BYTES = 4096
+
+_HEADER_RE = re.compile(rb'FoamFile\s*\{(.*?)\}', re.DOTALL)
+_COUNT_RE = re.compile(rb'\s*(?:(?://[^\n]*|/\*.*?\*/)\s*)*(\d+)\s*([({])', re.DOTALL)
+_NOTE_RE = re.compile(r'(\w+):\s*(\d+)')
+_PARENS = bytes.maketrans(b'()', b'  ')
+
+
+def _mesh_file(mesh_dir, name):
+    """
+    Path of a polyMesh file, accepting gzip-compressed files ("faces.gz").
+    """
+    path = Path(mesh_dir, name)
+    if not path.is_file() and Path(mesh_dir, name + '.gz').is_file():
+        path = Path(mesh_dir, name + '.gz')
+    if not path.is_file():
+        raise FileNotFoundError("polyMesh file not found: " + str(path))
+    return path
+
+
+def read_header(path):
+    """
+    Read the FoamFile header of an OpenFOAM file without reading its data.
+    Input:
+        path: path to the file (.gz accepted).
+    Return:
+        header dictionary, including the parsed counts of the "note" entry
+        (e.g. {'nCells': 1000, ...}) under the key 'counts'.
+    """
+    path = Path(path)
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(str(path), 'rb') as f:
+        head = f.read(_HEADER_BYTES)
+    m = _HEADER_RE.search(head)
+    if m is None:
+        raise ValueError("FoamFile header not found in " + str(path))
+    header = dict_parser.parse_string(m.group(1).decode('latin-1'))
+    header['counts'] = {key: int(value) for key, value in
+                        _NOTE_RE.findall(header.get('note', ''))}
+    header['list_size'] = _list_size(head, m.end())
+    return header
+
+
+def _list_size(buffer, pos):
+    """
+    Size of the list following the header, or None if not within buffer.
+    """
+    m = _COUNT_RE.match(buffer, pos)
+    return None if m is None else int(m.group(1))
+
+
+class _ListFile:
+    """
+    Bytes of a polyMesh list file with its format information.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        if self.path.suffix == '.gz':
+            with gzip.open(str(self.path), 'rb') as f:
+                self.buffer = f.read()
+            self.memmap_file = None
+        else:
+            with open(str(self.path), 'rb') as f:
+                self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.memmap_file = str(self.path)
+        m = _HEADER_RE.search(self.buffer, 0, _HEADER_BYTES)
+        if m is None:
+            raise ValueError("FoamFile header not found in " + str(self.path))
+        header = dict_parser.parse_string(m.group(1).decode('latin-1'))
+        self.binary = header.get('format') == 'binary'
+        self.field_class = header.get('class')
+        self.scalar_dtype, self.label_dtype = fields.arch_dtypes(header.get('arch', ''))
+        self.pos = m.end()
+
+    def next_list(self, type_name, nested=True):
+        """
+        Read the next list of the file.
+        Input:
+            type_name: 'label', 'vector', etc.
+            nested: the ascii list items are parenthesised (e.g. vectors or faces)
+        Return:
+            numpy array (memory-mapped for binary files)
+        """
+        m = _COUNT_RE.match(self.buffer, self.pos)
+        if m is None:
+            raise ValueError("List not found in " + str(self.path))
+        n = int(m.group(1))
+        start = m.end()
+        uniform = m.group(2) == b'{'
+        if self.binary or uniform:
+            array, end = fields.read_list(self.buffer, start, n, type_name, self.binary,
+                                          self.scalar_dtype, self.label_dtype,
+                                          self.memmap_file, uniform=uniform)
+        else:
+            end = self.buffer.rfind(b')') if nested else self.buffer.find(b')', start)
+            n_components = fields.N_COMPONENTS[type_name]
+            dtype = self.label_dtype if type_name == 'label' else self.scalar_dtype
+            array = fields.parse_ascii_list(self.buffer[start:end], n, n_components, dtype)
+        self.pos = end + 1
+        return array
+
+    def ascii_faces(self):
+        """
+        Read an ascii faceList, e.g. "4(0 1 2 3)", into CSR arrays.
+        """
+        m = _COUNT_RE.match(self.buffer, self.pos)
+        if m is None:
+            raise ValueError("List not found in " + str(self.path))
+        n = int(m.group(1))
+        data = self.buffer[m.end():self.buffer.rfind(b')')]
+        sizes = np.array(re.findall(rb'(\d+)\s*\(', data), dtype=self.label_dtype)
+        if sizes.size != n:
+            raise ValueError("Expected " + repr(n) + " faces, got " + repr(sizes.size))
+        values = fields.parse_ascii_list(data.translate(_PARENS), n + int(sizes.sum()), 1,
+                                         self.label_dtype)
+        offsets = np.zeros(n + 1, dtype=self.label_dtype)
+        np.cumsum(sizes, out=offsets[1:])
+        # drop the face size items which precede every face
+        keep = np.ones(values.size, dtype=bool)
+        keep[offsets[:-1] + np.arange(n)] = False
+        return offsets, values[keep]
+
+
+class PolyMesh:
+    """
+    Lazily loaded OpenFOAM polyMesh.
+    Input:
+        mesh_dir: polyMesh directory, or a directory containing it
+            (e.g. case/constant or case/constant/meshToMesh_360).
+    Attributes (loaded on first access):
+        points: (n_points, 3) array.
+        faces: (offsets, labels) CSR arrays; the points of face i are
+            labels[offsets[i]:offsets[i + 1]].
+        owner: (n_faces,) array of owner cells.
+        neighbour: (n_internal_faces,) array of neighbour cells.
+        boundary: dictionary of patch dictionaries (nFaces, startFace as int).
+    """
+
+    def __init__(self, mesh_dir):
+        mesh_dir = Path(mesh_dir)
+        if Path(mesh_dir, 'polyMesh').is_dir():
+            mesh_dir = mesh_dir / 'polyMesh'
+        if not mesh_dir.is_dir():
+            raise FileNotFoundError("polyMesh directory not found: " + str(mesh_dir))
+        self.mesh_dir = mesh_dir
+        self._cache = {}
+        self._counts = None
+
+    def __repr__(self):
+        return "PolyMesh(" + repr(str(self.mesh_dir)) + ")"
+
+    def _load(self, name, loader):
+        if name not in self._cache:
+            self._cache[name] = loader()
+        return self._cache[name]
+
+    @property
+    def points(self):
+        return self._load('points', lambda: _ListFile(
+            _mesh_file(self.mesh_dir, 'points')).next_list('vector'))
+
+    @property
+    def faces(self):
+        def load():
+            list_file = _ListFile(_mesh_file(self.mesh_dir, 'faces'))
+            if list_file.field_class == 'faceCompactList':
+                offsets = list_file.next_list('label', nested=False)
+                labels = list_file.next_list('label', nested=False)
+                return offsets, labels
+            if list_file.binary:
+                raise ValueError("Binary faceList is not supported: " + str(list_file.path))
+            return list_file.ascii_faces()
+        return self._load('faces', load)
+
+    @property
+    def owner(self):
+        return self._load('owner', lambda: _ListFile(
+            _mesh_file(self.mesh_dir, 'owner')).next_list('label', nested=False))
+
+    @property
+    def neighbour(self):
+        return self._load('neighbour', lambda: _ListFile(
+            _mesh_file(self.mesh_dir, 'neighbour')).next_list('label', nested=False))
+
+    @property
+    def boundary(self):
+        def load():
+            path = _mesh_file(self.mesh_dir, 'boundary')
+            opener = gzip.open if path.suffix == '.gz' else open
+            with opener(str(path), 'rb') as f:
+                text = f.read().decode('latin-1')
+            m = _HEADER_RE.search(text.encode('latin-1'))
+            body = text[m.end():] if m else text
+            # polyBoundaryMesh is a list of patch dictionaries: N ( name {...} ... )
+            body = body[body.index('(') + 1:body.rindex(')')]
+            patches = dictionary.to_python_types(dict_parser.parse_string(body, path))
+            return {name: patch for name, patch in patches.items() if isinstance(patch, dict)}
+        return self._load('boundary', load)
+
+    @property
+    def counts(self):
+        """
+        Dictionary of nPoints, nCells, nFaces and nInternalFaces, read from the
+        headers of the owner file (or of the list sizes) only.
+        """
+        if self._counts is None:
+            header = read_header(_mesh_file(self.mesh_dir, 'owner'))
+            counts = dict(header['counts'])
+            if 'nFaces' not in counts and header['list_size'] is not None:
+                counts['nFaces'] = header['list_size']
+            if 'nPoints' not in counts:
+                counts['nPoints'] = read_header(_mesh_file(self.mesh_dir, 'points'))['list_size']
+            if 'nInternalFaces' not in counts:
+                counts['nInternalFaces'] = read_header(
+                    _mesh_file(self.mesh_dir, 'neighbour'))['list_size']
+            if 'nCells' not in counts:
+                # not available in the header: requires the owner list
+                counts['nCells'] = int(self.owner.max()) + 1 if len(self.owner) else 0
+            self._counts = counts
+        return self._counts
+
+    @property
+    def n_points(self):
+        return self.counts['nPoints']
+
+    @property
+    def n_cells(self):
+        return self.counts['nCells']
+
+    @property
+    def n_faces(self):
+        return self.counts['nFaces']
+
+    @property
+    def n_internal_faces(self):
+        return self.counts['nInternalFaces']
+
+
+def read_polymesh(mesh_dir):
+    """
+    Create a lazily loaded PolyMesh. Nothing is read until an attribute is accessed.
+    """
+    return PolyMesh(mesh_dir)
+
+
+def mesh_info(constant_dir, pattern=None):
+    """
+    List the sizes of the meshes in a mesh library, reading only the file headers.
+    By default both engine case layouts are detected: the snappy meshes in
+    constant/meshToMesh_<CAD>/polyMesh and the GridPro meshes in
+    constant/meshes/<CAD>/polyMesh.
+    Input:
+        constant_dir: directory containing the mesh directories, typically constant.
+        pattern: glob pattern of the mesh directories relative to constant_dir,
+            e.g. 'meshes/*'. None for the default layouts.
+    Return:
+        pandas DataFrame indexed by mesh name (CAD if the name ends with a number)
+        with columns nPoints, nCells, nFaces and nInternalFaces.
+    """
+    patterns = ['meshToMesh_*', 'meshes/*'] if pattern is None else [pattern]
+    rows = {}
+    for mesh_dir in (d for p in patterns for d in Path(constant_dir).glob(p)):
+        if not Path(mesh_dir, 'polyMesh').is_dir():
+            continue
+        m = re.search(r'([-+]?\d+\.?\d*)$', mesh_dir.name)
+        key = float(m.group(1)) if m else mesh_dir.name
+        rows[key] = PolyMesh(mesh_dir).counts
+    info = pd.DataFrame.from_dict(
+        rows, orient='index', columns=['nPoints', 'nCells', 'nFaces', 'nInternalFaces'])
+    try:
+        return info.sort_index()
+    except TypeError:
+        return info
@@ -0,0 +1,231 @@
+"""
+Surface-based clearance of the moving engine parts (piston and valves) and the
+cylinder head.
+
+The surfaces are given as STL or OBJ patches in their reference positions:
+piston at TDC and valves closed. A KD-tree is built once per surface, and the
+distances at different crank angles are obtained by translating the query
+points with the kinematic offsets instead of moving and rebuilding the trees.
+Following the OpenFOAM engine conventions, the piston moves by -x(cad) * axis
+and a valve by -lift(cad) * axis, where the axes point towards the cylinder head.
+"""
+from pathlib import Path
+
+import numpy as np
+from scipy.spatial import cKDTree
+from stl import mesh
+
+
+def read_surface_points(surface_file, scale=1.0):
+    """
+    Read the vertices of an STL (ascii or binary) or OBJ surface.
+    Input:
+        surface_file: path to the surface file.
+        scale: scaling of the coordinates, e.g. 1e-3 for mm to m.
+    Return:
+        (n, 3) array of unique vertex coordinates.
+    """
+    surface_file = Path(surface_file)
+    if surface_file.suffix.lower() == '.obj':
+        vertices = []
+        with open(str(surface_file), 'r') as f:
+            for line in f:
+                if line.startswith('v '):
+                    vertices.append(line.split()[1:4])
+        points = np.array(vertices, dtype=float).reshape(-1, 3)
+    elif surface_file.suffix.lower() == '.stl':
+        points = mesh.Mesh.from_file(str(surface_file)).vectors.reshape(-1, 3).astype(float)
+    else:
+        raise ValueError("Unsupported surface format: " + str(surface_file))
+    if len(points) == 0:
+        raise ValueError("No vertices found in " + str(surface_file))
+    return np.unique(points, axis=0) * scale
+
+
+def _unit(axis):
+    axis = np.asarray(axis, dtype=float)
+    norm = np.linalg.norm(axis)
+    if norm == 0.0:
+        raise ValueError("Motion axis must be non-zero.")
+    return axis / norm
+
+
+class Surface:
+    """
+    Surface point cloud with a KD-tree, built once.
+    Input:
+        points: (n, 3) array of surface points in the reference position.
+        axis: direction of the motion, pointing towards the cylinder head
+            (None for a static surface).
+    """
+
+    def __init__(self, points, axis=None):
+        self.points = np.asarray(points, dtype=float)
+        self.axis = None if axis is None else _unit(axis)
+        self.tree = cKDTree(self.points)
+        self._downsampled = {}
+
+    def query_points(self, downsample=1.0):
+        """
+        Return the surface points used for queries: every round(1 / downsample)th
+        point for downsample < 1.
+        """
+        if not 0.0 < downsample <= 1.0:
+            raise ValueError("downsample must be within (0, 1].")
+        step = max(1, int(round(1.0 / downsample)))
+        if step not in self._downsampled:
+            self._downsampled[step] = self.points[::step]
+        return self._downsampled[step]
+
+    def offsets(self, displacement):
+        """
+        (n_cad, 3) translations of the surface for displacements along -axis.
+        """
+        return -np.asarray(displacement, dtype=float)[:, None] * self.axis[None, :]
+
+
+def min_distances(tree, points, offsets, refresh=0.5):
+    """
+    Minimum distance between a KD-tree and a point cloud translated by
+    each of the offsets.
+    All queries are bounded by an upper bound of the minimum obtained from a
+    few points, which keeps the KD-tree searches local. Since the distance of a
+    point to the tree changes at most by the length of the translation, the
+    distances of a full evaluation give lower bounds for the following offsets:
+    only the points whose lower bound is below the upper bound are queried, and
+    the full evaluation is repeated when more than the refresh fraction of
+    points remains. Consecutive offsets should therefore be close to each
+    other, e.g. an increasing CAD range.
+    Input:
+        tree: cKDTree of the reference surface.
+        points: (n, 3) query points.
+        offsets: (n_cad, 3) translations of the query points relative to the tree.
+        refresh: fraction of candidate points above which all points are queried.
+    Return:
+        (n_cad,) array of minimum distances.
+    """
+    offsets = np.atleast_2d(np.asarray(offsets, dtype=float))
+    result = np.empty(len(offsets))
+    n_best = min(len(points), 32)
+    sample = points[::max(1, len(points) // n_best)]
+    lower_bounds = None
+    ref_offset = None
+    for k, offset in enumerate(offsets):
+        if ref_offset is None:
+            upper = tree.query(sample + offset, k=1)[0].min()
+            candidates = None
+        else:
+            lower = lower_bounds - np.linalg.norm(offset - ref_offset)
+            best = np.argpartition(lower, n_best - 1)[:n_best]
+            upper = tree.query(points[best] + offset, k=1)[0].min()
+            candidates = np.flatnonzero(lower < upper)
+            if len(candidates) > refresh * len(points):
+                candidates = None
+
+        if candidates is None:
+            # full evaluation: points beyond the upper bound get it as lower bound
+            distances = tree.query(points + offset, k=1, distance_upper_bound=upper,
+                                   workers=-1)[0]
+            lower_bounds = np.minimum(distances, upper)
+            ref_offset = offset
+        elif len(candidates):
+            distances = tree.query(points[candidates] + offset, k=1,
+                                   distance_upper_bound=upper, workers=-1)[0]
+        else:
+            distances = np.array([upper])
+        result[k] = min(upper, distances.min())
+    return result
+
+
+class EngineSurfaces:
+    """
+    Piston, cylinder head and valve surfaces of an engine for detailed clearance
+    computation.
+    Input:
+        piston: Surface of the piston at TDC (axis towards the cylinder head).
+        head: static Surface of the cylinder head (optional).
+        valves: dictionary of {valve name: Surface of the closed valve} (optional).
+    """
+
+    def __init__(self, piston, head=None, valves=None):
+        if piston.axis is None:
+            raise ValueError("Piston surface requires a motion axis.")
+        self.piston = piston
+        self.head = head
+        self.valves = dict(valves or {})
+        for name, valve in self.valves.items():
+            if valve.axis is None:
+                raise ValueError("Valve surface " + repr(name) + " requires a motion axis.")
+
+    def distances(self, pos_from_tdc, lifts=None, downsample=1.0):
+        """
+        Minimum distances between the surfaces for a batch of crank angles.
+        Input:
+            pos_from_tdc: (n_cad,) piston positions from TDC.
+            lifts: dictionary of {valve name: (n_cad,) lift array}; valves without
+                lift are closed.
+            downsample: fraction of the moving surface points used for queries.
+        Return:
+            dictionary of (n_cad,) arrays with keys 'piston-head',
+            'piston-<valve>' and '<valve>-head', where available.
+        """
+        pos_from_tdc = np.atleast_1d(np.asarray(pos_from_tdc, dtype=float))
+        lifts = lifts or {}
+        piston_offsets = self.piston.offsets(pos_from_tdc)
+        piston_points = self.piston.query_points(downsample)
+
+        distances = {}
+        if self.head is not None:
+            distances['piston-head'] = min_distances(self.head.tree, piston_points, piston_offsets)
+        for name, valve in self.valves.items():
+            lift = np.broadcast_to(np.asarray(lifts.get(name, 0.0), dtype=float),
+                                   pos_from_tdc.shape)
+            valve_offsets = valve.offsets(lift)
+            valve_points = valve.query_points(downsample)
+            # the piston tree is queried with the valve points in the piston frame
+            distances['piston-' + name] = min_distances(
+                self.piston.tree, valve_points, valve_offsets - piston_offsets)
+            if self.head is not None:
+                distances[name + '-head'] = min_distances(self.head.tree, valve_points,
+                                                          valve_offsets)
+        return distances
+
+    def clearance(self, pos_from_tdc, downsample=1.0, lifts=None):
+        """
+        Minimum distance of the piston to the cylinder head and the valves.
+        Input:
+            pos_from_tdc: piston position(s) from TDC.
+            downsample: fraction of the moving surface points used for queries.
+            lifts: dictionary of {valve name: lift array}.
+        Return:
+            clearance (float or (n_cad,) array).
+        """
+        distances = self.distances(pos_from_tdc, lifts, downsample)
+        piston_distances = [d for key, d in distances.items() if key.startswith('piston-')]
+        if not piston_distances:
+            raise ValueError("Clearance requires a cylinder head or valve surfaces.")
+        cl = np.min(piston_distances, axis=0)
+        return cl if np.ndim(pos_from_tdc) else float(cl[0])
+
+
+def load_engine_surfaces(piston_file, head_file=None, valve_files=None, valve_set=None,
+                         piston_axis=(0, 0, 1), scale=1.0):
+    """
+    Load the surfaces of an engine from STL/OBJ files.
+    Input:
+        piston_file: piston surface at TDC.
+        head_file: cylinder head surface (optional).
+        valve_files: dictionary of {valve name: closed valve surface} (optional).
+        valve_set: ValveSet providing the valve axes (default axis (0, 0, 1)).
+        piston_axis: piston axis pointing towards the cylinder head.
+        scale: scaling of the coordinates, e.g. 1e-3 for mm to m.
+    Return:
+        EngineSurfaces
+    """
+    piston = Surface(read_surface_points(piston_file, scale), piston_axis)
+    head = None if head_file is None else Surface(read_surface_points(head_file, scale))
+    valves = {}
+    for name, valve_file in (valve_files or {}).items():
+        axis = (0, 0, 1) if valve_set is None else valve_set.get_valve(name).axis
+        valves[name] = Surface(read_surface_points(valve_file, scale), axis)
+    return EngineSurfaces(piston, head, valves)
@@ -0,0 +1,137 @@
+"""
+Cache for parsed OpenFOAM dictionaries used by dictionary.read_dict().
+
+Entries are validated against the source files (the dictionary and the files it
+includes) either by their size and modification time, or by a content hash.
+Parsed dictionaries are kept in an in-process LRU and, optionally, pickled into a
+cache directory so that other processes can reuse them. The directory can also be
+set via the PYAATE_DICT_CACHE environment variable.
+"""
+import copy
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+
+_CACHE_VERSION = 1
+
+
+def file_signature(path, use_hash=False):
+    """
+    Return a signature of a file used to detect changes.
+    Input:
+        path: path to the file.
+        use_hash: if True, use sha1 of the file content, otherwise (size, mtime).
+    Return:
+        signature tuple, or None if the file does not exist.
+    """
+    try:
+        if use_hash:
+            with open(str(path), 'rb') as f:
+                return ('sha1', hashlib.sha1(f.read()).hexdigest())
+        stat = os.stat(str(path))
+        return (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return None
+
+
+class DictCache:
+    """
+    LRU cache of parsed dictionaries with an optional on-disk pickle store.
+    Input:
+        max_entries: maximum number of dictionaries kept in memory.
+        cache_dir: directory for the on-disk store (None disables it).
+        use_hash: validate entries by content hash instead of size and mtime.
+    """
+
+    def __init__(self, max_entries=128, cache_dir=None, use_hash=False):
+        self.max_entries = max_entries
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.use_hash = use_hash
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _valid(self, deps):
+        return all(file_signature(path, self.use_hash) == sig for path, sig in deps)
+
+    def _disk_file(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return Path(self.cache_dir, digest + '.pkl')
+
+    def _store(self, key, deps, value):
+        self._entries[key] = (deps, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """
+        Return a copy of the cached value for key, or None if not available
+        or if any of the source files has changed.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and self._valid(entry[0]):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+        if entry is not None:
+            del self._entries[key]
+
+        if self.cache_dir is not None:
+            try:
+                with open(str(self._disk_file(key)), 'rb') as f:
+                    version, disk_key, deps, value = pickle.load(f)
+                if version == _CACHE_VERSION and disk_key == key and self._valid(deps):
+                    self._store(key, deps, value)
+                    self.disk_hits += 1
+                    return copy.deepcopy(value)
+            except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+                pass
+
+        self.misses += 1
+        return None
+
+    def put(self, key, dep_files, value):
+        """
+        Cache value for key. dep_files are the source files whose changes invalidate
+        the entry. The signatures are taken now, i.e. right after reading the sources.
+        """
+        deps = tuple((str(path), file_signature(path, self.use_hash)) for path in dep_files)
+        value = copy.deepcopy(value)
+        self._store(key, deps, value)
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            disk_file = self._disk_file(key)
+            tmp_file = disk_file.with_suffix('.tmp' + str(os.getpid()))
+            with open(str(tmp_file), 'wb') as f:
+                pickle.dump((_CACHE_VERSION, key, deps, value), f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(str(tmp_file), str(disk_file))
+
+    def clear(self, disk=False):
+        """
+        Empty the in-memory cache and reset counters. With disk=True, the on-disk
+        store is emptied as well.
+        """
+        self._entries.clear()
+        self.hits = self.disk_hits = self.misses = 0
+        if disk and self.cache_dir is not None and self.cache_dir.is_dir():
+            for f in self.cache_dir.glob('*.pkl'):
+                f.unlink()
+
+    def info(self):
+        """
+        Return cache statistics as a dictionary.
+        """
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'cache_dir': None if self.cache_dir is None else str(self.cache_dir),
+        }
@@ -0,0 +1,1045 @@
+"""
+Native Python reader for OpenFOAM dictionary files.
+
+The file is tokenized in a single pass and parsed into a nested python dictionary
+with string-valued leaf entries, mirroring the output of the foamDictionary based
+traverse in dictionary.read_dict(). Hence, no OpenFOAM installation is required.
+
+Supported syntax:
+    - sub-dictionaries, lists, vectors and dimension sets
+    - // and /* */ comments
+    - #include, #includeIfPresent and #includeEtc (when the file can be located)
+    - $var references resolved from the enclosing scopes, both as values and
+      as dictionary merges (e.g. "$__injector__;"), including scoped references
+      ($a/b, $a.b, $..a, $:a, $!a/b), references to other files
+      ($controlDict!maxDeltaT) and typed references ($<vector>position)
+    - #calc arithmetic over scalars and vectors, e.g. #calc "$dT*0.1"
+    - #includeFunc, when the function object template is found in the case
+      system directory or in the OpenFOAM etc/caseDicts directory
+    - #remove and #inputMode (the latter is ignored)
+Unsupported constructs (e.g. #codeStream, unresolved $var) are kept as their raw
+text and reported by a warning and in DictParser.unresolved.
+"""
+import ast
+import copy
+import math
+import os
+import re
+from collections import namedtuple
+from collections.abc import Mapping
+from pathlib import Path
+
+import numpy as np
+
+# Token kinds
+WORD = 'word'
+STRING = 'string'
+PUNCT = 'punct'
+DIRECTIVE = 'directive'
+VARIABLE = 'variable'
+VERBATIM = 'verbatim'
+
+_TOKEN_RE = re.compile(r'''
+      (?P<skip>\s+|//[^\n]*|/\*.*?\*/)
+    | (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<verbatim>\#\{.*?\#\})
+    | (?P<punct>[{}()\[\];])
+    | (?P<directive>\#[A-Za-z]\w*)
+    | (?P<variable>\$\{[^}]*\}|\$[^\s";{}()\[\]]+)
+    | (?P<word>[^\s";{}()\[\]]+)
+    ''', re.VERBOSE | re.DOTALL)
+
+# Structural tokens only: used for the quick scan of lazily parsed dictionaries
+_STRUCT_RE = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:[^"\\]|\\.)*"|[{}();\[\]]', re.DOTALL)
+
+_NUMBER_RE = re.compile(r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$')
+
+_OPEN = ('(', '[', '{')
+_CLOSE = (')', ']', '}')
+
+
+def _extend_word(text, start, end):
+    """
+    OpenFOAM words may contain balanced parentheses, e.g. div(phi,U).
+    Return the end index of the word starting at 'start', extending beyond
+    'end' if a balanced parenthesised group (without whitespace) follows.
+    """
+    n = len(text)
+    depth = 0
+    i = end
+    while i < n:
+        c = text[i]
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            if depth == 0:
+                break
+            depth -= 1
+        elif c.isspace() or c in '";{}':
+            break
+        i += 1
+    if depth != 0:
+        # unbalanced, e.g. "name(arg1, arg2)": leave the group as separate tokens
+        return end
+    return i
+
+
+def tokenize(text, spans=False):
+    """
+    Split OpenFOAM dictionary text into tokens in a single pass.
+    Input:
+        text: content of an OpenFOAM dictionary file.
+        spans: include the start and end indices of the tokens in text.
+    Return:
+        tokens: list of (kind, text) tuples, or (kind, text, start, end) tuples
+            if spans=True. Comments and whitespace are dropped.
+    """
+    tokens = []
+    append = tokens.append
+    match = _TOKEN_RE.match
+    pos = 0
+    n = len(text)
+    while pos < n:
+        m = match(text, pos)
+        if m is None:
+            raise ValueError(
+                "Unable to tokenize OpenFOAM dictionary near: " + repr(text[pos:pos + 40]))
+        kind = m.lastgroup
+        end = m.end()
+        if kind == 'skip':
+            pos = end
+            continue
+        if (kind == WORD or kind == VARIABLE) and end < n and text[end] == '(' \
+                and not _NUMBER_RE.match(m.group()):
+            end = _extend_word(text, pos, end)
+        if spans:
+            append((kind, text[pos:end], pos, end))
+        else:
+            append((kind, text[pos:end]))
+        pos = end
+    return tokens
+
+
+# Location of an entry in dictionary text. For sub-dictionaries value_start and
+# value_end are the indices of the opening and closing braces.
+EntrySpan = namedtuple(
+    'EntrySpan', ['start', 'key_end', 'value_start', 'value_end', 'end', 'is_dict'])
+
+
+def locate_entries(text):
+    """
+    Locate the entries of dictionary text without expanding any macros or includes.
+    Input:
+        text: content of an OpenFOAM dictionary file.
+    Return:
+        dictionary of {"path/to/key": EntrySpan} in the order of appearance.
+    """
+    tokens = tokenize(text, spans=True)
+    n = len(tokens)
+    entries = {}
+
+    def _skip_group(i):
+        depth = 0
+        while i < n:
+            kind, tok = tokens[i][:2]
+            if kind == PUNCT:
+                if tok in _OPEN:
+                    depth += 1
+                elif tok in _CLOSE:
+                    depth -= 1
+            i += 1
+            if depth == 0:
+                break
+        return i
+
+    def _parse(i, prefix, nested):
+        while i < n:
+            kind, tok, start, end = tokens[i]
+            if kind == PUNCT:
+                if tok == '}' and nested:
+                    return i
+                i += 1
+                continue
+            if kind == DIRECTIVE:
+                # directive argument and an optional argument group
+                i += 2
+                if i < n and tokens[i][:2] == (PUNCT, '('):
+                    i = _skip_group(i)
+                continue
+            if kind == VARIABLE:
+                i += 1
+                if i < n and tokens[i][:2] == (PUNCT, ';'):
+                    i += 1
+                continue
+
+            path = prefix + tok
+            if i + 1 < n and tokens[i + 1][:2] == (PUNCT, '{'):
+                close = _parse(i + 2, path + '/', True)
+                entries[path] = EntrySpan(
+                    start, end, tokens[i + 1][2], tokens[close][2], tokens[close][3], True)
+                i = close + 1
+                continue
+
+            j = i + 1
+            depth = 0
+            while j < n:
+                jkind, jtok = tokens[j][:2]
+                if jkind == PUNCT:
+                    if jtok == ';' and depth == 0:
+                        break
+                    if jtok in _OPEN:
+                        depth += 1
+                    elif jtok in _CLOSE:
+                        depth -= 1
+                j += 1
+            if j >= n:
+                raise ValueError("Missing ';' after entry " + repr(path))
+            if j > i + 1:
+                value_start, value_end = tokens[i + 1][2], tokens[j - 1][3]
+            else:
+                value_start = value_end = tokens[j][2]
+            entries[path] = EntrySpan(start, end, value_start, value_end, tokens[j][3], False)
+            i = j + 1
+
+        if nested:
+            raise ValueError("Unexpected end of file: missing '}'")
+        return n
+
+    _parse(0, '', False)
+    return entries
+
+
+def join_tokens(tokens):
+    """
+    Convert a list of value tokens to the string representation
+    printed by foamDictionary, e.g. "(1 2 3)" or "Gauss linear".
+    """
+    if len(tokens) == 1 and tokens[0][0] == STRING:
+        return tokens[0][1][1:-1]
+    parts = []
+    no_space = True
+    for kind, text in tokens:
+        if not no_space and not (kind == PUNCT and text in (')', ']', ';')):
+            parts.append(' ')
+        parts.append(text)
+        no_space = kind == PUNCT and text in ('(', '[')
+    return ''.join(parts)
+
+
+def _case_dir(foam_file):
+    """
+    Guess $FOAM_CASE for a dictionary file: for "case/system/fvSolution"
+    the case directory is the grandparent directory.
+    """
+    return Path(foam_file).resolve().parents[1]
+
+
+def expand_path(path, foam_file=None):
+    """
+    Expand environment variables and '~' in an include path, and resolve
+    relative paths w.r.t. the directory of the including file.
+    $FOAM_CASE defaults to the case directory deduced from foam_file.
+    """
+    path = path.strip('"')
+    if foam_file is not None and 'FOAM_CASE' not in os.environ:
+        case_dir = str(_case_dir(foam_file))
+        path = path.replace('${FOAM_CASE}', case_dir).replace('$FOAM_CASE', case_dir)
+    path = Path(os.path.expanduser(os.path.expandvars(path)))
+    if not path.is_absolute() and foam_file is not None:
+        path = Path(foam_file).resolve().parent / path
+    return path
+
+
+def _etc_file(name):
+    """
+    Locate an OpenFOAM etc file for #includeEtc (requires $WM_PROJECT_DIR).
+    """
+    for var in ('FOAM_ETC', 'WM_PROJECT_DIR'):
+        root = os.environ.get(var)
+        if root is None:
+            continue
+        root = Path(root) if var == 'FOAM_ETC' else Path(root, 'etc')
+        candidate = root / name
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def _read_tokens(path, include_cache, decoder='utf-8'):
+    """
+    Tokenize a file, reusing the tokens stored in include_cache ({path: tokens}).
+    """
+    key = str(path)
+    if key not in include_cache:
+        with open(key, 'r', encoding=decoder) as f:
+            include_cache[key] = tokenize(f.read())
+    return include_cache[key]
+
+
+def _function_template(name, foam_file):
+    """
+    Locate the function object template for #includeFunc: the case system
+    directory is searched first, then etc/caseDicts/postProcessing of the
+    OpenFOAM installation ($FOAM_ETC or $WM_PROJECT_DIR/etc).
+    """
+    if foam_file is not None:
+        candidate = Path(foam_file).resolve().parent / name
+        if candidate.is_file():
+            return candidate
+        candidate = _case_dir(foam_file) / 'system' / name
+        if candidate.is_file():
+            return candidate
+    for var in ('FOAM_ETC', 'WM_PROJECT_DIR'):
+        root = os.environ.get(var)
+        if root is None:
+            continue
+        root = Path(root) if var == 'FOAM_ETC' else Path(root, 'etc')
+        for candidate in sorted(Path(root, 'caseDicts', 'postProcessing').rglob(name)):
+            if candidate.is_file():
+                return candidate
+    return None
+
+
+class _TokenStream:
+    """
+    Token stream with one-token lookahead which splices included files
+    transparently into the stream, at entry and value level alike.
+    """
+
+    def __init__(self, tokens, foam_file, include_cache, decoder):
+        self._stack = [[tokens, 0, foam_file]]
+        self._include_cache = include_cache
+        self._decoder = decoder
+
+    @property
+    def source(self):
+        return self._stack[-1][2]
+
+    def _include(self, directive):
+        frame = self._stack[-1]
+        tokens = frame[0]
+        if frame[1] >= len(tokens):
+            raise ValueError(directive + " without a file name in " + repr(str(self.source)))
+        name = tokens[frame[1]][1]
+        frame[1] += 1
+        if directive == '#includeEtc':
+            path = _etc_file(name.strip('"'))
+        else:
+            path = expand_path(name, self.source)
+            if not path.is_file():
+                path = None
+        if path is None:
+            if directive == '#include':
+                raise FileNotFoundError(
+                    "Included file " + name + " not found (" + repr(str(self.source)) + ").")
+            print("Warning: " + directive + " " + name + " not found. Skipping.")
+            return
+        self._stack.append([_read_tokens(path, self._include_cache, self._decoder), 0, path])
+
+    def peek(self):
+        while self._stack:
+            tokens, pos, _ = self._stack[-1]
+            if pos >= len(tokens):
+                if len(self._stack) == 1:
+                    return None
+                self._stack.pop()
+                continue
+            token = tokens[pos]
+            if token[0] == DIRECTIVE and token[1] in (
+                    '#include', '#includeIfPresent', '#sinclude', '#includeEtc'):
+                self._stack[-1][1] += 1
+                self._include(token[1])
+                continue
+            return token
+        return None
+
+    def next(self):
+        token = self.peek()
+        if token is not None:
+            self._stack[-1][1] += 1
+        return token
+
+
+class DictParser:
+    """
+    Recursive descent parser building a nested python dictionary from
+    OpenFOAM dictionary tokens. Leaf entries are kept as token lists during
+    parsing so that $var references can be spliced in, and are converted to
+    strings by parse().
+    Input:
+        foam_file: path to the dictionary file (used for #include paths and messages).
+        decoder: text encoding of the dictionary and included files.
+        include_cache: optional dict of {path: tokens} shared between parsers.
+    Attributes:
+        unresolved: messages of the constructs which could not be expanded.
+    """
+
+    def __init__(self, foam_file=None, decoder='utf-8', include_cache=None):
+        self.foam_file = foam_file
+        self.decoder = decoder
+        self.include_cache = {} if include_cache is None else include_cache
+        self.unresolved = []
+        self._file_roots = {}
+
+    def parse(self, text):
+        """
+        Parse dictionary text into a nested python dictionary of strings.
+        """
+        return _to_strings(self._parse_root(tokenize(text), self.foam_file))
+
+    def _parse_root(self, tokens, foam_file):
+        stream = _TokenStream(tokens, foam_file, self.include_cache, self.decoder)
+        root = {}
+        self._parse_entries(stream, [root], nested=False)
+        return root
+
+    def _error(self, msg, stream):
+        return ValueError(msg + " (" + repr(str(stream.source)) + ")")
+
+    def _report(self, msg, stream):
+        msg = msg + " (" + repr(str(stream.source)) + ")"
+        self.unresolved.append(msg)
+        print("Warning: " + msg)
+
+    def _parse_entries(self, stream, scopes, nested):
+        current = scopes[-1]
+        while True:
+            token = stream.next()
+            if token is None:
+                if nested:
+                    raise self._error("Unexpected end of file: missing '}'", stream)
+                return
+            kind, text = token
+            if kind == PUNCT:
+                if text == '}' and nested:
+                    return
+                if text == ';':
+                    continue
+                raise self._error("Unexpected " + repr(text), stream)
+            if kind == DIRECTIVE:
+                self._entry_directive(text, stream, scopes)
+                continue
+            if kind == VARIABLE:
+                # dictionary merge, e.g. "$__injector__;"
+                value = self._lookup(text, scopes, stream)
+                if isinstance(value, dict):
+                    _merge(current, copy.deepcopy(value))
+                else:
+                    self._report("unable to merge " + text, stream)
+                nxt = stream.peek()
+                if nxt == (PUNCT, ';'):
+                    stream.next()
+                continue
+
+            key = text
+            nxt = stream.peek()
+            if nxt == (PUNCT, '{'):
+                stream.next()
+                sub = current.get(key)
+                if not isinstance(sub, dict):
+                    sub = {}
+                    current[key] = sub
+                self._parse_entries(stream, scopes + [sub], nested=True)
+            else:
+                current[key] = self._parse_value(stream, scopes)
+
+    def _entry_directive(self, directive, stream, scopes):
+        current = scopes[-1]
+        if directive == '#inputMode':
+            stream.next()
+        elif directive == '#remove':
+            token = stream.next()
+            if token == (PUNCT, '('):
+                names = []
+                token = stream.next()
+                while token is not None and token != (PUNCT, ')'):
+                    names.append(token[1].strip('"'))
+                    token = stream.next()
+            else:
+                names = [token[1].strip('"')]
+            for name in names:
+                current.pop(name, None)
+        else:
+            args = [stream.next()]
+            if stream.peek() == (PUNCT, '('):
+                args += self._group(stream)
+            if directive == '#includeFunc':
+                self._include_func(args, stream, scopes)
+            else:
+                self._report("directive " + directive + " " + join_tokens(args) +
+                             " is not supported and it is skipped", stream)
+
+    def _include_func(self, tokens, stream, scopes):
+        """
+        Expand "#includeFunc name(arg1, key=value, ...)" into a function object
+        sub-dictionary, read from the function object template. Positional
+        arguments are passed as field/fields entries.
+        """
+        call = join_tokens(tokens)
+        m = re.match(r'^\s*([^\s(]+)\s*(?:\((.*)\))?\s*$', call, re.DOTALL)
+        func_name = m.group(1) if m else call
+        template = _function_template(func_name, stream.source)
+        if template is None:
+            self._report("#includeFunc " + call + ": function object template not found", stream)
+            return
+
+        args = {}
+        fields = []
+        for arg in _split_args(m.group(2) or ''):
+            key, sep, value = arg.partition('=')
+            if sep:
+                args[key.strip()] = tokenize(value)
+            else:
+                fields.append(arg)
+
+        func = {}
+        sub_stream = _TokenStream(_read_tokens(template, self.include_cache, self.decoder),
+                                  template, self.include_cache, self.decoder)
+        self._parse_entries(sub_stream, scopes + [dict(args), func], nested=False)
+        if fields:
+            if 'field' in func and len(fields) == 1:
+                args['field'] = tokenize(fields[0])
+            else:
+                args['fields'] = tokenize('(' + ' '.join(fields) + ')')
+        name_tokens = args.pop('name', None)
+        _merge(func, args)
+        if name_tokens is not None:
+            name = join_tokens(name_tokens)
+        elif m.group(2) is not None:
+            name = func_name + '(' + ','.join(_split_args(m.group(2))) + ')'
+        else:
+            name = func_name
+        scopes[-1][name] = func
+
+    def _group(self, stream):
+        """
+        Read a balanced bracketed group of tokens starting from the next token.
+        """
+        tokens = []
+        depth = 0
+        while True:
+            token = stream.next()
+            if token is None:
+                raise self._error("Unbalanced brackets", stream)
+            tokens.append(token)
+            if token[0] == PUNCT:
+                if token[1] in _OPEN:
+                    depth += 1
+                elif token[1] in _CLOSE:
+                    depth -= 1
+            if depth == 0:
+                return tokens
+
+    def _parse_value(self, stream, scopes):
+        tokens = []
+        depth = 0
+        while True:
+            token = stream.next()
+            if token is None:
+                if depth:
+                    raise self._error("Unbalanced brackets", stream)
+                break
+            kind, text = token
+            if kind == PUNCT:
+                if text == ';' and depth == 0:
+                    break
+                if text in _OPEN:
+                    depth += 1
+                elif text in _CLOSE:
+                    depth -= 1
+                    if depth < 0:
+                        raise self._error("Unexpected " + repr(text), stream)
+            elif kind == VARIABLE:
+                value = self._lookup(text, scopes, stream)
+                if isinstance(value, dict):
+                    if tokens or stream.peek() != (PUNCT, ';'):
+                        raise self._error(text + " refers to a dictionary", stream)
+                    stream.next()
+                    return copy.deepcopy(value)
+                if value is not None:
+                    tokens.extend(value)
+                    continue
+                self._report("unable to resolve " + text, stream)
+            elif kind == DIRECTIVE:
+                if text == '#calc':
+                    tokens.extend(self._calc(stream, scopes))
+                    continue
+                self._report("directive " + text + " is not supported and kept as text", stream)
+            tokens.append(token)
+        return tokens
+
+    def _calc(self, stream, scopes):
+        """
+        Evaluate "#calc expression" (quoted, or unquoted up to the end of the
+        entry) and return the result as value tokens.
+        """
+        if stream.peek() is not None and stream.peek()[0] == STRING:
+            expr = stream.next()[1][1:-1]
+        else:
+            expr_tokens = []
+            while stream.peek() is not None and stream.peek() != (PUNCT, ';'):
+                expr_tokens.append(stream.next())
+            expr = ' '.join(text for _, text in expr_tokens)
+
+        values = {}
+
+        def substitute(m):
+            ref = m.group(0)
+            while True:
+                value = self._lookup(ref, scopes, stream)
+                if value is not None and not isinstance(value, dict):
+                    break
+                # e.g. "$a/2": shorten the reference to "$a" and retry
+                cut = max(ref.rfind('/'), ref.rfind('.'))
+                if cut <= 1:
+                    raise ValueError("unable to resolve " + m.group(0))
+                ref = ref[:cut]
+            name = '_v' + str(len(values))
+            values[name] = _to_number(join_tokens(value))
+            return name + m.group(0)[len(ref):]
+
+        try:
+            result = _eval_calc(_CALC_VAR_RE.sub(substitute, expr), values)
+        except (ValueError, TypeError, SyntaxError, ZeroDivisionError) as e:
+            self._report("#calc " + repr(expr) + " could not be evaluated: " + str(e), stream)
+            return [(DIRECTIVE, '#calc'), (STRING, '"' + expr + '"')]
+        return tokenize(_format_number(result))
+
+    def _lookup(self, variable, scopes, stream=None):
+        """
+        Return the entry (token list or dict) referred to by a $var token.
+        Plain names are searched from the inner to the outer scopes. Scoped
+        names are navigated from the root (":a.b", "!a/b", "/a/b"), from
+        parent scopes ("..a", "../a") or from another file ("file!a/b").
+        None is returned if the variable cannot be resolved.
+        """
+        name = variable[1:]
+        if name.startswith('{') and name.endswith('}'):
+            name = name[1:-1]
+        if name.startswith('<'):
+            # typed reference, e.g. $<vector>position
+            name = name[name.find('>') + 1:]
+        if not name.startswith((':', '!', '/', '.')) and '!' not in name:
+            for scope in reversed(scopes):
+                value = _find(scope, name)
+                if value is not None:
+                    return value
+
+        if '!' in name:
+            file_name, name = name.split('!', 1)
+            if file_name:
+                root = self._file_root(file_name, stream, scopes[0])
+                if root is None:
+                    return None
+                scopes = [root]
+            else:
+                scopes = scopes[:1]
+        elif name[:1] in (':', '/'):
+            scopes = scopes[:1]
+            name = name[1:]
+        elif name.startswith('..') and '/' not in name:
+            # old syntax: each additional '.' moves one scope up
+            n_dots = len(name) - len(name.lstrip('.'))
+            scopes = scopes[:max(len(scopes) - n_dots + 1, 1)]
+            name = name[n_dots:]
+
+        parts = [part for part in re.split('/' if '/' in name else r'\.', name) if part]
+        while parts and parts[0] == '..':
+            scopes = scopes[:max(len(scopes) - 1, 1)]
+            parts.pop(0)
+        if not parts:
+            return scopes[-1]
+
+        value = None
+        for scope in reversed(scopes):
+            value = _find(scope, parts[0])
+            if value is not None:
+                break
+        for part in parts[1:]:
+            if not isinstance(value, dict):
+                return None
+            value = _find(value, part)
+        return value
+
+    def _file_root(self, file_name, stream, current_root):
+        """
+        Parsed (token-valued) root dictionary of another file referred to
+        by "$file!entry". The file is searched relative to the current file
+        and in the case system directory.
+        """
+        source = None if stream is None else stream.source
+        path = expand_path(file_name, source)
+        if not path.is_file() and source is not None:
+            path = _case_dir(source) / 'system' / file_name
+        if not path.is_file():
+            return None
+        if source is not None and path.resolve() == Path(source).resolve():
+            return current_root
+        key = str(path)
+        if key not in self._file_roots:
+            self._file_roots[key] = None
+            self._file_roots[key] = self._parse_root(
+                _read_tokens(path, self.include_cache, self.decoder), path)
+        return self._file_roots[key]
+
+
+# $var references within #calc expressions
+_CALC_VAR_RE = re.compile(r'\$(?:\{[^}]*\}|(?:<\w+>)?[\w:!./<>]+)')
+
+# Functions and constants available in #calc expressions
+_CALC_FUNCTIONS = {
+    'mag': lambda x: float(np.linalg.norm(x)),
+    'magSqr': lambda x: float(np.dot(x, x)),
+    'sqr': lambda x: x * x,
+    'sqrt': np.sqrt,
+    'pow': np.power,
+    'exp': np.exp,
+    'log': np.log,
+    'log10': np.log10,
+    'sin': np.sin,
+    'cos': np.cos,
+    'tan': np.tan,
+    'asin': np.arcsin,
+    'acos': np.arccos,
+    'atan': np.arctan,
+    'atan2': np.arctan2,
+    'abs': np.abs,
+    'ceil': np.ceil,
+    'floor': np.floor,
+    # std::round, halfway cases away from zero
+    'round': lambda x: np.sign(x) * np.floor(np.abs(x) + 0.5),
+    'min': np.minimum,
+    'max': np.maximum,
+    'degToRad': np.deg2rad,
+    'radToDeg': np.rad2deg,
+    'vector': lambda x, y, z: np.array([x, y, z], dtype=float),
+}
+_CALC_CONSTANTS = {'pi': math.pi}
+
+_CALC_OPERATORS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.Mod: lambda a, b: a % b,
+    ast.BitAnd: lambda a, b: float(np.dot(a, b)),  # inner product (&)
+    ast.BitXor: lambda a, b: np.cross(a, b),       # cross product (^)
+}
+
+
+def _to_number(value):
+    """
+    Convert a string value to a float or a numpy vector for #calc.
+    """
+    value = value.strip()
+    if value.startswith('(') and value.endswith(')'):
+        return np.array(value[1:-1].split(), dtype=float)
+    return float(value)
+
+
+def _format_number(value):
+    """
+    Format a #calc result as OpenFOAM value text.
+    """
+    if np.ndim(value) > 0:
+        return '(' + ' '.join(_format_number(v) for v in np.ravel(value)) + ')'
+    return '%.12g' % float(value)
+
+
+def _eval_calc(expr, values):
+    """
+    Evaluate an arithmetic #calc expression safely (no python eval). Scalars
+    and vectors are supported with +, -, *, /, & (inner product) and
+    ^ (cross product), parentheses and the functions of _CALC_FUNCTIONS.
+    """
+    # namespaces, e.g. constant::mathematical::pi
+    expr = re.sub(r'\b\w+::', '', expr).strip()
+
+    def evaluate(node):
+        if isinstance(node, ast.Expression):
+            return evaluate(node.body)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return float(node.value)
+        if isinstance(node, ast.Name):
+            if node.id in values:
+                return values[node.id]
+            if node.id in _CALC_CONSTANTS:
+                return _CALC_CONSTANTS[node.id]
+            raise ValueError("unknown name " + repr(node.id))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = evaluate(node.operand)
+            return -operand if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.BinOp) and type(node.op) in _CALC_OPERATORS:
+            return _CALC_OPERATORS[type(node.op)](evaluate(node.left), evaluate(node.right))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in _CALC_FUNCTIONS and not node.keywords):
+            return _CALC_FUNCTIONS[node.func.id](*[evaluate(arg) for arg in node.args])
+        raise ValueError("unsupported expression " + repr(ast.get_source_segment(expr, node)))
+
+    return evaluate(ast.parse(expr, mode='eval'))
+
+
+def _split_args(text):
+    """
+    Split #includeFunc arguments at the top-level commas.
+    """
+    args = []
+    depth = 0
+    quoted = False
+    start = 0
+    for i, c in enumerate(text):
+        if c == '"':
+            quoted = not quoted
+        elif not quoted and c in '([':
+            depth += 1
+        elif not quoted and c in ')]':
+            depth -= 1
+        elif not quoted and c == ',' and depth == 0:
+            args.append(text[start:i].strip())
+            start = i + 1
+    args.append(text[start:].strip())
+    return [arg for arg in args if arg]
+
+
+def _find(scope, name):
+    """
+    Find an entry by name, matching also the regular expression keys
+    (e.g. "(U|k|omega)") in reverse order as OpenFOAM does.
+    """
+    if name in scope:
+        return scope[name]
+    for key in reversed(list(scope)):
+        if key.startswith('"') and key.endswith('"') and len(key) > 1:
+            try:
+                if re.fullmatch(key[1:-1], name):
+                    return scope[key]
+            except re.error:
+                continue
+    return None
+
+
+def _merge(target, source):
+    """
+    Merge source dictionary into target recursively (OpenFOAM merge mode).
+    """
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+def _to_strings(d):
+    """
+    Convert leaf token lists to strings recursively.
+    """
+    return {key: _to_strings(value) if isinstance(value, dict) else join_tokens(value)
+            for key, value in d.items()}
+
+
+def parse_string(text, foam_file=None, decoder='utf-8'):
+    """
+    Parse OpenFOAM dictionary text into a nested python dictionary of strings.
+    Input:
+        text: dictionary content.
+        foam_file: optional path of the file, used to resolve #include paths.
+    Return:
+        python dictionary with string-valued entries.
+    """
+    return DictParser(foam_file, decoder).parse(text)
+
+
+def parse_file(foam_file, decoder='utf-8', include_cache=None):
+    """
+    Read and parse an OpenFOAM dictionary file in a single pass.
+    Input:
+        foam_file: path to OpenFOAM dictionary file.
+        decoder: text encoding of the file.
+        include_cache: optional dict of {path: tokens} to share included files between calls.
+    Return:
+        python dictionary with string-valued entries.
+    """
+    foam_file = Path(foam_file)
+    with open(str(foam_file), 'r', encoding=decoder) as f:
+        text = f.read()
+    return DictParser(foam_file, decoder, include_cache).parse(text)
+
+
+class _LazyFallback(Exception):
+    """
+    Raised when a dictionary level cannot be split into entries without
+    evaluating macros or directives.
+    """
+
+
+def _scan_entries(text, start, end):
+    """
+    Split the dictionary text[start:end] into entries by scanning only the
+    structural characters (braces, brackets and semicolons).
+    Return:
+        dictionary of {key: (value_start, value_end, is_dict)}, where for
+        sub-dictionaries the value range is the content between the braces.
+    """
+    entries = {}
+    depth = 0
+    entry_start = start
+    body_start = None
+    for m in _STRUCT_RE.finditer(text, start, end):
+        c = m.group()
+        if len(c) > 1:
+            # comment or string
+            continue
+        if c in '([{':
+            if depth == 0 and c == '{':
+                body_start = m.end()
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+            if depth == 0 and c == '}' and body_start is not None:
+                _add_scanned(entries, text, entry_start, body_start - 1, body_start, m.start(), True)
+                entry_start = m.end()
+                body_start = None
+        elif c == ';' and depth == 0:
+            _add_scanned(entries, text, entry_start, m.start(), None, m.start(), False)
+            entry_start = m.end()
+    if text[entry_start:end].strip() and tokenize(text[entry_start:end]):
+        raise _LazyFallback()
+    return entries
+
+
+def _add_scanned(entries, text, entry_start, key_end, body_start, value_end, is_dict):
+    m = _TOKEN_RE.match(text, entry_start)
+    while m is not None and m.lastgroup == 'skip':
+        m = _TOKEN_RE.match(text, m.end())
+    if m is None or m.start() >= key_end:
+        # stray ';'
+        return
+    kind = m.lastgroup
+    if kind not in (WORD, STRING) or m.group() in entries:
+        # macros, directives and repeated keys require full parsing
+        raise _LazyFallback()
+    key_stop = m.end()
+    if kind == WORD and key_stop < len(text) and text[key_stop] == '(':
+        key_stop = _extend_word(text, m.start(), key_stop)
+    key = text[m.start():key_stop]
+    if is_dict:
+        if tokenize(text[key_stop:key_end]):
+            raise _LazyFallback()
+        entries[key] = (body_start, value_end, True)
+    else:
+        entries[key] = (key_stop, value_end, False)
+
+
+class LazyDict(Mapping):
+    """
+    Read-only mapping over OpenFOAM dictionary text, which tokenizes and converts
+    an entry only when it is first accessed. Results are memoized. Nested
+    dictionaries are returned as LazyDict objects as well, and slash-separated
+    paths such as d["valves/intakeValve/minGap"] are accepted.
+
+    Dictionary levels using macros or directives (e.g. $var, #include) are
+    parsed eagerly as a whole file with DictParser.
+    Input:
+        text: dictionary content.
+        foam_file: path of the file (used to resolve #include paths).
+        convert: optional function converting leaf strings, e.g. infer_datatype.
+        decoder: text encoding of the included files.
+    """
+
+    def __init__(self, text, foam_file=None, convert=None, decoder='utf-8',
+                 _root=None, _path='', _span=None):
+        self._text = text
+        self._foam_file = foam_file
+        self._convert = convert
+        self._decoder = decoder
+        self._root = self if _root is None else _root
+        self._path = _path
+        self._span = (0, len(text)) if _span is None else _span
+        self._entries = None
+        self._values = {}
+        self._eager = None
+
+    @classmethod
+    def from_file(cls, foam_file, convert=None, decoder='utf-8'):
+        """
+        Create a lazy dictionary of an OpenFOAM dictionary file. Only the file
+        content is read at this point.
+        """
+        with open(str(foam_file), 'r', encoding=decoder) as f:
+            text = f.read()
+        return cls(text, Path(foam_file), convert, decoder)
+
+    def _eager_dict(self):
+        """
+        Fully parsed (string-valued) dictionary of this level.
+        """
+        root = self._root
+        if root._eager is None:
+            root._eager = DictParser(root._foam_file, root._decoder).parse(root._text)
+        d = root._eager
+        for key in self._path.split('/') if self._path else []:
+            d = d[key]
+        return d
+
+    def _scan(self):
+        if self._entries is None:
+            try:
+                self._entries = _scan_entries(self._text, *self._span)
+            except _LazyFallback:
+                self._entries = {key: None for key in self._eager_dict()}
+        return self._entries
+
+    def _convert_value(self, value):
+        if isinstance(value, dict):
+            return {key: self._convert_value(subvalue) for key, subvalue in value.items()}
+        return value if self._convert is None else self._convert(value)
+
+    def _load(self, key):
+        span = self._scan()[key]
+        path = self._path + '/' + key if self._path else key
+        if span is None:
+            return self._convert_value(self._eager_dict()[key])
+        value_start, value_end, is_dict = span
+        if is_dict:
+            return LazyDict(self._text, self._foam_file, self._convert, self._decoder,
+                            _root=self._root, _path=path, _span=(value_start, value_end))
+        tokens = tokenize(self._text[value_start:value_end])
+        if any(kind in (VARIABLE, DIRECTIVE) for kind, _ in tokens):
+            return self._convert_value(self._eager_dict()[key])
+        return self._convert_value(join_tokens(tokens))
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key not in self._scan():
+                if '/' in key:
+                    head, tail = key.split('/', 1)
+                    value = self[head]
+                    if not isinstance(value, Mapping):
+                        raise KeyError(key)
+                    return value[tail]
+                raise KeyError(key)
+            self._values[key] = self._load(key)
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._scan())
+
+    def __len__(self):
+        return len(self._scan())
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __repr__(self):
+        return "LazyDict(" + repr(str(self._root._foam_file)) + ", " + repr(self._path) + ")"
+
+    def to_dict(self):
+        """
+        Materialize the whole (sub-)dictionary as nested python dictionaries.
+        """
+        return {key: value.to_dict() if isinstance(value, LazyDict) else value
+                for key, value in self.items()}
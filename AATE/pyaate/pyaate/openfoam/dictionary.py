@@ -1,24 +1,41 @@
 """
 Various functions enabling reading and writing entries of OpenFOAM dictionary files.
-Note, using some functionalities require OpenFOAM to be installed and sourced due
+Dictionaries are read by a native Python parser (see dict_parser.py). Note, using
+the foamDictionary backend requires OpenFOAM to be installed and sourced due
 to system calls to foamDictionary utility.
 """
+import contextlib
+import gzip
+import io
 import json
 import os
 import re
 import subprocess
 import sys
+import time
+from collections.abc import Mapping
 from pathlib import Path
 from typing import Any
 
 import numpy as np
 import pandas as pd
 
+from pyaate.openfoam import dict_cache
+from pyaate.openfoam import dict_parser
+
 # Constants (FOAM switches)
 _TRUE_VALUES = ("yes", "on", "true", "1")
 _FALSE_VALUES = ("no", "off", "false", "0")
 _BOOLEAN_VALUES = _TRUE_VALUES + _FALSE_VALUES
 
+# Cache of parsed dictionaries used by read_dict()
+_dict_cache = dict_cache.DictCache(cache_dir=os.environ.get("PYAATE_DICT_CACHE"))
+
+# read_dict() statistics per backend: number of reads, subprocesses and wall time
+_READ_BACKENDS = ('python', 'foamDictionary', 'foamBatch')
+_backend_stats = {}
+_subprocess_count = 0
+
 
 def foam_found(var: str = "FOAM_INST_DIR") -> bool:
     """
@@ -28,6 +45,16 @@ def foam_found(var: str = "FOAM_INST_DIR") -> bool:
     return var in os.environ
 
 
+def _foam_dictionary(args, **kwargs) -> bytes:
+    """
+    Run foamDictionary with the given arguments and return its output.
+    The calls are counted for backend_stats().
+    """
+    global _subprocess_count
+    _subprocess_count += 1
+    return subprocess.check_output(['foamDictionary'] + args, **kwargs)
+
+
 def traverse_dict(dict_file, key_parent, decoder='utf-8') -> Any:
     """
     Recursive dictionary traverse function returning a string representation
@@ -40,9 +67,8 @@ def traverse_dict(dict_file, key_parent, decoder='utf-8') -> Any:
             or a sub-dictionary with string entries.
     """
     try:
-        keywords = subprocess.check_output(
-            ['foamDictionary', '-entry', key_parent,
-                '-keywords', str(dict_file)],
+        keywords = _foam_dictionary(
+            ['-entry', key_parent, '-keywords', str(dict_file)],
             stderr=subprocess.STDOUT).splitlines()
         value = {}
         for subkey in keywords:
@@ -51,8 +77,7 @@ def traverse_dict(dict_file, key_parent, decoder='utf-8') -> Any:
             subvalue = traverse_dict(dict_file, subkey_path)
             value[subkey.rsplit('/', 1)[-1]] = subvalue
     except subprocess.CalledProcessError:
-        value = subprocess.check_output(
-            ['foamDictionary', '-entry', key_parent, '-value', str(dict_file)])
+        value = _foam_dictionary(['-entry', key_parent, '-value', str(dict_file)])
 
         # Decode bytes to string + strip whitespace
         value = value.decode(decoder).strip()
@@ -64,45 +89,294 @@ def traverse_dict(dict_file, key_parent, decoder='utf-8') -> Any:
 
 
 def read_dict(foam_file: Path, python_types: bool = False, decoder: str = 'utf-8',
-              expand: bool = False) -> dict:
+              expand: bool = False, backend: str = 'python', cache: bool = True,
+              lazy: bool = False) -> dict:
     """
     Reads an OpenFOAM dictionary file and converts it to python dictionary.
-    Requires functinal OpenFOAM  installation.
 
     Input:
         foam_file: Path object to OpenFOAM dictionary file, such as fvSolution.
         python_types: converts string values to python datatypes.
-        decoder: decoder type to interpret foamDictionary output.
-        expand: calls foamDictionary with -expand argument to parse macro syntax
+        decoder: decoder type to interpret the file (foamDictionary output).
+        expand: calls foamDictionary with -expand argument to parse macro syntax.
+            The python backend always expands the supported macro syntax
+            ($var, #include, #calc, #includeFunc, see dict_parser.py) without
+            OpenFOAM; constructs it cannot expand are reported as warnings.
+        backend: 'python' for the native single-pass parser (default),
+            'foamDictionary' for entry-by-entry foamDictionary calls, or
+            'foamBatch' for a single "foamDictionary -expand" call parsed by the
+            python parser. The latter two require a functional OpenFOAM installation.
+        cache: reuse a previously parsed dictionary if the file (or its included
+            files) has not changed. See configure_cache() and cache_info(). With
+            the OpenFOAM backends, the included files are found by the python
+            parser, and the result is not cached if it cannot resolve them.
+        lazy: return a read-only mapping (dict_parser.LazyDict) which parses and
+            converts the entries only when accessed. Accepts slash-separated keys,
+            e.g. d["valves/intakeValve/minGap"]. Python backend only, not cached.
 
     Returns:
         py_dict: python dictionary with OpenFOAM dictionary entries.
     """
+    if not isinstance(foam_file, Path):
+        foam_file = Path(foam_file)
+
+    if lazy:
+        if backend != 'python':
+            raise ValueError("read_dict(lazy=True) requires the python backend.")
+        convert = infer_datatype if python_types else None
+        return dict_parser.LazyDict.from_file(foam_file, convert=convert, decoder=decoder)
+
+    if cache:
+        key = (str(foam_file.resolve()), python_types, decoder, expand, backend)
+        py_dict = _dict_cache.get(key)
+        if py_dict is not None:
+            return py_dict
+
+    if backend not in _READ_BACKENDS:
+        raise ValueError("Unknown read_dict() backend: " + repr(backend))
+
+    t0 = time.perf_counter()
+    n0 = _subprocess_count
+    dep_files = [foam_file]
+    if backend == 'python':
+        include_cache = {}
+        py_dict = dict_parser.parse_file(foam_file, decoder=decoder, include_cache=include_cache)
+        dep_files += list(include_cache)
+    else:
+        if backend == 'foamDictionary':
+            py_dict = _read_dict_foam(foam_file, decoder, expand)
+        else:
+            py_dict = _read_dict_foam_batch(foam_file, decoder)
+        if cache:
+            include_files = _include_files(foam_file, decoder)
+            if include_files is None:
+                # included files unknown: an edit of them could not be detected
+                cache = False
+            else:
+                dep_files += include_files
+
+    stats = _backend_stats.setdefault(backend, {'reads': 0, 'subprocesses': 0, 'wall_time': 0.0})
+    stats['reads'] += 1
+    stats['subprocesses'] += _subprocess_count - n0
+    stats['wall_time'] += time.perf_counter() - t0
+
+    if python_types:
+        py_dict = to_python_types(py_dict)
+
+    if cache:
+        _dict_cache.put(key, dep_files, py_dict)
+
+    return py_dict
+
+
+def _include_files(foam_file: Path, decoder: str = 'utf-8') -> list:
+    """
+    Return the files included by a dictionary (#include, #includeFunc, etc.),
+    found by the python parser, as cache dependencies of the OpenFOAM backends.
+    None is returned if the parser cannot resolve the dictionary completely.
+    """
+    include_cache = {}
+    parser = dict_parser.DictParser(foam_file, decoder, include_cache)
+    try:
+        with open(str(foam_file), 'r', encoding=decoder) as f:
+            text = f.read()
+        # the backend output is used: unsupported syntax is not reported here
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser.parse(text)
+    except (ValueError, OSError):
+        return None
+    if parser.unresolved:
+        return None
+    return list(include_cache)
+
+
+def configure_cache(max_entries: int = None, cache_dir: Path = None, use_hash: bool = None):
+    """
+    Configure the read_dict() cache.
+
+    Args:
+        max_entries (int): Maximum number of dictionaries kept in memory.
+        cache_dir (Path): Directory of the on-disk pickle store shared between
+            processes. Set to False to disable the on-disk store.
+        use_hash (bool): Validate cached entries by content hash instead of
+            file size and modification time.
+    """
+    if max_entries is not None:
+        _dict_cache.max_entries = max_entries
+    if cache_dir is not None:
+        _dict_cache.cache_dir = Path(cache_dir) if cache_dir else None
+    if use_hash is not None:
+        _dict_cache.use_hash = use_hash
+
+
+def cache_info() -> dict:
+    """
+    Return read_dict() cache statistics, i.e. hits, disk_hits, misses and entries.
+    """
+    return _dict_cache.info()
+
+
+def clear_cache(disk: bool = False):
+    """
+    Clear the read_dict() cache and its statistics.
+
+    Args:
+        disk (bool): Remove also the on-disk pickle store entries.
+    """
+    _dict_cache.clear(disk=disk)
+
+
+def _read_dict_foam(foam_file: Path, decoder: str = 'utf-8', expand: bool = False) -> dict:
+    """
+    Reads an OpenFOAM dictionary file entry by entry using foamDictionary.
+    Requires functional OpenFOAM installation.
+    """
     if not foam_found():
         raise RuntimeError(
             "read_dict() requires OpenFOAM installation which is not available.")
 
-    if not isinstance(foam_file, Path):
-        foam_file = Path(foam_file)
-
     py_dict = {}
 
     if expand:
         new_file = foam_file.with_suffix(foam_file.suffix + ".expanded")
-        subprocess.call(['foamDictionary', '-expand', str(foam_file), '-output', str(new_file)])
+        _foam_dictionary(['-expand', str(foam_file), '-output', str(new_file)])
         foam_file = new_file
 
-    keywords = subprocess.check_output(['foamDictionary', '-keywords', str(foam_file)],stderr=subprocess.STDOUT).splitlines()
+    keywords = _foam_dictionary(['-keywords', str(foam_file)], stderr=subprocess.STDOUT).splitlines()
     for key in keywords:
         key = key.decode(decoder)
         py_dict[key] = traverse_dict(foam_file, key)
 
-    if python_types:
-        return to_python_types(py_dict)
-
     return py_dict
 
 
+def _read_dict_foam_batch(foam_file: Path, decoder: str = 'utf-8') -> dict:
+    """
+    Reads an OpenFOAM dictionary file by a single "foamDictionary -expand" call
+    writing to stdout, and parses the output with the python parser. Hence, the
+    OpenFOAM-only syntax (e.g. #calc, #codeStream) is evaluated by OpenFOAM while no
+    intermediate file is written. Requires functional OpenFOAM installation.
+    """
+    if not foam_found():
+        raise RuntimeError(
+            "read_dict() requires OpenFOAM installation which is not available.")
+
+    text = _foam_dictionary(['-expand', str(foam_file)]).decode(decoder)
+    return dict_parser.parse_string(text, foam_file, decoder)
+
+
+def backend_stats() -> dict:
+    """
+    Return read_dict() statistics per backend, e.g.
+    {'foamDictionary': {'reads': 1, 'subprocesses': 214, 'wall_time': 5.3}}.
+    Cache hits are not included.
+    """
+    return {key: dict(value) for key, value in _backend_stats.items()}
+
+
+def reset_backend_stats():
+    """
+    Reset read_dict() backend statistics.
+    """
+    _backend_stats.clear()
+
+
+def check_backends(foam_file: Path, decoder: str = 'utf-8') -> dict:
+    """
+    Cross-check the python parser against foamDictionary. Requires functional
+    OpenFOAM installation.
+
+    Args:
+        foam_file (Path): Path to OpenFOAM dictionary file.
+        decoder (str): decoder type to interpret the file.
+
+    Returns:
+        dict: Differing entries as {"path/to/key": (python_value, foam_value)}.
+            An empty dictionary means that both backends agree.
+    """
+    py_dict = flatten_dictionary(read_dict(foam_file, decoder=decoder, backend='python'))
+    foam_dict = flatten_dictionary(read_dict(foam_file, decoder=decoder, backend='foamDictionary'))
+
+    diff = {}
+    for key in set(py_dict) | set(foam_dict):
+        py_value = py_dict.get(key)
+        foam_value = foam_dict.get(key)
+        # compare ignoring whitespace, since foamDictionary prints lists on multiple lines
+        if py_value is None or foam_value is None or \
+                ''.join(py_value.split()) != ''.join(foam_value.split()):
+            diff[key] = (py_value, foam_value)
+    return diff
+
+
+# Precompiled patterns for type inference
+_INT_RE = re.compile(r'^\s*[-+]?\d+\s*$')
+_FLOAT_RE = re.compile(
+    r'^\s*[-+]?((\d+\.?\d*|\.\d+)([eE][-+]?\d+)?|inf|infinity|nan)\s*$', re.IGNORECASE)
+_QUOTED_RE = re.compile(r'^\s*"(.*)"\s*$', re.DOTALL)
+_LIST_COUNT_RE = re.compile(r'^\d+\s*(?=\()')
+_TABLE_PREFIX = "table "
+_PARENS = str.maketrans("()", "  ")
+
+
+def _row_lengths(inner: str) -> Any:
+    """ Number of items in each parenthesised row of a nested list string,
+    computed on the character array without a Python-level loop.
+    Returns None if the nesting is deeper than one level or if items are
+    found outside the rows. """
+    chars = np.frombuffer(inner.encode('utf-8'), dtype=np.uint8)
+    is_open = chars == ord('(')
+    is_close = chars == ord(')')
+    depth = np.cumsum(is_open.view(np.int8) - is_close.view(np.int8), dtype=np.int32)
+    if depth.min() < 0 or depth.max() > 1 or depth[-1] != 0:
+        return None
+    # item: first non-whitespace, non-parenthesis character of a word
+    is_item = (chars > 32) & ~is_open & ~is_close
+    starts = is_item.copy()
+    starts[1:] &= ~is_item[:-1]
+    starts = np.flatnonzero(starts)
+    if (depth[starts] == 0).any():
+        return None
+    open_pos = np.flatnonzero(is_open)
+    row_ids = np.searchsorted(open_pos, starts, side='right') - 1
+    return np.bincount(row_ids, minlength=len(open_pos))
+
+
+def parse_numeric_list(value: str) -> Any:
+    """ Convert an OpenFOAM list string into a numpy array in one vectorized parse.
+
+    Flat lists "(x y z)" or "[x y z]" become 1-D arrays and lists of equally
+    sized sub-lists, e.g. tables "((t0 v0) (t1 v1) ...)", become contiguous
+    2-D arrays. Optional list size prefix, e.g. "3(x y z)", is accepted.
+
+    Args:
+        value (str): String value from a FOAM dictionary
+
+    Returns:
+        Any: numpy array, or None if the value is not a numeric list
+            (e.g. a list of words or a ragged nested list).
+    """
+    value = _LIST_COUNT_RE.sub('', value.strip(), count=1)
+    if len(value) < 2 or (value[0], value[-1]) not in (('(', ')'), ('[', ']')):
+        return None
+    inner = value[1:-1]
+    n_rows = inner.count('(')
+    try:
+        data = np.array(inner.translate(_PARENS).split(), dtype=float)
+    except ValueError:
+        return None
+    if n_rows == 0:
+        if '[' in inner or ')' in inner:
+            return None
+        return data
+    if data.size % n_rows != 0 or data.size == 0:
+        return None
+    n_cols = data.size // n_rows
+    lengths = _row_lengths(inner)
+    if lengths is None or (lengths != n_cols).any():
+        return None
+    return data.reshape(n_rows, n_cols)
+
+
 def _handle_str(value: str) -> Any:
     """ Handle a string value from a FOAM dictionary.
 
@@ -112,24 +386,29 @@ def _handle_str(value: str) -> Any:
     Returns:
         Any: String value converted to a Python datatype
     """
-    if value.strip().lower() in _BOOLEAN_VALUES:
+    lower = value.strip().lower()
+    if lower in _BOOLEAN_VALUES:
         # Boolean value: convert to Python bool
-        return value.strip().lower() in _TRUE_VALUES
+        return lower in _TRUE_VALUES
 
     # Remove leading/trailing quotes if they exist
-    value = re.sub(r'^\s*"(.*)"\s*$', r'\1', value)
+    value = _QUOTED_RE.sub(r'\1', value)
 
     # If value is 'none', return None
     if value.strip().lower() == "none":
         return None
 
-    # Check if OpenFOAM vector representation
-    if value.startswith("(") and value.endswith(")"):
-        return np.fromstring(value[1:-1], dtype=float, sep=' ')
+    # Function1 table, e.g. "table ((0 1) (1 2))": convert the table data
+    if value.startswith(_TABLE_PREFIX):
+        array = parse_numeric_list(value[len(_TABLE_PREFIX):])
+        if array is not None and array.ndim == 2:
+            return array
 
-    # Check if this value is an OpenFOAM list
-    if value.startswith("[") and value.endswith("]"):
-        return np.fromstring(value[1:-1], dtype=float, sep=' ')
+    # Check if OpenFOAM vector, list (nested list) or dimension set representation
+    if value.endswith(")") or value.endswith("]"):
+        array = parse_numeric_list(value)
+        if array is not None:
+            return array
 
     return value.strip()
 
@@ -139,11 +418,12 @@ def infer_datatype(foam_value: str) -> Any:
 
     Fundamentally, strings are converted into one of the following datatypes,
     in the following order:
-      int: if int() does not raise a ValueError
-      float: if float() does not raise a ValueError
+      int: if matching an integer pattern
+      float: if matching a floating point pattern
       bool: from foam switches (see _BOOLEAN_VALUES)
       None: from "none"
-      numpy array: from "(x y z)" or "[x y z]"
+      numpy array: from "(x y z)", "[x y z]", nested lists of equal length
+                   such as "((x0 y0) (x1 y1))", or "table ((x0 y0) (x1 y1))"
       str: all other values
 
     Args:
@@ -152,16 +432,13 @@ def infer_datatype(foam_value: str) -> Any:
     Returns:
         Any: A Python datatype
     """
-    try:
+    if not isinstance(foam_value, str):
+        return foam_value
+    if _INT_RE.match(foam_value):
         return int(foam_value)
-    except ValueError:
-        try:
-            return float(foam_value)
-        except ValueError:
-            if isinstance(foam_value, str):
-                return _handle_str(foam_value)
-
-            return foam_value
+    if _FLOAT_RE.match(foam_value):
+        return float(foam_value)
+    return _handle_str(foam_value)
 
 
 def to_python_types(dictionary: dict) -> dict:
@@ -175,7 +452,7 @@ def to_python_types(dictionary: dict) -> dict:
     - booleans (from foam switch values)
     - Nonetypes ("none")
     - arrays ("(x y z)" or "[x y z]")
-      - WARN: no support for nested arrays, TODO/FUTURE
+    - 2-D arrays from nested lists and tables ("((x0 y0) (x1 y1))")
 
     Input:
         dictionary: Python dictionary generated by read_dict()
@@ -189,8 +466,7 @@ def to_python_types(dictionary: dict) -> dict:
             continue
 
         # Terminal value: infer Pythonic datatype
-        value = infer_datatype(foam_value=value)
-        dictionary.update({key: value})
+        dictionary[key] = infer_datatype(foam_value=value)
 
     return dictionary
 
@@ -212,7 +488,7 @@ def flatten_dictionary(d: dict) -> dict:
     """
     out = {}
     for key, val in d.items():
-        if isinstance(val, dict):
+        if isinstance(val, Mapping):
             val = flatten_dictionary(val)
             for subkey, subval in val.items():
                 out[key + "/" + subkey] = subval
@@ -238,7 +514,7 @@ def pretty_print(dictionary: dict):
         Returns:
             Any: _description_
         """
-        if isinstance(data, dict):
+        if isinstance(data, Mapping):
             return {k: serializable_array(v) for k, v in data.items()}
         elif isinstance(data, list):
             return [serializable_array(v) for v in data]
@@ -282,7 +558,79 @@ def csv_ok(self, csv_file, iloc_time, iloc_val) -> bool:
         sys.exit(1)
 
 
-def write_injection_model(t, vfr, duration, mass_total, liquid_density, d, p_inj, Cd, output="volumeFlowRate_singlehole.foam", comment=''):
+# Number of table rows formatted per chunk in write_table()
+_TABLE_CHUNK_ROWS = 100000
+
+
+def format_table(data, row_format: str = None, fmt: str = '%.6e', sep: str = '  ') -> str:
+    """
+    Format a whole array into OpenFOAM table rows with a single string
+    formatting operation per chunk, instead of one write per row.
+    Input:
+        data: 1D array (one column) or 2D array of shape (rows, columns).
+        row_format: printf-style format of one row, e.g. '( %12.4e  %12.4e )'.
+            If None, the row is composed of fmt per column joined by sep
+            within parentheses (one column rows are written without them).
+        fmt: printf-style format of a single value.
+        sep: separator between the columns.
+    Return:
+        string with one row per line (newline terminated).
+    """
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data[:, None]
+    n_rows, n_cols = data.shape
+    if row_format is None:
+        row_format = sep.join([fmt] * n_cols)
+        if n_cols > 1:
+            row_format = '(' + row_format + ')'
+    if n_rows == 0:
+        return ''
+    # tolist() yields python scalars which format considerably faster
+    return ((row_format + '\n') * n_rows) % tuple(data.ravel().tolist())
+
+
+def _open_output(output, compress: bool = False):
+    """
+    Open a text file for writing, gzip-compressed if compress is True.
+    OpenFOAM reads "file.gz" transparently when "file" is requested.
+    Return:
+        (file object, path of the written file)
+    """
+    output = str(output)
+    if compress:
+        if not output.endswith('.gz'):
+            output = output + '.gz'
+        return gzip.open(output, 'wt', compresslevel=6), output
+    return open(output, 'w'), output
+
+
+def write_table(output, data, row_format: str = None, fmt: str = '%.6e', header: str = '',
+                footer: str = '', compress: bool = False) -> str:
+    """
+    Write an array as an OpenFOAM table (or plain list) file. Rows are formatted
+    in chunks by format_table().
+    Input:
+        output: path to the output file.
+        data: 1D or 2D array of table rows.
+        row_format, fmt: see format_table().
+        header: text written before the rows, e.g. 'flowRateProfile table\n(\n'.
+        footer: text written after the rows, e.g. ');\n'.
+        compress: write gzip-compressed output (".gz" appended to the file name).
+    Return:
+        path of the written file.
+    """
+    data = np.asarray(data)
+    f, output = _open_output(output, compress)
+    with f:
+        f.write(header)
+        for i in range(0, max(len(data), 1), _TABLE_CHUNK_ROWS):
+            f.write(format_table(data[i:i + _TABLE_CHUNK_ROWS], row_format, fmt))
+        f.write(footer)
+    return output
+
+
+def write_injection_model(t, vfr, duration, mass_total, liquid_density, d, p_inj, Cd, output="volumeFlowRate_singlehole.foam", comment='', compress=False):
     """
     Write ConeInjection model related sub-dictionary entries.
     inputs:
@@ -294,6 +642,8 @@ def write_injection_model(t, vfr, duration, mass_total, liquid_density, d, p_inj
     - d: nozzle hole diameter [m]
     - SOI: start of injection [s]
     - EOI: end of injection [s]
+    - compress: write gzip-compressed output (output + ".gz")
+    returns the path of the written file.
     """
 
     # OpenFOAM uses duration to integrate totalMass
@@ -316,27 +666,23 @@ def write_injection_model(t, vfr, duration, mass_total, liquid_density, d, p_inj
     Aref = np.pi * 0.25 * d ** 2
     u_max = max(mfr_scaled / (liquid_density * Aref))
 
-    with open(output, 'w') as f:
-        f.write(
-            '/*--------------------------------*- C++ -*----------------------------------*\\\n')
-        f.write(' Volume flow rate profile (computed from mass flow rate profile)\n')
-        f.write(' Fuel density: %f kg/m3\n' % (liquid_density))
-        f.write(' Injection pressure (nominal): %.1f bar\n' % (p_inj / 1e5))
-        f.write(
-            ' Injection velocity (w.r.t. maximum mass flow rate): %.1f m/s\n' %
-            (u_max))
-        f.write(comment)
-        f.write(r'/*---------------------------------------------------------------------------*/\n\n')
-        f.write('massTotal       %.4fe-6;\n' % (mass_total * 1e6))
-        f.write('dInner          0.0;\n')
-        f.write('dOuter          %.4fe-6;\n' % (d * 1e6))
-        f.write('Cd              constant %g;\n' % (Cd))
-        f.write('duration        %g;\n' % (duration))
-        f.write('flowRateProfile table\n')
-        f.write('(\n')
-        for i in range(len(t)):
-            f.write('    ( %12.4e  %12.4e )\n' % (t[i], vfr[i]))
-        f.write(');\n')
+    header = (
+        '/*--------------------------------*- C++ -*----------------------------------*\\\n'
+        ' Volume flow rate profile (computed from mass flow rate profile)\n'
+        ' Fuel density: %f kg/m3\n' % (liquid_density) +
+        ' Injection pressure (nominal): %.1f bar\n' % (p_inj / 1e5) +
+        ' Injection velocity (w.r.t. maximum mass flow rate): %.1f m/s\n' % (u_max) +
+        comment +
+        '/*---------------------------------------------------------------------------*/\n\n'
+        'massTotal       %.4fe-6;\n' % (mass_total * 1e6) +
+        'dInner          0.0;\n'
+        'dOuter          %.4fe-6;\n' % (d * 1e6) +
+        'Cd              constant %g;\n' % (Cd) +
+        'duration        %g;\n' % (duration) +
+        'flowRateProfile table\n'
+        '(\n')
+    return write_table(output, np.column_stack((t, vfr)), row_format='    ( %12.4e  %12.4e )',
+                       header=header, footer=');\n', compress=compress)
 
 
 def write_hole_info(injector, inj_directions, output_file, flow_rate_file=None):
@@ -431,3 +777,234 @@ def float_to_foam_str(values: list):
     for i, v in enumerate(values):
         names[i] = '{0:g}'.format(v)
     return names
+
+
+def to_foam_str(value: Any) -> str:
+    """ Format a Python value as an OpenFOAM dictionary entry value.
+
+    Args:
+        value (Any): str, number, bool, None, list/tuple/numpy array (nested
+            sequences are written as nested lists).
+
+    Returns:
+        str: e.g. "0.00045", "true", "(0 0 1)" or "((0 1) (1 2))"
+    """
+    if isinstance(value, (bool, np.bool_)):
+        return "true" if value else "false"
+    if value is None:
+        return "none"
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return "(" + " ".join(to_foam_str(v) for v in value) + ")"
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    return str(value)
+
+
+class FoamDictEditor:
+    """
+    Edit an OpenFOAM dictionary file in place, as a batch replacement for
+    "foamDictionary -entry path/to/key -set value" calls. The file is read once,
+    the queued operations are applied to the text, and the file is written once
+    atomically. Comments and formatting of the untouched entries are retained.
+
+    Example:
+        with FoamDictEditor("system/functions") as editor:
+            editor.set("fluidMaxDeltaT/EVO", 135.02)
+            editor.set("fluidMaxDeltaT/maxDeltaT/type", "uniform")
+            editor.add("fluidMaxDeltaT/maxDeltaT/value", "$dT")
+            editor.remove("fluidMaxDeltaT/IVC")
+
+    Input:
+        foam_file: path to OpenFOAM dictionary file.
+        decoder: text encoding of the file.
+    """
+    _INDENT = "    "
+
+    def __init__(self, foam_file: Path, decoder: str = 'utf-8'):
+        self.foam_file = Path(foam_file)
+        self.decoder = decoder
+        with open(str(self.foam_file), 'r', encoding=decoder) as f:
+            self.text = f.read()
+        self.operations = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.write()
+
+    def set(self, path: str, value: Any):
+        """ Queue setting the value of an entry. Missing entries (and their
+        parent dictionaries) are added. A dictionary value replaces the entry. """
+        self.operations.append(('set', path, value))
+        return self
+
+    def add(self, path: str, value: Any):
+        """ Queue adding an entry. A dictionary value is merged into an
+        existing sub-dictionary, otherwise add equals set. """
+        self.operations.append(('add', path, value))
+        return self
+
+    def remove(self, path: str):
+        """ Queue removing an entry. Missing entries are ignored. """
+        self.operations.append(('remove', path, None))
+        return self
+
+    def apply(self, operations: list):
+        """ Queue a batch of (operation, path, value) tuples, where operation
+        is 'set', 'add' or 'remove'. A {path: value} dictionary queues 'set'
+        operations. """
+        if isinstance(operations, dict):
+            operations = [('set', path, value) for path, value in operations.items()]
+        for operation, path, *value in operations:
+            if operation not in ('set', 'add', 'remove'):
+                raise ValueError("Unknown dictionary operation: " + repr(operation))
+            self.operations.append((operation, path, value[0] if value else None))
+        return self
+
+    def get(self, path: str) -> str:
+        """ Return the raw text of an entry value in the edited text. """
+        span = dict_parser.locate_entries(self.text)[path]
+        return self.text[span.value_start:span.value_end]
+
+    def write(self, output: Path = None) -> Path:
+        """ Apply the queued operations and write the result atomically.
+
+        Args:
+            output (Path): output file (defaults to the edited file).
+
+        Returns:
+            Path: the written file.
+        """
+        for operation, path, value in self.operations:
+            if operation == 'remove':
+                self._remove(path)
+            else:
+                self._set(path, value, merge=(operation == 'add'))
+        self.operations = []
+
+        output = self.foam_file if output is None else Path(output)
+        tmp_file = output.with_name(output.name + '.tmp' + str(os.getpid()))
+        with open(str(tmp_file), 'w', encoding=self.decoder) as f:
+            f.write(self.text)
+        if output.exists():
+            os.chmod(str(tmp_file), os.stat(str(output)).st_mode)
+        os.replace(str(tmp_file), str(output))
+        return output
+
+    def _indent_of(self, pos: int) -> str:
+        line_start = self.text.rfind('\n', 0, pos) + 1
+        indent = self.text[line_start:pos]
+        return indent if not indent.strip() else ""
+
+    def _format_entry(self, key: str, value: Any, indent: str) -> str:
+        if isinstance(value, dict):
+            lines = [indent + key, indent + "{"]
+            for subkey, subvalue in value.items():
+                lines.append(self._format_entry(subkey, subvalue, indent + self._INDENT))
+            lines.append(indent + "}")
+            return "\n".join(lines)
+        return indent + key.ljust(15) + " " + to_foam_str(value) + ";"
+
+    def _set(self, path: str, value: Any, merge: bool):
+        entries = dict_parser.locate_entries(self.text)
+        span = entries.get(path)
+        key = path.rsplit('/', 1)[-1]
+
+        if span is not None:
+            if isinstance(value, dict):
+                if merge and span.is_dict:
+                    for subkey, subvalue in value.items():
+                        self._set(path + '/' + subkey, subvalue, merge)
+                    return
+                indent = self._indent_of(span.start)
+                new = self._format_entry(key, value, indent)[len(indent):]
+                self.text = self.text[:span.start] + new + self.text[span.end:]
+            elif span.is_dict:
+                new = key.ljust(15) + " " + to_foam_str(value) + ";"
+                self.text = self.text[:span.start] + new + self.text[span.end:]
+            else:
+                self.text = (self.text[:span.value_start] + to_foam_str(value) +
+                             self.text[span.value_end:])
+            return
+
+        # new entry: find the closest existing parent dictionary
+        keys = path.split('/')
+        for n_parent in range(len(keys) - 1, -1, -1):
+            parent = '/'.join(keys[:n_parent])
+            if n_parent == 0 or parent in entries:
+                break
+        if n_parent > 0 and not entries[parent].is_dict:
+            raise ValueError("Cannot add " + repr(path) + ": " + repr(parent) + " is not a dictionary.")
+        for subkey in reversed(keys[n_parent + 1:]):
+            value = {subkey: value}
+        self._insert(entries, parent, keys[n_parent], value)
+
+    def _tail_start(self) -> int:
+        """ Position for a new top-level entry when the file has no entries
+        besides the FoamFile header: before the trailing #-directives (e.g.
+        #includeFunc) or else before the footer comment. """
+        pos = len(self.text)
+        first_directive = None
+        last_comment = None
+        while pos > 0:
+            line_start = self.text.rfind('\n', 0, pos - 1) + 1
+            line = self.text[line_start:pos].strip()
+            if line.startswith('#'):
+                first_directive = line_start
+            elif line.startswith('//'):
+                if last_comment is None and first_directive is None:
+                    last_comment = line_start
+            elif line:
+                break
+            pos = line_start
+        if first_directive is not None:
+            return first_directive
+        return len(self.text) if last_comment is None else last_comment
+
+    def _insert(self, entries: dict, parent: str, key: str, value: Any):
+        children = [span for name, span in entries.items()
+                    if name.rsplit('/', 1)[0] == parent and '/' in name] if parent else \
+            [span for name, span in entries.items() if '/' not in name and name != 'FoamFile']
+        if not parent and not children:
+            pos = self._tail_start()
+            if pos < len(self.text):
+                new = self._format_entry(key, value, "") + "\n\n"
+            else:
+                new = ("" if self.text.endswith("\n") or not self.text else "\n") + \
+                    self._format_entry(key, value, "") + "\n"
+        elif children:
+            last = children[-1]
+            indent = self._indent_of(last.start)
+            pos = last.end
+            new = "\n" + self._format_entry(key, value, indent)
+        elif parent:
+            close = entries[parent].value_end
+            parent_indent = self._indent_of(entries[parent].start)
+            entry = self._format_entry(key, value, parent_indent + self._INDENT)
+            line_start = self.text.rfind('\n', 0, close) + 1
+            if not self.text[line_start:close].strip():
+                # closing brace on its own line
+                pos = line_start
+                new = entry + "\n"
+            else:
+                pos = close
+                new = "\n" + entry + "\n" + parent_indent
+        self.text = self.text[:pos] + new + self.text[pos:]
+
+    def _remove(self, path: str):
+        span = dict_parser.locate_entries(self.text).get(path)
+        if span is None:
+            return
+        start, end = span.start, span.end
+        line_start = self.text.rfind('\n', 0, start) + 1
+        if not self.text[line_start:start].strip():
+            start = line_start
+            line_end = self.text.find('\n', end)
+            line_end = len(self.text) if line_end < 0 else line_end + 1
+            if not self.text[end:line_end].strip():
+                end = line_end
+        self.text = self.text[:start] + self.text[end:]
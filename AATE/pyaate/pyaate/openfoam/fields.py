@@ -0,0 +1,246 @@
+"""
+Reader for OpenFOAM field files, such as 0.orig/p or <time>/U, in ascii and
+binary format. The numerical lists of binary files are memory-mapped into numpy
+arrays without copying, while ascii lists are parsed in bulk by the pandas
+C-parser. The remaining dictionary structure (header, dimensions, boundary
+conditions) is parsed by the native dictionary parser (see dict_parser.py).
+"""
+import gzip
+import io
+import mmap
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from pyaate.openfoam import dict_parser
+from pyaate.openfoam import dictionary
+
+# Number of components per OpenFOAM primitive type
+N_COMPONENTS = {
+    'scalar': 1,
+    'label': 1,
+    'vector': 3,
+    'sphericalTensor': 1,
+    'symmTensor': 6,
+    'tensor': 9,
+}
+
+_LIST_RE = re.compile(rb'(?:nonuniform\s+)?List<(\w+)>\s+(\d+)\s*([({])')
+_LIST_END_RE = re.compile(rb'\)\s*;')
+_FORMAT_RE = re.compile(rb'\bformat\s+(ascii|binary)\s*;')
+_ARCH_RE = re.compile(rb'\barch\s+"([^"]*)"')
+_PLACEHOLDER = '__pyaate_list_{}__'
+_PARENS = bytes.maketrans(b'()', b'  ')
+
+# Ascii lists smaller than this are parsed without pandas
+_SMALL_LIST_BYTES = 1 << 16
+
+
+class FoamField:
+    """
+    Class representing an OpenFOAM field file.
+    Attributes:
+        name: field (object) name.
+        field_class: e.g. volScalarField or volVectorField.
+        dimensions: dimension set array.
+        internal_field: numpy array of shape (n_cells,) or (n_cells, n_components),
+            or the uniform value (float or array).
+        boundary_field: dictionary of patch dictionaries, in which nonuniform
+            values are numpy arrays.
+        header: FoamFile dictionary.
+    """
+
+    def __init__(self, header, dimensions, internal_field, boundary_field):
+        self.header = header
+        self.name = header.get('object')
+        self.field_class = header.get('class')
+        self.dimensions = dimensions
+        self.internal_field = internal_field
+        self.boundary_field = boundary_field
+
+    @property
+    def is_uniform(self):
+        return not (isinstance(self.internal_field, np.ndarray) and
+                    self.internal_field.ndim == (1 if self.n_components == 1 else 2))
+
+    @property
+    def n_components(self):
+        for type_name, n in N_COMPONENTS.items():
+            if self.field_class is not None and self.field_class.endswith(
+                    type_name[0].upper() + type_name[1:] + 'Field'):
+                return n
+        return 1
+
+    def __repr__(self):
+        shape = 'uniform' if self.is_uniform else np.shape(self.internal_field)
+        return "FoamField(" + repr(self.name) + ", " + repr(self.field_class) + ", " + repr(shape) + ")"
+
+
+def arch_dtypes(arch):
+    """
+    Scalar and label dtypes according to the arch header entry,
+    e.g. "LSB;label=32;scalar=64".
+    """
+    byte_order = '>' if 'MSB' in arch else '<'
+    label = re.search(r'label=(\d+)', arch)
+    scalar = re.search(r'scalar=(\d+)', arch)
+    label_bytes = int(label.group(1)) // 8 if label else 4
+    scalar_bytes = int(scalar.group(1)) // 8 if scalar else 8
+    return (np.dtype(byte_order + 'f' + str(scalar_bytes)),
+            np.dtype(byte_order + 'i' + str(label_bytes)))
+
+
+def parse_ascii_list(data, n, n_components=1, dtype=float):
+    """
+    Parse the content between the parentheses of an ascii OpenFOAM list.
+    Input:
+        data: bytes of the list content, e.g. b"(0 0 1)\n(0 0 2)".
+        n: number of list items.
+        n_components: number of components per item.
+        dtype: numpy dtype of the output.
+    Return:
+        numpy array of shape (n,) or (n, n_components).
+    """
+    if n_components > 1:
+        data = data.translate(_PARENS)
+    values = None
+    if len(data) >= _SMALL_LIST_BYTES:
+        try:
+            values = pd.read_csv(io.BytesIO(data), sep=r'\s+', header=None,
+                                 dtype=dtype, engine='c').to_numpy().ravel()
+        except (pd.errors.ParserError, ValueError):
+            values = None
+        # rows of different length (several items per line) are padded by the
+        # C parser: such lists are split item by item instead
+        if values is not None and values.size != n * n_components:
+            values = None
+    if values is None:
+        values = np.array(data.split(), dtype=dtype)
+    if values.size != n * n_components:
+        raise ValueError("Expected " + repr(n * n_components) + " values, got " + repr(values.size))
+    return values.reshape(n, n_components) if n_components > 1 else values
+
+
+def read_list(buffer, start, n, type_name, binary, scalar_dtype, label_dtype,
+              memmap_file=None, uniform=False):
+    """
+    Read the content of an OpenFOAM list "N(...)" or "N{...}".
+    Input:
+        buffer: bytes (or mmap) of the whole file.
+        start: index right after the opening parenthesis (or brace).
+        n: number of list items.
+        type_name: 'scalar', 'label', 'vector', etc.
+        binary: the list content is binary.
+        scalar_dtype, label_dtype: numpy dtypes of binary data (see arch_dtypes()).
+        memmap_file: memory-map binary lists from this file instead of copying.
+        uniform: the list is the uniform "N{value}" form.
+    Return:
+        array: numpy array of shape (n,) or (n, n_components).
+        end: index of the closing parenthesis (or brace).
+    """
+    n_components = N_COMPONENTS.get(type_name)
+    if n_components is None:
+        raise ValueError("Unsupported list type: List<" + type_name + ">")
+    dtype = label_dtype if type_name == 'label' else scalar_dtype
+    shape = (n, n_components) if n_components > 1 else (n,)
+
+    if uniform:
+        end = buffer.find(b'}', start)
+        value = np.array(buffer[start:end].translate(_PARENS).split(), dtype=dtype)
+        return np.broadcast_to(value, shape), end
+    if binary:
+        end = start + n * n_components * dtype.itemsize
+        if buffer[end:end + 1] != b')':
+            raise ValueError("Corrupted binary list at byte " + repr(start))
+        if memmap_file is not None and n > 0:
+            return np.memmap(memmap_file, dtype=dtype, mode='r', offset=start, shape=shape), end
+        return np.frombuffer(buffer, dtype=dtype, count=n * n_components,
+                             offset=start).reshape(shape), end
+    end_match = _LIST_END_RE.search(buffer, start)
+    if end_match is None:
+        raise ValueError("Unterminated list at byte " + repr(start))
+    end = end_match.start()
+    return parse_ascii_list(buffer[start:end], n, n_components, dtype), end
+
+
+def _read_lists(buffer, binary, scalar_dtype, label_dtype, memmap_file=None):
+    """
+    Extract the "List<type> N(...)" entries of a field file.
+    Return:
+        text: file content with the lists replaced by placeholder words.
+        lists: list of numpy arrays, indexed by the placeholder number.
+    """
+    pieces = []
+    lists = []
+    pos = 0
+    while True:
+        m = _LIST_RE.search(buffer, pos)
+        if m is None:
+            break
+        array, end = read_list(buffer, m.end(), int(m.group(2)), m.group(1).decode(), binary,
+                               scalar_dtype, label_dtype, memmap_file,
+                               uniform=m.group(3) == b'{')
+        pieces.append(buffer[pos:m.start()].decode('latin-1'))
+        pieces.append(_PLACEHOLDER.format(len(lists)))
+        lists.append(array)
+        pos = end + 1
+    pieces.append(buffer[pos:].decode('latin-1'))
+    return ''.join(pieces), lists
+
+
+def _substitute(value, lists):
+    """
+    Replace placeholders by the arrays and convert other values to python types.
+    """
+    if isinstance(value, dict):
+        return {key: _substitute(subvalue, lists) for key, subvalue in value.items()}
+    if value.startswith('__pyaate_list_'):
+        return lists[int(value[len('__pyaate_list_'):-2])]
+    if value.startswith('uniform '):
+        return dictionary.infer_datatype(value[len('uniform '):])
+    return dictionary.infer_datatype(value)
+
+
+def read_field(field_file, memmap=True):
+    """
+    Read an OpenFOAM field file, e.g. "case/0/U". Gzip-compressed files
+    (e.g. "U.gz") are decompressed into memory.
+    Input:
+        field_file: path to the field file.
+        memmap: memory-map binary lists instead of reading them into memory.
+    Return:
+        FoamField object.
+    """
+    field_file = Path(field_file)
+    if field_file.suffix == '.gz':
+        with gzip.open(str(field_file), 'rb') as f:
+            buffer = f.read()
+        memmap = False
+    else:
+        with open(str(field_file), 'rb') as f:
+            if memmap:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+
+    try:
+        head = buffer[:4096]
+        fmt = _FORMAT_RE.search(head)
+        binary = fmt is not None and fmt.group(1) == b'binary'
+        arch = _ARCH_RE.search(head)
+        scalar_dtype, label_dtype = arch_dtypes(arch.group(1).decode() if arch else '')
+        text, lists = _read_lists(buffer, binary, scalar_dtype, label_dtype,
+                                  memmap_file=str(field_file) if memmap else None)
+    finally:
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+    entries = dict_parser.parse_string(text, field_file)
+    header = entries.pop('FoamFile', {})
+    dimensions = dictionary.infer_datatype(entries.get('dimensions', '[]'))
+    internal_field = _substitute(entries.get('internalField', ''), lists)
+    boundary_field = _substitute(entries.get('boundaryField', {}), lists)
+
+    return FoamField(header, dimensions, internal_field, boundary_field)
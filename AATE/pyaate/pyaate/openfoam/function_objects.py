@@ -4,6 +4,11 @@ import numpy as np
 import pandas as pd
 from pathlib import Path
 import glob
+import io
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pyaate.openfoam import result_cache
 # The following functions utilise pandas to read function object data from openfoam
 # case directory with additional utilities such as appending data etc.
 
@@ -17,28 +22,126 @@ def last_header_line(fo_file):
         fo_file: path to funciton object result file
     return: array of words ['x', 'y', ...]
     """
-    with open(str(fo_file), 'r') as f:
-        for line in f:
-            if line.startswith('#'):
-                header = line
-            else:
-                break #stop when there are no more #
-    return [col.strip() for col in header[1:].strip().split('\t')]
+    with open(str(fo_file), 'rb') as f:
+        header, _ = _read_header(f)
+    return header
+
+
+def _read_header(f):
+    """
+    Read the commented header lines of a function object file opened in binary
+    mode, leaving the file positioned at the first data line.
+    Return:
+        header: column names of the last commented line.
+        sep: column separator of the data lines (tab, or whitespace if the data
+             lines contain no tabs).
+    """
+    header_line = b'#'
+    while True:
+        pos = f.tell()
+        line = f.readline()
+        if not line.startswith(b'#'):
+            break
+        header_line = line
+    f.seek(pos)
+    header = [col.strip() for col in header_line[1:].decode('latin-1').strip().split('\t')]
+    return header, _separator(line)
+
 
+def _separator(line):
+    return '\t' if b'\t' in line or not line.strip() else r'\s+'
 
-def load_data_pandas(fo_file):
+
+def _read_rows(data, header, sep=None, usecols=None, dtype=None):
     """
-    Read typical OpenFOAM function object output assuming csv structure.
+    Parse the data lines of a function object file with the pandas C parser.
+    Restart rows with "N/A" entries are read as NaN.
+    Input:
+        data: bytes of complete data lines, or a binary file object.
+        header: column names.
+        sep: column separator (deduced from the first line of bytes data if None).
+        usecols, dtype: see load_data_pandas().
+    """
+    if isinstance(data, bytes):
+        if not data.strip():
+            frame = pd.DataFrame(columns=header, dtype=float)
+            return frame if usecols is None else frame[list(usecols)]
+        if sep is None:
+            sep = _separator(data[:data.find(b'\n')])
+        data = io.BytesIO(data)
+    return pd.read_csv(data, sep=sep, comment='#', names=header, usecols=usecols,
+                       dtype=dtype, na_values=['N/A'], engine='c')
+
+
+def load_data_pandas(fo_file, usecols=None, dtype=None):
+    """
+    Read typical OpenFOAM function object output assuming csv structure. The file
+    is read in a single pass with the pandas C parser, "N/A" entries are read as NaN.
     Input:
         fo_file: path to data in format "case_dir/postProcessing/FO/0/FO.dat"
+        usecols: names (or indices) of the columns to read, None for all.
+        dtype: dtype of all columns or a dictionary of {column: dtype},
+               e.g. {'volAverage(p)': np.float32}.
     return:
         data type pd.core.frame.DataFrame
     """
-    header = last_header_line(fo_file)
-    data = pd.read_csv(fo_file, delimiter=r"\t", comment='#', names=header, engine='python')
+    with open(str(fo_file), 'rb') as f:
+        header, sep = _read_header(f)
+        data = _read_rows(f, header, sep, usecols, dtype)
     return data
 
 
+def _parse_fo_file(fo_file):
+    with open(str(fo_file), 'rb') as f:
+        header, sep = _read_header(f)
+        data = f.read()
+        header_end = f.tell() - len(data)
+    end = data.rfind(b'\n') + 1
+    state = {'offset': header_end + end, 'header': header, 'sep': sep,
+             'tail': data[end:].decode('latin-1')}
+    return _read_rows(data[:end], header, sep), state
+
+
+def _parse_fo_append(fo_file, data, state):
+    with open(str(fo_file), 'rb') as f:
+        f.seek(state['offset'])
+        new_data = f.read()
+    end = new_data.rfind(b'\n') + 1
+    new_rows = _read_rows(new_data[:end], state['header'], state['sep'])
+    state = dict(state, offset=state['offset'] + end, tail=new_data[end:].decode('latin-1'))
+    if len(new_rows) == 0:
+        return data, state
+    return pd.concat([data, new_rows], axis=0, ignore_index=True), state
+
+
+def _add_tail(data, state):
+    """
+    Add the last line of a file without a trailing newline (not cached, since
+    it may be incomplete).
+    """
+    if not state['tail'].strip():
+        return data
+    tail = _read_rows(state['tail'].encode('latin-1'), state['header'], state['sep'])
+    return pd.concat([data, tail], axis=0, ignore_index=True)
+
+
+def load_data_cached(fo_file, cache=True):
+    """
+    Read function object output as load_data_pandas(), storing the parsed table
+    in the result cache of the case (see result_cache.py). A file which has only
+    grown since it was cached is extended by parsing the appended lines only.
+    Input:
+        fo_file: path to data in format "case_dir/postProcessing/FO/0/FO.dat"
+        cache: use the result cache.
+    return:
+        data type pd.core.frame.DataFrame
+    """
+    if not cache:
+        return load_data_pandas(fo_file)
+    return result_cache.cached_table(fo_file, 'function_object', _parse_fo_file,
+                                     _parse_fo_append, finalize=_add_tail)
+
+
 def get_latest_file(fo_dir, fo_filename, time):
     """
     Return the latest data file in case multiple restarts have occurred when running
@@ -89,7 +192,70 @@ def append_restart_data(data0, data1, verbose=True):
 
 
 
-def load_data(fo_path, append=True, verbose=False, repeat=0, start=0):
+def stitch_restart_data(segments, verbose=False):
+    """
+    Combine the data sets of consecutive restarts in one pass. Equivalent to
+    appending the segments one by one with append_restart_data(): each segment
+    is cut at the first time instance which is not before the start of any
+    following segment, and the remaining rows are concatenated once.
+    Input:
+        segments: list of pandas data frames, assuming the first column corresponds to time / iter instance
+        verbose: print the cut of each segment.
+    return:
+        data: pandas data frame.
+    """
+    segments = [segment for segment in segments if len(segment) > 0] or segments[:1]
+    starts = np.array([segment.iloc[0, 0] for segment in segments[1:]] + [np.inf], dtype=float)
+    # earliest start of the following segments
+    limits = np.minimum.accumulate(starts[::-1])[::-1]
+    pieces = []
+    for segment, limit in zip(segments, limits):
+        t = segment.iloc[:, 0].values
+        after = t >= limit
+        cut_ind = int(np.argmax(after)) if after.any() else len(t)
+        if(verbose and np.isfinite(limit)):
+            if(cut_ind < len(t)):
+                print("Appending data at t=" + repr(t[cut_ind]) + " at index " + repr(cut_ind))
+            else:
+                print("Appending data at t=" + repr(t[-1]) + " at last index.")
+        pieces.append(segment.iloc[:cut_ind])
+    return pd.concat(pieces, axis=0, ignore_index=True)
+
+
+def _is_time(name):
+    try:
+        float(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _base_file_names(fo_path, time):
+    """
+    Names of the data files of a function object, e.g. ["residuals.dat"], ignoring
+    the "residuals_<time>.dat" files written after restarts.
+    """
+    names = sorted(f.name for f in Path(fo_path, time).glob("*.dat"))
+    base_names = [name for name in names if not name.endswith("_" + time + ".dat")]
+    return base_names or names
+
+
+def _base_file_name(fo_path, time):
+    names = _base_file_names(fo_path, time)
+    if not names:
+        raise FileNotFoundError("No function object data in " + str(Path(fo_path, time)))
+    return names[0]
+
+
+def _time_dirs(fo_path):
+    time_dirs = [name for name in os.listdir(str(fo_path))
+                 if _is_time(name) and Path(fo_path, name).is_dir()]
+    time_dirs.sort(key=float)
+    return time_dirs
+
+
+def load_data(fo_path, append=True, verbose=False, repeat=0, start=0, cache=False, latest=True,
+              fo_filename=None):
     """
     Load OpenFOAM function object data into a pandas data frame.
     input:
@@ -97,24 +263,34 @@ def load_data(fo_path, append=True, verbose=False, repeat=0, start=0):
         append: Boolean describing whether multiple data sets generated by case restarts or
                 extra post-processing are included in data loading.
         verbose: Print information of the loading process.
+        cache: store the parsed data in the result cache of the case, see
+               load_data_cached().
+        latest: read the "objectName_<time>.dat" file of a time directory when present,
+                see get_latest_file().
+        fo_filename: name of the data file for function objects writing several files
+                (e.g. "force.dat"), by default the first one.
     return:
         data: Pandas data frame including the function object data.
     """
     fo_path = Path(fo_path)
-    #fo_dir = fo_file.parents[1]
-    time_dirs = os.listdir(str(fo_path))
-    time_dirs.sort(key=float)
-
-    fo_filename = glob.glob(os.path.join(fo_path,time_dirs[0],"*.dat"))[0]
-    if(verbose):
-        print("Reading data from file: {}".format(fo_filename))
-    data = load_data_pandas(fo_filename)
+    time_dirs = _time_dirs(fo_path)
+    if not append:
+        time_dirs = time_dirs[:1]
 
-    if(append and (len(time_dirs)>1)):
-        for ti in time_dirs[1:]:
-            file_i = glob.glob(os.path.join(fo_path,ti,"*.dat"))[0]
-            data_i = load_data_pandas(file_i)
-            data = append_restart_data(data, data_i, verbose=verbose)
+    if fo_filename is None:
+        fo_filename = _base_file_name(fo_path, time_dirs[0])
+    segments = []
+    for ti in time_dirs:
+        if latest:
+            file_i = get_latest_file(fo_path, fo_filename, ti)
+        else:
+            file_i = Path(fo_path, ti, fo_filename)
+        if not file_i.is_file():
+            continue
+        if(verbose):
+            print("Reading data from file: {}".format(file_i))
+        segments.append(load_data_cached(file_i, cache=cache))
+    data = stitch_restart_data(segments, verbose=verbose)
 
     if(repeat>0):
         cycle = (data.Time+start)//repeat
@@ -125,3 +301,342 @@ def load_data(fo_path, append=True, verbose=False, repeat=0, start=0):
         data = [group for _, group in data.groupby('Cycle')]
 
     return data
+
+
+class FunctionObjectFollower:
+    """
+    Incremental reader of the data of a running function object, e.g. for
+    in-run monitoring. Each poll() parses only the rows appended since the
+    previous poll. Restarts are followed automatically, both into new time
+    directories and to "name_<time>.dat" files written into an existing time
+    directory, replacing the buffered rows from the restart time on (as in
+    stitch_restart_data()). With a window, only the rows of the last window time
+    units (e.g. CAD) are kept in memory.
+    Input:
+        fo_path: function object directory, e.g. "postProcessing/pTAvg_chamber".
+        window: length of the buffered time window, None to keep all rows.
+        fo_filename: name of the data file, by default the first one.
+        latest: follow the "objectName_<time>.dat" files, see get_latest_file().
+
+    Example:
+        follower = FunctionObjectFollower("postProcessing/maxCo", window=720)
+        while running:
+            new_rows = follower.poll()
+            plot(follower.data)
+    """
+
+    def __init__(self, fo_path, window=None, fo_filename=None, latest=True):
+        self.fo_path = Path(fo_path)
+        self.window = window
+        self.fo_filename = fo_filename
+        self.latest = latest
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the state and read the data again from the beginning.
+        """
+        self.time_dir = None
+        self.fo_file = None
+        self.offset = 0
+        self.header = None
+        self.data = None
+        self._read_files = set()
+
+    def _new_files(self):
+        """
+        Return [(time, file)] of the data files not read yet, in time order. The
+        latest file of every time directory is checked on each poll, so that
+        restarts writing "name_<time>.dat" into the current or an earlier time
+        directory are found as well as new time directories.
+        """
+        if not self.fo_path.is_dir():
+            return []
+        files = []
+        for time in _time_dirs(self.fo_path):
+            if self.fo_filename is None:
+                names = _base_file_names(self.fo_path, time)
+                if not names:
+                    continue
+                self.fo_filename = names[0]
+            if self.latest:
+                fo_file = get_latest_file(self.fo_path, self.fo_filename, time)
+            else:
+                fo_file = Path(self.fo_path, time, self.fo_filename)
+            if fo_file.is_file() and fo_file not in self._read_files:
+                files.append((time, fo_file))
+        return files
+
+    def _open_segment(self, time, fo_file):
+        self.time_dir = time
+        self.fo_file = fo_file
+        self.offset = 0
+        self.header = None
+        self._read_files.add(fo_file)
+
+    def _read_new_rows(self):
+        """
+        Parse the complete lines appended to the current file.
+        """
+        with open(str(self.fo_file), 'rb') as f:
+            f.seek(self.offset)
+            new_data = f.read()
+        end = new_data.rfind(b'\n') + 1
+        new_data = new_data[:end]
+        if self.header is None:
+            # wait for the complete header and the first data line
+            stream = io.BytesIO(new_data)
+            header, _ = _read_header(stream)
+            if stream.tell() == len(new_data):
+                return None
+            self.header = header
+            self.offset = stream.tell()
+            new_data = new_data[stream.tell():]
+        self.offset += len(new_data)
+        rows = _read_rows(new_data, self.header)
+        return rows if len(rows) else None
+
+    def poll(self):
+        """
+        Read the newly appended rows of the function object.
+        Return:
+            pandas DataFrame of the new rows. The buffered data (limited to the
+            window) is available as the data attribute.
+        """
+        segments = []
+        if self.fo_file is not None:
+            segments.append(self._read_new_rows())
+        for time, fo_file in self._new_files():
+            self._open_segment(time, fo_file)
+            segments.append(self._read_new_rows())
+        segments = [rows for rows in segments if rows is not None]
+        if not segments:
+            return pd.DataFrame(columns=self.header or [], dtype=float)
+
+        new_rows = stitch_restart_data(segments)
+        if self.data is None or len(self.data) == 0:
+            self.data = new_rows.copy()
+        else:
+            self.data = stitch_restart_data([self.data, new_rows])
+        if self.window is not None and len(self.data):
+            time = self.data.iloc[:, 0].values
+            self.data = self.data[time > time[-1] - self.window].reset_index(drop=True)
+        return new_rows
+
+
+class CaseData:
+    """
+    Function object data of a case, keyed by object name (e.g. 'maxCo' or
+    'pTAvg_chamber'). The objects are loaded concurrently on a thread pool in the
+    background, and accessing an object waits for its data only. Objects writing
+    several files are keyed by "object/file", e.g. 'forces/moment'.
+    Input:
+        sources: dictionary of {key: (function object directory, file name)}.
+        load_kwargs: keyword arguments of load_data().
+        workers: number of threads.
+    """
+
+    def __init__(self, sources, load_kwargs=None, workers=None):
+        self.sources = sources
+        self._kwargs = dict(load_kwargs or {})
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(32, len(sources) or 1))
+        self._futures = OrderedDict(
+            (key, self._pool.submit(load_data, fo_path, fo_filename=fo_filename, **self._kwargs))
+            for key, (fo_path, fo_filename) in sources.items())
+        self._pool.shutdown(wait=False)
+
+    def __getitem__(self, key):
+        if key not in self._futures:
+            raise KeyError(key)
+        return self._futures[key].result()
+
+    def __contains__(self, key):
+        return key in self._futures
+
+    def __iter__(self):
+        return iter(self._futures)
+
+    def __len__(self):
+        return len(self._futures)
+
+    def __repr__(self):
+        return "CaseData(" + repr(list(self._futures)) + ")"
+
+    def keys(self):
+        return self._futures.keys()
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def aligned(self, objects=None, how='outer'):
+        """
+        Join objects on a shared Time index.
+        Input:
+            objects: keys of the objects to join, None for all.
+            how: 'outer' keeps all time instances (missing values are NaN),
+                 'inner' only the time instances common to all objects.
+        Return:
+            pandas DataFrame indexed by Time with (object, column) columns.
+        """
+        objects = list(self) if objects is None else list(objects)
+        tables = OrderedDict()
+        for key in objects:
+            data = self[key]
+            time = data.columns[0]
+            tables[key] = data.drop_duplicates(subset=time, keep='last').set_index(time)
+        aligned = pd.concat(tables, axis=1, join=how).sort_index()
+        aligned.index.name = 'Time'
+        return aligned
+
+
+def load_case(case_dir, objects=None, workers=None, **kwargs):
+    """
+    Scan the postProcessing directory of a case once and load its function
+    object data concurrently.
+    Input:
+        case_dir: case directory.
+        objects: names of the function objects to load, None for all.
+        workers: number of threads (None: one per object, at most 32).
+        kwargs: keyword arguments of load_data(), e.g. cache=True.
+    return:
+        CaseData, a dictionary-like dataset of pandas data frames keyed by object.
+    """
+    post_dir = Path(case_dir, 'postProcessing')
+    if not post_dir.is_dir():
+        raise FileNotFoundError("postProcessing directory not found: " + str(post_dir))
+    sources = OrderedDict()
+    for fo_dir in sorted(post_dir.iterdir()):
+        if fo_dir.name.startswith('.') or not fo_dir.is_dir():
+            continue
+        if objects is not None and fo_dir.name not in objects:
+            continue
+        time_dirs = _time_dirs(fo_dir)
+        names = _base_file_names(fo_dir, time_dirs[0]) if time_dirs else []
+        for name in names:
+            key = fo_dir.name if len(names) == 1 else fo_dir.name + '/' + name[:-4]
+            sources[key] = (fo_dir, name)
+    if objects is not None:
+        missing = [name for name in objects if not any(
+            key == name or key.startswith(name + '/') for key in sources)]
+        if missing:
+            print("Warning: function object data not found: " + repr(missing))
+    return CaseData(sources, kwargs, workers)
+
+
+def _nan_reduce(func, values, axis=0):
+    """
+    NaN-ignoring reduction without warnings for CAD not covered by any cycle.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return func(values, axis=axis)
+
+
+class CycleEnsemble:
+    """
+    Cycle-resolved data of a multi-cycle run on a common CAD grid.
+    Attributes:
+        cad: (n_cad,) array of the CAD grid.
+        cycles: (n_cycles,) array of cycle numbers (0 for the first cycle of the data).
+        values: (n_cycles, n_cad) array, NaN where a cycle has no data.
+    """
+
+    def __init__(self, cad, cycles, values):
+        self.cad = cad
+        self.cycles = cycles
+        self.values = values
+
+    def __repr__(self):
+        return "CycleEnsemble(" + repr(len(self.cycles)) + " cycles, " + repr(len(self.cad)) + " CAD)"
+
+    @property
+    def mean(self):
+        return _nan_reduce(np.nanmean, self.values)
+
+    @property
+    def std(self):
+        return _nan_reduce(np.nanstd, self.values)
+
+    @property
+    def min(self):
+        return _nan_reduce(np.nanmin, self.values)
+
+    @property
+    def max(self):
+        return _nan_reduce(np.nanmax, self.values)
+
+    def statistics(self):
+        """
+        Ensemble statistics per CAD.
+        Return:
+            pandas DataFrame indexed by CAD with columns mean, std, min, max and
+            cov (coefficient of variation std / mean).
+        """
+        mean = self.mean
+        std = self.std
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = std / mean
+        return pd.DataFrame({'mean': mean, 'std': std, 'min': self.min, 'max': self.max,
+                             'cov': cov}, index=pd.Index(self.cad, name='CAD'))
+
+    def peaks(self):
+        """
+        Return the (n_cycles,) arrays of the peak values and their CAD.
+        """
+        filled = np.where(np.isnan(self.values), -np.inf, self.values)
+        index = np.argmax(filled, axis=1)
+        return _nan_reduce(np.nanmax, self.values, axis=1), self.cad[index]
+
+    def ccv(self, metric=None):
+        """
+        Cycle-to-cycle variation: coefficient of variation (std / mean) of a per-cycle
+        quantity, by default the peak value (e.g. peak pressure).
+        Input:
+            metric: function of the (n_cycles, n_cad) values returning (n_cycles,) values,
+                    e.g. lambda values: np.nanmean(values, axis=1).
+        """
+        per_cycle = self.peaks()[0] if metric is None else metric(self.values)
+        return np.nanstd(per_cycle) / np.nanmean(per_cycle)
+
+
+def cycle_ensemble(data, column, repeat=720, start=0, resolution=1.0, cad=None,
+                   complete_only=False):
+    """
+    Resample the cycles of multi-cycle data onto a common CAD grid. The cycles are
+    defined as in load_data(data, repeat=repeat, start=start), and all cycles are
+    interpolated with a single vectorized interpolation along time.
+    Input:
+        data: pandas data frame with Time (in CAD) as the first column, e.g. from load_data().
+        column: name of the column to resample, e.g. 'volAverage(p)'.
+        repeat: cycle length in CAD.
+        start: cycle offset, see load_data().
+        resolution: CAD step of the grid.
+        cad: CAD grid (overrides resolution), within [-start, repeat - start).
+        complete_only: drop the cycles which do not cover the whole grid.
+    return:
+        CycleEnsemble
+    """
+    time = np.asarray(data.iloc[:, 0].values, dtype=float)
+    values = np.asarray(data[column].values, dtype=float)
+    order = np.argsort(time, kind='stable')
+    time = time[order]
+    values = values[order]
+
+    if cad is None:
+        cad = np.arange(-start, repeat - start, resolution, dtype=float)
+    cad = np.asarray(cad, dtype=float)
+    cycle = (time + start) // repeat
+    cycles, first = np.unique(cycle, return_index=True)
+    last = np.append(first[1:], len(time)) - 1
+
+    # query times of all cycles at once: (n_cycles, n_cad)
+    query = cycles[:, None] * repeat + cad[None, :]
+    resampled = np.interp(query.ravel(), time, values).reshape(query.shape)
+    outside = (query < time[first][:, None]) | (query > time[last][:, None])
+    resampled[outside] = np.nan
+
+    if complete_only:
+        complete = ~outside.any(axis=1)
+        cycles = cycles[complete]
+        resampled = resampled[complete]
+    return CycleEnsemble(cad, (cycles - cycle[0]).astype(int), resampled)
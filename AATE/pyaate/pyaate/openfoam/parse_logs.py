@@ -3,13 +3,174 @@ Various functions to parse data from the run-time output log files generated by
 User has a responsibility to prevent potential issues rising from:
     - reduced accuracy induced by ascii write precision (user-defined in system/controlDict)
     - Time - data consistency
+
+The log is read in a single streaming pass of large blocks of complete lines.
+Each block is scanned in memory by compiled patterns starting with the literal
+line keys (which the regular expression engine searches fast), and the parsed
+values are collected in growable numpy arrays. No shell commands or temporary
+files are utilised.
 """
 
-from pathlib import Path
-import subprocess
-import sys
+import bz2
+import gzip
+import lzma
 import os
+import re
+import string
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
+
+from pyaate.openfoam import function_objects as fo
+from pyaate.openfoam import result_cache
+
+# Size of the blocks read from the log file [bytes]
+_BLOCK_SIZE = 1 << 24
+
+# Characters stripped from the last field of a line, e.g. units such as "0.001s"
+_UNIT_CHARS = string.ascii_letters.encode()
+
+# Line keys of the values parsed by parse_time() and parse_lagrangian().
+# Time lines have to start with the key (cf. ExecutionTime = ...).
+_TIME_KEY = b'Time = '
+_LAGRANGIAN_KEYS = {
+    'time': _TIME_KEY,
+    'vapor_pen': b'Vapor penetration',
+    'liquid_pen': b'Liquid penetration',
+    'phase_change': b'Mass transfer phase change',
+}
+
+
+class GrowableArray:
+    """
+    Preallocated 1D numpy array which grows geometrically on append.
+    Input:
+        capacity: initial capacity.
+        dtype: numpy dtype of the values.
+    """
+
+    def __init__(self, capacity=1024, dtype=float):
+        self._data = np.empty(capacity, dtype=dtype)
+        self._size = 0
+
+    def append(self, value):
+        if self._size == len(self._data):
+            self._data = np.resize(self._data, 2 * len(self._data))
+        self._data[self._size] = value
+        self._size += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        size = self._size + len(values)
+        if size > len(self._data):
+            self._data = np.resize(self._data, max(size, 2 * len(self._data)))
+        self._data[self._size:size] = values
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def values(self):
+        """
+        Return a copy of the appended values as a numpy array.
+        """
+        return self._data[:self._size].copy()
+
+
+def _last_value(line):
+    """
+    Convert the last whitespace separated field of a line to float.
+    """
+    field = line.rsplit(None, 1)[-1]
+    try:
+        return float(field)
+    except ValueError:
+        return float(field.rstrip(_UNIT_CHARS))
+
+
+def _last_values(lines):
+    """
+    Convert the last fields of lines to a float array. Lines without a
+    numeric last field are skipped.
+    """
+    try:
+        return np.array([line.rsplit(None, 1)[-1] for line in lines], dtype=float)
+    except (ValueError, IndexError):
+        values = []
+        for line in lines:
+            try:
+                values.append(_last_value(line))
+            except (ValueError, IndexError):
+                continue
+        return np.array(values, dtype=float)
+
+
+def _open_log(logfile):
+    """
+    Open a log file for binary reading, decompressing .gz, .xz and .bz2 files
+    transparently.
+    """
+    suffix = Path(logfile).suffix
+    if suffix == '.gz':
+        return gzip.open(str(logfile), 'rb')
+    if suffix in ('.xz', '.lzma'):
+        return lzma.open(str(logfile), 'rb')
+    if suffix == '.bz2':
+        return bz2.open(str(logfile), 'rb')
+    return open(str(logfile), 'rb')
+
+
+def _read_blocks(logfile, block_size=_BLOCK_SIZE):
+    """
+    Yield blocks of complete lines of a (possibly growing or compressed) log file.
+    """
+    with _open_log(logfile) as f:
+        rest = b''
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            block = rest + block
+            end = block.rfind(b'\n') + 1
+            rest = block[end:]
+            if end:
+                yield block[:end]
+        if rest:
+            yield rest
+
+
+def _key_pattern(key):
+    """
+    Compiled pattern capturing the rest of the line after a literal key. The
+    time key has to be at the start of a line (cf. ExecutionTime = ...), which
+    is why the blocks are scanned with a leading newline.
+    """
+    prefix = b'\n' + key if key == _TIME_KEY else key
+    return re.compile(re.escape(prefix) + rb'([^\n]*)')
+
+
+def _scan_log(logfile, keys):
+    """
+    Collect the last value of the lines containing the given keys in a single
+    streaming pass over the log file.
+    Input:
+        logfile: path to the log file.
+        keys: dictionary of {name: line key (bytes)}.
+    Return:
+        dictionary of {name: numpy array} in the order of appearance.
+    """
+    patterns = {name: _key_pattern(key) for name, key in keys.items()}
+    arrays = {name: GrowableArray() for name in keys}
+
+    for block in _read_blocks(logfile):
+        block = b'\n' + block
+        for name, pattern in patterns.items():
+            arrays[name].extend(_last_values(pattern.findall(block)))
+
+    return {name: array.values() for name, array in arrays.items()}
 
 
 def parse_time(logfile):
@@ -24,15 +185,7 @@ def parse_time(logfile):
     --------
     time : Time [s]
     """
-    output_dir = Path.cwd()
-    f_t = Path(output_dir, '_t.tmp')
-    command = 'grep -w \'Time =\' ' + str(
-        logfile) + ' | awk \'NF>1{print $NF}\' > ' + str(f_t)
-    subprocess.Popen(command, shell=True).wait()
-    time = np.loadtxt(f_t)
-    os.remove(f_t)
-
-    return time
+    return _scan_log(logfile, {'time': _TIME_KEY})['time']
 
 
 def parse_lagrangian(logfile, output=None):
@@ -63,26 +216,12 @@ def parse_lagrangian(logfile, output=None):
     if(not output_dir.exists()):
         raise ValueError("User-defined output directory does not exist " + repr(output))
 
-    time = parse_time(logfile)
-
-    f_vapor = Path(output_dir, '_vaporPen.tmp')
+    data = _scan_log(logfile, _LAGRANGIAN_KEYS)
+    time = data['time']
     # vapor penetration has an extra first line due to the system/controlDict based hack'ish definition
-    command = 'grep \'Vapor penetration\' ' + str(
-        logfile) + '| awk \'NF>1{print $NF}\' | tail -n +2 > ' + str(f_vapor)
-    subprocess.Popen(command, shell=True).wait()
-    vapor_pen = np.loadtxt(f_vapor)
-
-    f_liquid = Path(output_dir, '_liquidPen.tmp')
-    command = 'grep \'Liquid penetration\' ' + str(
-        logfile) + '| awk \'NF>1{print $NF}\' > ' + str(f_liquid)
-    subprocess.Popen(command, shell=True).wait()
-    liquid_pen = np.loadtxt(f_liquid)
-
-    f_pc = Path(output_dir, '_pc.tmp')
-    command = 'grep \'Mass transfer phase change\' ' + str(
-        logfile) + '| awk \'NF>1{print $NF}\' > ' + str(f_pc)
-    subprocess.Popen(command, shell=True).wait()
-    phase_change = np.loadtxt(f_pc)
+    vapor_pen = data['vapor_pen'][1:]
+    liquid_pen = data['liquid_pen']
+    phase_change = data['phase_change']
 
     # in case simulation was stopped unexpectedly, number of entries in not equal.
     # Hence, we need to unify the arrays respectively
@@ -104,8 +243,474 @@ def parse_lagrangian(logfile, output=None):
         "Time [s] \t Vapor penetration [m] \t Liquid penetration [m] \t Phase change [kg]",
         delimiter='\t')
 
-    os.remove(f_vapor)
-    os.remove(f_liquid)
-    os.remove(f_pc)
-
     return time, vapor_pen, liquid_pen, phase_change
+
+
+# Registry of the quantities extracted by parse_log(). See register_pattern().
+LogPattern = namedtuple('LogPattern', ['key', 'regex', 'reduce', 'precedes_time'])
+_LOG_PATTERNS = OrderedDict()
+_REDUCTIONS = ('first', 'last', 'sum', 'min', 'max')
+
+
+def register_pattern(name, key, regex, reduce='first', precedes_time=False):
+    """
+    Register a quantity to be extracted from solver logs by parse_log().
+    Input:
+        name: name of the pattern (replaces an existing pattern of the same name).
+        key: literal text identifying the line, e.g. 'deltaT = '.
+        regex: regular expression matched to the rest of the line after the key
+            (it should not match across lines). Each named group yields a column. A group named 'field' is not a column
+            but prefixes the other columns, e.g. 'Ux_initial' for residuals.
+        reduce: how multiple matches within a time step are combined: 'first',
+            'last', 'sum', 'min' or 'max', or a dictionary of {group: reduce}.
+        precedes_time: the line is printed before the "Time = " line of the time
+            step it belongs to (e.g. Courant number and deltaT).
+    """
+    reductions = reduce.values() if isinstance(reduce, dict) else [reduce]
+    for reduction in reductions:
+        if reduction not in _REDUCTIONS:
+            raise ValueError("Unknown reduction " + repr(reduction) + ", use one of " +
+                             repr(_REDUCTIONS))
+    if isinstance(key, str):
+        key = key.encode()
+    if isinstance(regex, str):
+        regex = regex.encode()
+    _LOG_PATTERNS[name] = LogPattern(key, re.compile(re.escape(key) + regex, re.MULTILINE),
+                                     reduce, precedes_time)
+
+
+def unregister_pattern(name):
+    """
+    Remove a pattern from the registry of parse_log().
+    """
+    _LOG_PATTERNS.pop(name, None)
+
+
+def registered_patterns():
+    """
+    Return the names of the registered log patterns.
+    """
+    return list(_LOG_PATTERNS)
+
+
+register_pattern('courant', 'Courant Number mean: ',
+                 r'(?P<Co_mean>\S+) max: (?P<Co_max>\S+)', precedes_time=True)
+register_pattern('deltaT', 'deltaT = ', r'(?P<deltaT>\S+)', precedes_time=True)
+register_pattern('residuals', 'Solving for ',
+                 r'(?P<field>\w+), Initial residual = (?P<initial>[^,\s]+), '
+                 r'Final residual = (?P<final>[^,\s]+), No Iterations (?P<iterations>\d+)',
+                 reduce={'initial': 'first', 'final': 'last', 'iterations': 'sum'})
+register_pattern('executionTime', 'ExecutionTime = ',
+                 r'(?P<ExecutionTime>\S+) s\s+ClockTime = (?P<ClockTime>\S+)', reduce='last')
+register_pattern('vapor_pen', 'Vapor penetration', r'.*[ \t](?P<vapor_pen>\S+)[ \t\r]*$',
+                 reduce='last')
+register_pattern('liquid_pen', 'Liquid penetration', r'.*[ \t](?P<liquid_pen>\S+)[ \t\r]*$',
+                 reduce='last')
+register_pattern('phase_change', 'Mass transfer phase change',
+                 r'.*[ \t](?P<phase_change>\S+)[ \t\r]*$', reduce='last')
+
+
+def _to_floats(values):
+    try:
+        return np.array(values, dtype=float)
+    except ValueError:
+        out = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                out[i] = float(value.rstrip(_UNIT_CHARS))
+            except ValueError:
+                continue
+        return out
+
+
+def _reduce(steps, values, n_steps, reduction):
+    """
+    Combine the values of each time step. Steps without values are NaN.
+    """
+    column = np.full(n_steps, np.nan)
+    if reduction == 'first':
+        unique_steps, first = np.unique(steps, return_index=True)
+        column[unique_steps] = values[first]
+    elif reduction == 'last':
+        unique_steps, last = np.unique(steps[::-1], return_index=True)
+        column[unique_steps] = values[::-1][last]
+    elif reduction == 'sum':
+        counts = np.bincount(steps, minlength=n_steps)
+        sums = np.bincount(steps, weights=values, minlength=n_steps)
+        column[counts > 0] = sums[counts > 0]
+    else:
+        ufunc = np.fmin if reduction == 'min' else np.fmax
+        ufunc.at(column, steps, values)
+    return column
+
+
+class _LogScanner:
+    """
+    Extracts the registered patterns from consecutive blocks of complete log
+    lines, recording the file position of every match so that the values can be
+    assigned to time steps by a vectorized search afterwards.
+    Input:
+        patterns: list of pattern names (None for all registered patterns).
+    """
+
+    def __init__(self, patterns=None):
+        names = registered_patterns() if patterns is None else list(patterns)
+        unknown = [name for name in names if name not in _LOG_PATTERNS]
+        if unknown:
+            raise ValueError("Unknown log patterns: " + repr(unknown))
+        self.patterns = OrderedDict((name, _LOG_PATTERNS[name]) for name in names)
+        self._time_pattern = _key_pattern(_TIME_KEY)
+        self.time = GrowableArray()
+        self.time_pos = GrowableArray(dtype=np.int64)
+        # {column: (pattern name, reduction, positions, values)}
+        self.columns = OrderedDict()
+        self._targets = {}
+
+    def _column(self, column, name, group):
+        if column not in self.columns:
+            reduce = self.patterns[name].reduce
+            reduction = reduce.get(group, 'first') if isinstance(reduce, dict) else reduce
+            self.columns[column] = (name, reduction, [], [])
+        return self.columns[column]
+
+    def _column_targets(self, name, prefix):
+        """
+        (positions, values) lists of the columns of a pattern match, one per
+        regex group (None for the 'field' group and unnamed groups).
+        """
+        key = (name, prefix)
+        if key not in self._targets:
+            regex = self.patterns[name].regex
+            targets = [None] * regex.groups
+            for group, index in regex.groupindex.items():
+                if group != 'field':
+                    column = group if prefix is None else prefix.decode() + '_' + group
+                    targets[index - 1] = self._column(column, name, group)[2:]
+            self._targets[key] = targets
+        return self._targets[key]
+
+    def feed(self, block, offset=0):
+        """
+        Scan a block of complete lines starting at the file position offset.
+        """
+        block = b'\n' + block
+        offset -= 1
+        positions = []
+        values = []
+        for m in self._time_pattern.finditer(block):
+            positions.append(offset + m.start() + 1)
+            values.append(m.group(1).rsplit(None, 1)[-1] if m.group(1).strip() else b'nan')
+        self.time.extend(_to_floats(values))
+        self.time_pos.extend(positions)
+
+        for name, pattern in self.patterns.items():
+            field_index = pattern.regex.groupindex.get('field')
+            targets = None if field_index else self._column_targets(name, None)
+            for m in pattern.regex.finditer(block):
+                if field_index:
+                    targets = self._column_targets(name, m.group(field_index))
+                position = offset + m.start()
+                for target, value in zip(targets, m.groups()):
+                    if target is not None and value is not None:
+                        target[0].append(position)
+                        target[1].append(value)
+
+    def table(self, start_step=0):
+        """
+        Return the columnar table of the time steps from start_step onwards.
+        The last time step may still be incomplete when the log is growing.
+        """
+        time = self.time.values()
+        time_pos = self.time_pos.values()
+        n_steps = len(time)
+        data = OrderedDict([('Time', time[start_step:])])
+        for column, (name, reduction, positions, values) in self.columns.items():
+            positions = np.asarray(positions, dtype=np.int64)
+            side = 'left' if self.patterns[name].precedes_time else 'right'
+            steps = np.searchsorted(time_pos, positions, side=side)
+            if side == 'right':
+                steps -= 1
+            valid = (steps >= start_step) & (steps < n_steps)
+            column_values = _to_floats([value for value, ok in zip(values, valid) if ok])
+            data[column] = _reduce(steps[valid] - start_step, column_values,
+                                   n_steps - start_step, reduction)
+        return pd.DataFrame(data)
+
+
+def _restart_segments(data):
+    """
+    Split a log table into segments at restarts, i.e. where time decreases.
+    """
+    time = data['Time'].values
+    cuts = np.where(np.diff(time) <= 0)[0] + 1
+    bounds = np.concatenate(([0], cuts, [len(time)]))
+    return [data.iloc[bounds[i]:bounds[i + 1]].reset_index(drop=True)
+            for i in range(len(bounds) - 1) if bounds[i + 1] > bounds[i]]
+
+
+def _scan_table(logfile, patterns):
+    scanner = _LogScanner(patterns)
+    offset = 0
+    for block in _read_blocks(logfile):
+        scanner.feed(block, offset)
+        offset += len(block)
+    return scanner.table()
+
+
+def _cache_kind(patterns):
+    """
+    Cache identifier of the pattern definitions: a re-registered pattern
+    invalidates the cached tables.
+    """
+    names = registered_patterns() if patterns is None else list(patterns)
+    return 'log:' + repr([(name, _LOG_PATTERNS[name].regex.pattern, _LOG_PATTERNS[name].reduce,
+                           _LOG_PATTERNS[name].precedes_time) for name in names])
+
+
+def _follower_state(follower):
+    return {'offset': follower.offset, 'n_rows': follower.n_rows,
+            'partial': follower._partial.decode('latin-1'),
+            'pending': follower._pending.decode('latin-1'),
+            'skip_first': follower._skip_first}
+
+
+def _restore_follower(logfile, patterns, state):
+    follower = LogFollower(logfile, patterns)
+    follower.offset = state['offset']
+    follower.n_rows = state['n_rows']
+    follower._partial = state['partial'].encode('latin-1')
+    follower._pending = state['pending'].encode('latin-1')
+    follower._skip_first = state['skip_first']
+    return follower
+
+
+def _cached_log_table(logfile, patterns):
+    """
+    Table of a single log from the result cache. The completed time steps are
+    cached together with the state of a LogFollower, so that a grown log is
+    extended by scanning the appended output only.
+    """
+    if Path(logfile).suffix in ('.gz', '.xz', '.lzma', '.bz2'):
+        return result_cache.cached_table(
+            logfile, _cache_kind(patterns), lambda f: (_scan_table(f, patterns), {}))
+
+    def parse_full(logfile):
+        follower = LogFollower(logfile, patterns)
+        return follower.poll(), _follower_state(follower)
+
+    def parse_append(logfile, data, state):
+        follower = _restore_follower(logfile, patterns, state)
+        new_rows = follower.poll()
+        if len(new_rows):
+            data = pd.concat([data, new_rows], axis=0)
+        return data, _follower_state(follower)
+
+    def finalize(data, state):
+        # the last time step is not cached, since it may still be incomplete
+        follower = _restore_follower(logfile, patterns, state)
+        last_rows = follower._consume(follower._partial, True)
+        if len(last_rows) == 0:
+            return data.reset_index(drop=True)
+        return pd.concat([data, last_rows], axis=0, ignore_index=True)
+
+    return result_cache.cached_table(logfile, _cache_kind(patterns), parse_full,
+                                     parse_append, finalize)
+
+
+def parse_log(logfiles, patterns=None, verbose=False, cache=False):
+    """
+    Extract all the registered quantities (see register_pattern()) from solver logs
+    in a single streaming pass per file.
+    Input:
+        logfiles: path to a log file, or a list of log files of consecutive restarts.
+        patterns: names of the patterns to extract, None for all registered patterns.
+        verbose: print information of appending restart segments.
+        cache: store the tables in the result cache of the case (see
+            result_cache.py), so that re-reading unchanged logs is cheap and
+            grown logs are scanned from the previous end only.
+    Return:
+        pandas DataFrame with one row per time step: 'Time' followed by the
+        columns of the patterns (e.g. Co_max, deltaT, p_initial, ExecutionTime).
+        Restart segments (time decreasing within a log or between logs) are
+        combined as in function_objects.stitch_restart_data().
+    """
+    if isinstance(logfiles, (str, Path)):
+        logfiles = [logfiles]
+
+    segments = []
+    for logfile in logfiles:
+        if cache:
+            table = _cached_log_table(logfile, patterns)
+        else:
+            table = _scan_table(logfile, patterns)
+        segments += _restart_segments(table)
+
+    if not segments:
+        return _LogScanner(patterns).table()
+    return fo.stitch_restart_data(segments, verbose=verbose)
+
+
+class LogFollower:
+    """
+    Incremental reader of a growing solver log, e.g. for monitoring a running
+    case. Each poll() reads only the bytes appended since the previous poll,
+    hence the cost of a poll depends on the new output only. Rotation (a new
+    file with the same name) and truncation of the log are detected, after
+    which the log is followed again from its beginning.
+    Input:
+        logfile: path to the log file (it may not exist yet).
+        patterns: names of the registered patterns to extract (None for all).
+        block_size: maximum number of bytes processed at once.
+
+    Example:
+        follower = LogFollower("log.foamRun", patterns=["courant", "vapor_pen"])
+        while running:
+            new_rows = follower.poll()
+            ...
+    """
+
+    def __init__(self, logfile, patterns=None, block_size=_BLOCK_SIZE):
+        self.logfile = Path(logfile)
+        self.patterns = patterns
+        self.block_size = block_size
+        # validate the pattern names
+        _LogScanner(patterns)
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the state and follow the log again from its beginning.
+        """
+        self.offset = 0
+        self.n_rows = 0
+        self._file_id = None
+        self._partial = b''
+        self._pending = b''
+        self._skip_first = False
+
+    def _consume(self, lines, final):
+        """
+        Scan the pending text together with new complete lines and return the
+        completed time steps. The text from the "Time =" line of the last returned
+        time step is kept, since the lines preceding the next time step (e.g.
+        Courant number) are printed after it.
+        """
+        self._pending += lines
+        scanner = _LogScanner(self.patterns)
+        scanner.feed(self._pending)
+        table = scanner.table()
+        start = 1 if self._skip_first else 0
+        # the last time step is complete only when the next one has started
+        stop = len(table) if final else len(table) - 1
+        if stop <= start:
+            return table.iloc[0:0]
+        self._pending = self._pending[scanner.time_pos.values()[stop - 1]:]
+        self._skip_first = True
+        return table.iloc[start:stop]
+
+    def poll(self, final=False):
+        """
+        Read the newly appended output of the log.
+        Input:
+            final: the log is complete, i.e. return also the last time step and
+                the last line even if it has no newline yet.
+        Return:
+            pandas DataFrame of the time steps completed since the previous poll
+            (columns as in parse_log()).
+        """
+        try:
+            stat = self.logfile.stat()
+        except FileNotFoundError:
+            return _LogScanner(self.patterns).table()
+        file_id = (stat.st_dev, stat.st_ino)
+        if self._file_id is not None and (file_id != self._file_id or stat.st_size < self.offset):
+            # rotated or truncated log
+            self.reset()
+        self._file_id = file_id
+
+        new_rows = []
+        with open(str(self.logfile), 'rb') as f:
+            f.seek(self.offset)
+            while True:
+                block = f.read(self.block_size)
+                self.offset += len(block)
+                eof = len(block) < self.block_size
+                block = self._partial + block
+                end = block.rfind(b'\n') + 1
+                if final and eof:
+                    end = len(block)
+                self._partial = block[end:]
+                new_rows.append(self._consume(block[:end], final and eof))
+                if eof:
+                    break
+
+        data = pd.concat(new_rows, axis=0, ignore_index=True)
+        data.index += self.n_rows
+        self.n_rows += len(data)
+        return data
+
+
+def _parse_log_job(job):
+    """
+    Process pool task of parse_logs_batch(). The pattern definitions are
+    passed along, since the registry of a spawned worker holds the defaults only.
+    """
+    case, logfiles, patterns = job
+    _LOG_PATTERNS.update(patterns)
+    try:
+        return case, parse_log(logfiles, list(patterns)), None
+    except (OSError, EOFError, ValueError, lzma.LZMAError) as e:
+        return case, None, repr(e)
+
+
+def _case_name(logfile):
+    """
+    Case name of a log file: the name of its directory, e.g. "case_01" for
+    "sweep/case_01/log.foamRun".
+    """
+    return Path(logfile).resolve().parent.name
+
+
+def parse_logs_batch(logfiles, patterns=None, workers=None):
+    """
+    Parse the logs of many cases (e.g. a parameter sweep) in parallel with
+    parse_log(). Compressed logs (.gz, .xz, .bz2) are read transparently.
+    Input:
+        logfiles: list of log files, or a dictionary of {case: log file(s)}
+            (a list of files of consecutive restarts per case). For a list, the
+            case is named after the directory of the log file.
+        patterns: names of the registered patterns to extract (None for all).
+        workers: number of worker processes (None: number of CPUs, 1: serial).
+    Return:
+        pandas DataFrame indexed by (case, step). Logs which cannot be read are
+        reported and skipped.
+    """
+    if not isinstance(logfiles, dict):
+        names = [_case_name(logfile) for logfile in logfiles]
+        if len(set(names)) < len(names):
+            names = [str(logfile) for logfile in logfiles]
+        logfiles = OrderedDict(zip(names, logfiles))
+
+    names = registered_patterns() if patterns is None else list(patterns)
+    _LogScanner(names)
+    pattern_defs = OrderedDict((name, _LOG_PATTERNS[name]) for name in names)
+    jobs = [(case, files, pattern_defs) for case, files in logfiles.items()]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        results = [_parse_log_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_parse_log_job, jobs))
+
+    tables = OrderedDict()
+    for case, data, error in results:
+        if error is not None:
+            print("Warning: unable to parse log of case " + repr(case) + ": " + error)
+            continue
+        tables[case] = data
+    if not tables:
+        return pd.DataFrame()
+    return pd.concat(tables, names=['case', 'step'])
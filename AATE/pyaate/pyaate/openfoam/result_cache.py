@@ -0,0 +1,148 @@
+"""
+Per-case cache of parsed result tables (solver logs and function object data).
+
+Tables are stored column-wise in numpy .npz files under
+<case>/postProcessing/.pyaate_cache, one file per source file and parser. An
+entry is reused while the size and modification time of the source match. If the
+source has only grown (e.g. a running case), the cached table is extended by
+parsing the appended bytes only. Caching is skipped silently for read-only cases.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR_NAME = '.pyaate_cache'
+_CACHE_VERSION = 2
+# Bytes hashed from the beginning of the source to detect replaced files
+_HEAD_BYTES = 4096
+
+
+def case_cache_dir(source):
+    """
+    Cache directory of a result file: <case>/postProcessing/.pyaate_cache, where
+    the case is deduced from the postProcessing directory in the path of the
+    source, or else the source is assumed to be in the case directory (e.g. a log).
+    """
+    source = Path(source).resolve()
+    for parent in source.parents:
+        if parent.name == 'postProcessing':
+            return parent / CACHE_DIR_NAME
+    return source.parent / 'postProcessing' / CACHE_DIR_NAME
+
+
+def _entry_file(source, kind):
+    source = Path(source).resolve()
+    digest = hashlib.sha1((str(source) + '\0' + kind).encode('utf-8')).hexdigest()[:20]
+    return case_cache_dir(source) / (source.name + '.' + digest + '.npz')
+
+
+def _head_hash(source):
+    with open(str(source), 'rb') as f:
+        return hashlib.sha1(f.read(_HEAD_BYTES)).hexdigest()
+
+
+def _save(entry_file, table, meta):
+    """
+    Store a table column-wise together with its metadata (atomic replace).
+    """
+    arrays = {'__index__': table.index.to_numpy()}
+    for i, column in enumerate(table.columns):
+        values = table[column].to_numpy()
+        arrays['c' + str(i)] = values.astype(str) if values.dtype == object else values
+    meta['columns'] = [str(column) for column in table.columns]
+    arrays['__meta__'] = np.array(json.dumps(meta))
+    entry_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = entry_file.with_name(entry_file.name + '.tmp' + str(os.getpid()))
+    with open(str(tmp_file), 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(str(tmp_file), str(entry_file))
+
+
+def _load(entry_file):
+    """
+    Return (table, meta) of a cache entry, or None if not available.
+    """
+    try:
+        with np.load(str(entry_file), allow_pickle=False) as npz:
+            meta = json.loads(str(npz['__meta__']))
+            if meta.get('version') != _CACHE_VERSION:
+                return None
+            columns = meta['columns']
+            data = {column: npz['c' + str(i)] for i, column in enumerate(columns)}
+            table = pd.DataFrame(data, index=npz['__index__'], columns=columns)
+    except (OSError, KeyError, ValueError):
+        return None
+    return table, meta
+
+
+def cached_table(source, kind, parse_full, parse_append=None, finalize=None, enabled=True):
+    """
+    Return the parsed table of a source file from the case cache, parsing the
+    source (or only its appended part) when required.
+    Input:
+        source: path to the source file.
+        kind: identifier of the parser and its options, part of the cache key.
+        parse_full: function(source) -> (table, state) parsing the whole file.
+            state is a json-serializable dictionary including the 'offset' of
+            the first byte not consumed by the parser.
+        parse_append: function(source, table, state) -> (table, state) parsing
+            the bytes from state['offset'] on. If None, grown files are re-parsed.
+        finalize: optional function(table, state) -> table applied to the returned
+            table (not stored), e.g. to add a pending incomplete last row.
+        enabled: use the cache. If False, the source is parsed without caching.
+    Return:
+        pandas DataFrame
+    """
+    if finalize is None:
+        finalize = lambda table, state: table
+    if not enabled:
+        table, state = parse_full(source)
+        return finalize(table, state)
+
+    stat = os.stat(str(source))
+    entry_file = _entry_file(source, kind)
+    entry = _load(entry_file)
+    table = None
+    if entry is not None:
+        cached, meta = entry
+        if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+            return finalize(cached, meta['state'])
+        if (parse_append is not None and stat.st_size > meta['size']
+                and meta['head'] == _head_hash(source)):
+            table, state = parse_append(source, cached, meta['state'])
+
+    if table is None:
+        table, state = parse_full(source)
+
+    meta = {
+        'version': _CACHE_VERSION,
+        'source': str(Path(source).resolve()),
+        'kind': kind,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'head': _head_hash(source),
+        'state': state,
+    }
+    if stat.st_size > state.get('offset', stat.st_size):
+        # the source grew while it was parsed: the remainder is parsed next time
+        meta['size'] = state['offset']
+    try:
+        _save(entry_file, table, meta)
+    except OSError:
+        # read-only case directory
+        pass
+    return finalize(table, state)
+
+
+def clear_cache(case_dir):
+    """
+    Remove the result cache of a case directory.
+    """
+    cache_dir = Path(case_dir, 'postProcessing', CACHE_DIR_NAME)
+    if cache_dir.is_dir():
+        shutil.rmtree(str(cache_dir))
@@ -1,5 +1,6 @@
 import unittest
 import os
+import tempfile
 from pathlib import Path
 import numpy as np
 from ruamel.yaml import YAML
@@ -13,6 +14,7 @@ from pyaate.engine import units
 from pyaate.engine import engines
 from pyaate.engine import injectors
 from pyaate.engine.valves import ValveSet
+from pyaate.meshing import surfaces
 import pyaate.engine.valves as valve_func
 eps = 1e-12
 engine_setup_file = Path(
@@ -63,6 +65,167 @@ class TestEngine(unittest.TestCase):
         self.assertTrue(np.abs(pos180 - engine.stroke) < eps)
         self.assertTrue(np.abs(pos360) < eps)
 
+    def test_kinematics(self):
+        engine = engines.Engine(engine_setup['engine'])
+        cad = np.linspace(-360, 360, 721)
+        kin = engine.kinematics(cad)
+        self.assertTrue(np.max(np.abs(kin['position'] - engine.piston_position(cad))) < eps)
+        # finite difference references
+        h = 1e-3
+        vel = (engine.piston_position(cad + h) - engine.piston_position(cad - h)) / \
+            units.deg_to_sec(2 * h, engine.rpm)
+        self.assertTrue(np.max(np.abs(kin['velocity'] - vel)) < 1e-5)
+        self.assertTrue(np.max(np.abs(engine.piston_velocity(cad) - np.abs(vel))) < 1e-5)
+        self.assertTrue(np.array_equal(engine.piston_velocity(cad, dcad=1e-6),
+                                       engine.piston_velocity(cad)))
+        acc = (engine.piston_velocity(cad[1:-1] + h) - engine.piston_velocity(cad[1:-1] - h)) / \
+            units.deg_to_sec(2 * h, engine.rpm)
+        acc_ref = np.sign(kin['velocity'][1:-1]) * acc
+        mask = np.abs(kin['velocity'][1:-1]) > 1.0
+        self.assertTrue(np.max(np.abs(kin['acceleration'][1:-1] - acc_ref)[mask]) < 1e-3)
+        dvol = (engine.cylinder_volume(cad + h) - engine.cylinder_volume(cad - h)) / (2 * h)
+        self.assertTrue(np.max(np.abs(kin['dvolume'] - dvol)) < 1e-10)
+        # compression ratio and compression direction
+        self.assertTrue(np.abs(np.max(kin['volume']) / np.min(kin['volume']) - 12) < 1e-9)
+        self.assertTrue(list(engine.is_compressing(np.array([0.0, 90.0, 180.0, 270.0]))) ==
+                        [False, False, True, True])
+        self.assertTrue(type(engine.is_compressing(270.0)) is bool)
+        # volume and position from the same clearance definition
+        engine_dict = dict(engine_setup['engine'], clearance=0.01)
+        engine = engines.Engine(engine_dict)
+        bowl = engine.clearance_volume() - engine.piston_area() * 0.01
+        err = engine.cylinder_volume(cad) - (engine.piston_area() * engine.piston_position(cad) + bowl)
+        self.assertTrue(np.max(np.abs(err)) < eps)
+        for key, value in (('compressionRatio', 1.0), ('clearance', -0.1)):
+            with self.assertRaises(ValueError):
+                engines.Engine(dict(engine_setup['engine'], **{key: value}))
+
+    def test_kinematics_cache(self):
+        engine = engines.Engine(engine_setup['engine'])
+        cad1 = np.arange(-360, 360, 0.01)
+        cad2 = np.arange(0, 720, 0.01)
+        exact1 = engine.kinematics(cad1)
+        exact2 = engine.kinematics(cad2)
+        engine.enable_kinematics_cache(size=2)
+        # alternating queries are served from the cache
+        for i in range(2):
+            for cad, exact in ((cad1, exact1), (cad2, exact2)):
+                kin = engine.kinematics(cad)
+                for name in exact:
+                    self.assertTrue(np.array_equal(kin[name], exact[name]))
+        self.assertTrue(len(engine._kinematics_cache) == 2)
+        # modifying a result does not corrupt the cache
+        engine.cylinder_volume(cad1)[:] = 0.0
+        self.assertTrue(np.array_equal(engine.cylinder_volume(cad1), exact1['volume']))
+        # the cache follows geometry changes
+        engine.stroke = 0.4
+        self.assertTrue(np.abs(engine.piston_position(np.full(2000, 180.0))[0] - 0.4) < eps)
+        self.assertTrue(len(engine._kinematics_cache) == 2)
+        # quantities are evaluated only when requested
+        cad3 = np.arange(0, 360, 0.1)
+        engine.compression_ratio = 1.0
+        pos = engine.piston_position(cad3)
+        self.assertTrue(list(engine._kinematics_cache.values())[-1].keys() == {'position_from_tdc'})
+        engine.disable_kinematics_cache()
+        self.assertTrue(np.array_equal(engine.piston_position(cad3), pos))
+        self.assertTrue(np.abs(engine.piston_position(180.0) - 0.4) < eps)
+
+    def test_surface_clearance(self):
+        engine = engines.Engine(engine_setup['engine'], engine_setup['valves'])
+        iv = engine.valves.get_valve('IV')
+        t = np.array((0.0, 100.0, 200.0, 300.0, 720.0))
+        iv.set_lift_profile(t, np.array((0.0, 0.0, 0.01, 0.0, 0.0)), 100.0, 300.0)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            piston_file = Path(tmp_dir, "piston.stl")
+            head_file = Path(tmp_dir, "head.stl")
+            valve_file = Path(tmp_dir, "IV.obj")
+            gen_plane(piston_file, 0.0, 0.15)
+            gen_plane(head_file, 0.03, 0.15)
+            with open(str(valve_file), 'w') as f:
+                for x in np.linspace(-0.05, 0.05, 11):
+                    f.write("v {} {} 0.02\n".format(x, x))
+            engine.load_surfaces(piston_file, head_file, {'IV': valve_file})
+            cad = np.arange(0.0, 720.0, 1.0)
+            distances = engine.surfaces.distances(engine.piston_pos_from_tdc(cad),
+                                                  engine.valve_lifts(cad))
+        pos = engine.piston_pos_from_tdc(cad)
+        lift = iv.interp_lift(cad)
+        self.assertTrue(np.max(np.abs(distances['piston-head'] - (0.03 + pos))) < 1e-9)
+        self.assertTrue(np.max(np.abs(distances['piston-IV'] - (0.02 - lift + pos))) < 1e-9)
+        self.assertTrue(np.max(np.abs(distances['IV-head'] - (0.01 + lift))) < 1e-9)
+        cl = engine.clearance(cad, simple=False)
+        self.assertTrue(np.max(np.abs(cl - (0.02 - lift + pos))) < 1e-9)
+        self.assertTrue(np.abs(engine.clearance(200.0, simple=False, downsample=0.5) -
+                               (0.01 + engine.piston_pos_from_tdc(200.0))) < 1e-9)
+        self.assertTrue(len(engine.surfaces.piston.query_points(0.5)) <
+                        len(engine.surfaces.piston.points))
+
+    def test_multi_cylinder_engine(self):
+        engine = engines.MultiCylinderEngine(engine_setup['engine'], engine_setup['valves'],
+                                             firing_order=[1, 5, 3, 6, 2, 4])
+        iv = engine.valves.get_valve('IV')
+        t = np.array((0.0, 340.0, 450.0, 580.0, 720.0))
+        iv.set_lift_profile(t, np.array((0.0, 0.0, 0.01, 0.0, 0.0)), 340.0, 580.0)
+        self.assertTrue(engine.n_cylinders == 6)
+        self.assertTrue(list(engine.phase_offsets) == [0, 480, 240, 600, 120, 360])
+        self.assertTrue(engine.firing_table()[4] == (5, 1, 120.0))
+        cad = np.arange(0.0, 720.0, 0.5)
+        kin = engine.cylinder_kinematics(cad)
+        self.assertTrue(kin['volume'].shape == (6, len(cad)))
+        # cylinder 5 fires 120 CAD after cylinder 1
+        single = engines.Engine(engine_setup['engine'])
+        err = np.abs(kin['position'][4] - single.piston_position(cad - 120.0))
+        self.assertTrue(np.max(err) < eps)
+        lifts = engine.cylinder_valve_lifts(cad)
+        self.assertTrue(np.abs(lifts['IV'][4, 1140] - 0.01) < eps)
+        self.assertTrue(engine.cylinder_piston_position(cad).shape == (6, len(cad)))
+        with self.assertRaises(ValueError):
+            engines.MultiCylinderEngine(engine_setup['engine'], firing_order=[1, 2, 2])
+        uneven = engines.MultiCylinderEngine(engine_setup['engine'], phase_offsets=[0, 90, 360, 450])
+        self.assertTrue(uneven.firing_order == [1, 2, 3, 4])
+
+    def test_engine_snapshot(self):
+        engine = engines.CIEngine(engine_setup['engine'], engine_setup['injector'],
+                                  engine_setup['valves'])
+        t = np.linspace(-20.0, 20.0, 41)
+        engine.injector.set_flow_rate(t, np.full(len(t), 0.5), 800.0, 'mass')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            lift_file = Path(tmp_dir, 'iv.dat')
+            np.savetxt(lift_file, np.array(((0.0, 0.0), (340.0, 0.0), (450.0, 0.01),
+                                            (580.0, 0.0), (720.0, 0.0))))
+            data = np.loadtxt(lift_file)
+            iv = engine.valves.get_valve('IV')
+            iv.set_lift_profile(data[:, 0], data[:, 1], 340.0, 580.0, lift_file)
+            snapshot_file = Path(tmp_dir, 'engine.snapshot')
+            engine.save(snapshot_file, sources=[engine_setup_file])
+
+            loaded = engines.Engine.load(snapshot_file)
+            self.assertTrue(type(loaded) is engines.CIEngine)
+            self.assertTrue(loaded.stroke == engine.stroke and loaded.rpm == engine.rpm)
+            self.assertTrue(np.array_equal(loaded.valves.get_valve('IV').lift, iv.lift))
+            self.assertTrue(loaded.valves.get_valve('IV').t_closing == 580.0)
+            self.assertTrue(loaded.valves.get_valve('IV').lift_file == str(lift_file))
+            self.assertTrue(np.array_equal(loaded.injector.mfr, engine.injector.mfr))
+            cad = np.arange(0.0, 720.0, 1.0)
+            err = np.abs(loaded.cylinder_volume(cad) - engine.cylinder_volume(cad))
+            self.assertTrue(np.max(err) < eps)
+            with self.assertRaises(ValueError):
+                engines.SIEngine.load(snapshot_file)
+            self.assertTrue(type(loaded.injector) is injectors.LiquidInjector)
+            self.assertTrue(sorted(os.listdir(tmp_dir)) == ['engine.snapshot', 'iv.dat'])
+            # attributes that cannot be stored are not dropped silently
+            engine.injector.fuel = object()
+            with self.assertRaises(ValueError):
+                engine.save(Path(tmp_dir, 'invalid.snapshot'))
+            self.assertFalse(Path(tmp_dir, 'invalid.snapshot').exists())
+            del engine.injector.fuel
+
+            # changed source input
+            np.savetxt(lift_file, data * 2.0)
+            with self.assertRaises(ValueError):
+                engines.Engine.load(snapshot_file)
+            self.assertTrue(engines.Engine.load(snapshot_file, check=False).name == engine.name)
+
     def test_liquid_injector(self):
         injector = injectors.LiquidInjector(engine_setup['injector'])
         self.assertTrue(injector.name == "nozzle")
@@ -117,6 +280,19 @@ class TestEngine(unittest.TestCase):
 
 
 
+def gen_plane(filename, z, half_width, reso=11):
+    """
+    Generates a square plane at height z.
+    """
+    x = np.linspace(-half_width, half_width, reso)
+    x, y = np.meshgrid(x, x)
+    tri = Triangulation(np.ravel(x), np.ravel(y))
+    plane = mesh.Mesh(np.zeros(tri.triangles.shape[0], dtype=mesh.Mesh.dtype))
+    points = np.column_stack((np.ravel(x), np.ravel(y), np.full(x.size, z)))
+    plane.vectors[:] = points[tri.triangles]
+    plane.save(str(filename))
+
+
 def gen_half_sphere(filename, rho, rho_z, reso=20):
     """
     Generates spherical cylinder head of radius 1.1
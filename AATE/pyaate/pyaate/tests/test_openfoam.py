@@ -1,9 +1,17 @@
 import unittest
 from pathlib import Path
 import os
+import gzip
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
 from pyaate.openfoam import function_objects as fo
+from pyaate.openfoam import fields
+from pyaate.openfoam import parse_logs
+from pyaate.meshing import polymesh
 from pyaate.openfoam import dictionary as foamIO
+from pyaate.openfoam import dict_parser
 
 
 test_case = Path(
@@ -14,6 +22,30 @@ foam_dict = Path(
     os.path.dirname(__file__),
     'test_data/foam_dict.foam')
 
+macro_dict = Path(
+    os.path.dirname(__file__),
+    'test_data/macro_dict.foam')
+
+cube_mesh = Path(
+    os.path.dirname(__file__),
+    'test_data/openfoam_data/cube_mesh')
+
+log_file = Path(
+    os.path.dirname(__file__),
+    'test_data/openfoam_data/log.sprayFoam')
+
+field_file = Path(
+    os.path.dirname(__file__),
+    'test_data/field_U.foam')
+
+block_mesh_dict = Path(
+    os.path.dirname(__file__),
+    '../../../meshes/snappyHexMesh/templateCase/system/blockMeshDict')
+
+residuals_file = Path(
+    os.path.dirname(__file__),
+    'test_data/openfoam_data/residuals_data/postProcessing/residuals/0/residuals.dat')
+
 
 class TestFoamFuncObjTools(unittest.TestCase):
 
@@ -22,6 +54,17 @@ class TestFoamFuncObjTools(unittest.TestCase):
         data = fo.load_data_pandas(file_name)
         self.assertTrue(type(data) is pd.core.frame.DataFrame)
         # test actual numbers
+        self.assertTrue(list(data.columns) == ['Time', 'data'])
+        self.assertTrue(np.isnan(data['data'].values[0]))
+        self.assertTrue(data['data'].values[3] == 3)
+
+    def test_read_columns(self):
+        data = fo.load_data_pandas(residuals_file, usecols=['Time', 'Ux'],
+                                   dtype={'Ux': np.float32})
+        self.assertTrue(list(data.columns) == ['Time', 'Ux'])
+        self.assertTrue(data['Ux'].dtype == np.float32)
+        self.assertTrue(np.isnan(data['Ux'].values[0]))
+        self.assertTrue(np.isclose(data['Ux'].values[1], 0.999999996))
 
     def test_appending(self):
 
@@ -54,6 +97,24 @@ class TestFoamFuncObjTools(unittest.TestCase):
         self.assertTrue(data_appended.iloc[:, 1].values[4] == 40)
         self.assertTrue(data_appended.iloc[:, 2].values[4] == 400)
 
+        # one-pass stitching of several restarts
+        data2 = pd.DataFrame([[1.5, 15, 150], [2.5, 25, 250]], columns=['Time', 'a', 'b'])
+        data_stitched = fo.stitch_restart_data([data0, data1, data2])
+        data_appended = fo.append_restart_data(
+            fo.append_restart_data(data0, data1, verbose=False), data2, verbose=False)
+        self.assertTrue(data_stitched.equals(data_appended))
+        self.assertTrue(list(data_stitched['Time'].values) == [0, 1, 1.5, 2.5])
+
+    def test_latest_restart_file(self):
+        residuals = residuals_file.parents[1]
+        data = fo.load_data(residuals, append=True)
+        self.assertTrue(data['Time'].is_monotonic_increasing)
+        self.assertTrue(data['Time'].values[-1] > 0.006)
+        # the restart file residuals_0.005.dat ends before the next restart
+        data_latest = fo.load_data_pandas(Path(residuals, "0.005/residuals_0.005.dat"))
+        segment = data[(data['Time'] >= 0.005) & (data['Time'] < 0.006)]
+        self.assertTrue(len(segment) == len(data_latest[data_latest['Time'] < 0.006]))
+
     def test_fo_loader(self):
 
         fo_file = Path(test_case, "postProcessing/test")
@@ -62,6 +123,209 @@ class TestFoamFuncObjTools(unittest.TestCase):
         self.assertTrue(data.iloc[:, 1].values[2] == 2)
         self.assertTrue(data.iloc[:, 1].values[5] == 6)
 
+    def test_result_cache(self):
+        with open(str(residuals_file), 'rb') as f:
+            content = f.read()
+        reference = fo.load_data_pandas(residuals_file)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fo_file = Path(tmp_dir, "postProcessing/residuals/0/residuals.dat")
+            fo_file.parent.mkdir(parents=True)
+            half = content.rfind(b'\n', 0, len(content) // 2) + 20
+            with open(str(fo_file), 'wb') as f:
+                f.write(content[:half])
+            data = fo.load_data_cached(fo_file)
+            cache_files = list(Path(tmp_dir, "postProcessing/.pyaate_cache").glob("*.npz"))
+            self.assertTrue(len(cache_files) == 1)
+            # the grown file is extended from the cached table
+            with open(str(fo_file), 'ab') as f:
+                f.write(content[half:])
+            data = fo.load_data_cached(fo_file)
+            self.assertTrue(data.shape == reference.shape)
+            np.testing.assert_array_equal(data.values, reference.values)
+            self.assertTrue(list(data.columns) == list(reference.columns))
+            # unchanged file is read from the cache
+            np.testing.assert_array_equal(fo.load_data_cached(fo_file).values, reference.values)
+
+    def test_load_case(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shutil.copytree(str(residuals_file.parents[1]), str(Path(tmp_dir, "postProcessing/residuals")))
+            shutil.copytree(str(Path(test_case, "postProcessing/test")),
+                            str(Path(tmp_dir, "postProcessing/test")))
+            case = fo.load_case(tmp_dir)
+            self.assertTrue(sorted(case) == ['residuals', 'test'])
+            self.assertTrue(case['test'].equals(fo.load_data(Path(test_case, "postProcessing/test"))))
+            aligned = case.aligned()
+            self.assertTrue(aligned.index.is_monotonic_increasing)
+            self.assertTrue(aligned[('test', 'data')].loc[2] == 2)
+            self.assertTrue(len(fo.load_case(tmp_dir, objects=['test'])) == 1)
+
+    def test_follower(self):
+        residuals = residuals_file.parents[1]
+        reference = fo.load_data(residuals)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fo_path = Path(tmp_dir, "residuals")
+            follower = fo.FunctionObjectFollower(fo_path)
+            self.assertTrue(len(follower.poll()) == 0)
+            # the first segment is written in pieces which split lines
+            Path(fo_path, "0").mkdir(parents=True)
+            with open(str(Path(residuals, "0/residuals.dat")), 'rb') as f:
+                content = f.read()
+            n_rows = 0
+            for i in range(0, len(content), 4000):
+                with open(str(Path(fo_path, "0/residuals.dat")), 'ab') as f:
+                    f.write(content[i:i + 4000])
+                n_rows += len(follower.poll())
+            self.assertTrue(n_rows == len(fo.load_data_pandas(Path(residuals, "0/residuals.dat"))))
+            # restarts are followed into the new time directories
+            for time in ["0.005", "0.006"]:
+                shutil.copytree(str(Path(residuals, time)), str(Path(fo_path, time)))
+            follower.poll()
+            self.assertTrue(follower.fo_file.name == "residuals.dat")
+            self.assertTrue(follower.data.equals(reference))
+            # a restart writing residuals_<time>.dat into an existing time directory
+            restart = fo.load_data_pandas(Path(residuals, "0.006/residuals.dat"))
+            with open(str(Path(residuals, "0.006/residuals.dat")), 'r') as f:
+                lines = f.readlines()
+            n_header = len(lines) - len(restart)
+            with open(str(Path(fo_path, "0.006/residuals_0.006.dat")), 'w') as f:
+                f.writelines(lines[:n_header + 2])
+            follower.poll()
+            self.assertTrue(follower.fo_file.name == "residuals_0.006.dat")
+            time = follower.data["Time"].values
+            self.assertTrue(time[-1] == restart["Time"].values[1])
+            self.assertTrue(np.all(np.diff(time) > 0))
+            # and into an earlier one
+            with open(str(Path(fo_path, "0/residuals_0.dat")), 'w') as f:
+                f.writelines(lines[:n_header + 1])
+            follower.poll()
+            self.assertTrue(follower.fo_file.name == "residuals_0.dat")
+            self.assertTrue(follower.data["Time"].values[-1] == restart["Time"].values[0])
+            os.remove(str(Path(fo_path, "0/residuals_0.dat")))
+            os.remove(str(Path(fo_path, "0.006/residuals_0.006.dat")))
+            # only the last time window is buffered
+            follower = fo.FunctionObjectFollower(fo_path, window=0.001)
+            follower.poll()
+            time = follower.data["Time"].values
+            self.assertTrue(time[-1] == reference["Time"].values[-1])
+            self.assertTrue(time[-1] - time[0] < 0.001)
+
+    def test_cycle_ensemble(self):
+        time = np.arange(0, 4 * 720, 0.5)
+        data = pd.DataFrame({'Time': time, 'p': np.cos(np.radians(time)) + time // 720})
+        ensemble = fo.cycle_ensemble(data, 'p', repeat=720, start=0, resolution=2.0)
+        self.assertTrue(ensemble.values.shape == (4, 360))
+        self.assertTrue(list(ensemble.cycles) == [0, 1, 2, 3])
+        np.testing.assert_allclose(ensemble.values[:, 0], [1, 2, 3, 4])
+        np.testing.assert_allclose(ensemble.mean, np.cos(np.radians(ensemble.cad)) + 1.5)
+        stats = ensemble.statistics()
+        self.assertTrue(list(stats.columns) == ['mean', 'std', 'min', 'max', 'cov'])
+        self.assertTrue(np.isclose(ensemble.ccv(), np.std([1, 2, 3, 4]) / 2.5))
+        # cycles as in load_data(repeat=720, start=-360), the partial cycles are NaN padded
+        ensemble = fo.cycle_ensemble(data, 'p', repeat=720, start=-360)
+        self.assertTrue(ensemble.cad[0] == 360 and len(ensemble.cycles) == 5)
+        self.assertTrue(np.isnan(ensemble.values[0, 0]) and not np.isnan(ensemble.values[0, -1]))
+        complete = fo.cycle_ensemble(data, 'p', repeat=720, start=-360, complete_only=True)
+        self.assertTrue(list(complete.cycles) == [1, 2, 3])
+
+
+class TestFoamLogs(unittest.TestCase):
+
+    def test_parse_time(self):
+        time = parse_logs.parse_time(log_file)
+        self.assertTrue(np.allclose(time, [1e-6, 2e-6, 3e-6, 4e-6]))
+
+    def test_parse_lagrangian(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = Path(tmp_dir, "lagrangian_info.txt")
+            time, vapor_pen, liquid_pen, phase_change = parse_logs.parse_lagrangian(
+                log_file, output=output)
+            self.assertTrue(output.is_file())
+            self.assertTrue(len(os.listdir(tmp_dir)) == 1)
+        self.assertTrue(len(time) == 4)
+        self.assertTrue(vapor_pen[0] == 0.002)
+        self.assertTrue(liquid_pen[3] == 0.004)
+        self.assertTrue(phase_change[1] == 2e-9)
+
+    def test_parse_log(self):
+        data = parse_logs.parse_log(log_file)
+        self.assertTrue(len(data) == 4)
+        self.assertTrue(data["Co_max"].values[1] == 0.2)
+        self.assertTrue(data["p_iterations"].values[3] == 14)
+        self.assertTrue(data["Ux_initial"].values[0] == 0.001)
+        self.assertTrue(data["ClockTime"].values[2] == 3)
+
+        parse_logs.register_pattern(
+            "parcels", "Current number of parcels", r"\s*=\s*(?P<parcels>\d+)", reduce="max")
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                # restarted run: the second log starts again from the second time step
+                restart_log = Path(tmp_dir, "log.restart")
+                with open(str(log_file), 'r') as f:
+                    lines = f.read().split("\n")
+                start = [i for i, line in enumerate(lines) if line.startswith("Time = 2e-06")][0]
+                with open(str(restart_log), 'w') as f:
+                    f.write("\n".join(lines[start - 2:]).replace("= 300", "= 333"))
+                data = parse_logs.parse_log([log_file, restart_log], patterns=["parcels"])
+        finally:
+            parse_logs.unregister_pattern("parcels")
+        self.assertTrue(list(data["Time"].values) == [1e-6, 2e-6, 3e-6, 4e-6])
+        self.assertTrue(data["parcels"].values[2] == 333)
+        self.assertFalse("parcels" in parse_logs.registered_patterns())
+
+    def test_parse_logs_batch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            logfiles = []
+            for case in ("case_a", "case_b"):
+                Path(tmp_dir, case).mkdir()
+                logfiles.append(Path(tmp_dir, case, "log.sprayFoam.gz"))
+                with open(str(log_file), 'rb') as f_in, gzip.open(str(logfiles[-1]), 'wb') as f:
+                    f.write(f_in.read())
+            logfiles.append(Path(tmp_dir, "missing", "log.sprayFoam"))
+            data = parse_logs.parse_logs_batch(logfiles, patterns=["courant", "deltaT"], workers=2)
+        self.assertTrue(list(data.index.levels[0]) == ["case_a", "case_b"])
+        self.assertTrue(data.loc["case_b"]["Co_max"].values[3] == 0.4)
+
+    def test_parse_log_cache(self):
+        with open(str(log_file), 'rb') as f:
+            content = f.read()
+        reference = parse_logs.parse_log(log_file)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            live_log = Path(tmp_dir, "log.sprayFoam")
+            with open(str(live_log), 'wb') as f:
+                f.write(content[:len(content) // 2])
+            self.assertTrue(len(parse_logs.parse_log(live_log, cache=True)) == 2)
+            with open(str(live_log), 'ab') as f:
+                f.write(content[len(content) // 2:])
+            for i in range(2):
+                data = parse_logs.parse_log(live_log, cache=True)
+                self.assertTrue(list(data.columns) == list(reference.columns))
+                np.testing.assert_array_equal(data.values, reference.values)
+            self.assertTrue(Path(tmp_dir, "postProcessing/.pyaate_cache").is_dir())
+
+    def test_log_follower(self):
+        with open(str(log_file), 'rb') as f:
+            content = f.read()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            live_log = Path(tmp_dir, "log.live")
+            follower = parse_logs.LogFollower(live_log, patterns=["courant", "vapor_pen"])
+            self.assertTrue(len(follower.poll()) == 0)
+            rows = []
+            # append the log in pieces which split lines
+            for i in range(0, len(content), 150):
+                with open(str(live_log), 'ab') as f:
+                    f.write(content[i:i + 150])
+                rows.append(follower.poll())
+            rows.append(follower.poll(final=True))
+            data = pd.concat(rows)
+            self.assertTrue(list(data.index) == [0, 1, 2, 3])
+            self.assertTrue(list(data["Co_max"].values) == [0.1, 0.2, 0.3, 0.4])
+            self.assertTrue(data["vapor_pen"].values[3] == 0.008)
+            self.assertTrue(follower.offset == len(content))
+            # truncated log is followed from the beginning
+            with open(str(live_log), 'wb') as f:
+                f.write(content[:len(content) // 2])
+            self.assertTrue(len(follower.poll(final=True)) == 2)
+
 
 class TestFoamDictionaries(unittest.TestCase):
 
@@ -72,6 +336,278 @@ class TestFoamDictionaries(unittest.TestCase):
             self.assertTrue(setup_dict["PISO"]["nCorrectors"] == "2")
             self.assertTrue(setup_dict["variable"] == "unique")
 
+    def test_read_batch(self):
+        if(foamIO.foam_found()):
+            foamIO.reset_backend_stats()
+            setup_dict = foamIO.read_dict(foam_dict, backend='foamBatch', cache=False)
+            self.assertTrue(setup_dict["solvers"]["p"]["solver"] == "PCG")
+            self.assertTrue(setup_dict["PISO"]["nCorrectors"] == "2")
+            self.assertTrue(foamIO.backend_stats()["foamBatch"]["subprocesses"] == 1)
+
+    def test_include_dependencies(self):
+        # cache dependencies of the OpenFOAM backends
+        include_files = foamIO._include_files(macro_dict)
+        self.assertTrue([Path(f).name for f in include_files] == ["foam_dict.foam"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dict_file = Path(tmp_dir, "dict")
+            with open(str(dict_file), 'w') as f:
+                f.write('#include "missing"\na 1;\n')
+            self.assertTrue(foamIO._include_files(dict_file) is None)
+
+    def test_read_python(self):
+        setup_dict = foamIO.read_dict(foam_dict, backend='python')
+        self.assertTrue(setup_dict["solvers"]["p"]["solver"] == "PCG")
+        self.assertTrue(setup_dict["PISO"]["nCorrectors"] == "2")
+        self.assertTrue(setup_dict["variable"] == "unique")
+        self.assertTrue(setup_dict["vector"] == "(1 2 3 4)")
+        self.assertTrue(setup_dict["FoamFile"]["object"] == "fvSolution")
+
+        setup_dict = foamIO.read_dict(foam_dict, python_types=True)
+        self.assertTrue(setup_dict["PISO"]["nCorrectors"] == 2)
+        self.assertTrue(setup_dict["float"] == 1.23456)
+        self.assertTrue((setup_dict["vector"] == [1, 2, 3, 4]).all())
+
+    def test_read_macros(self):
+        setup_dict = foamIO.read_dict(macro_dict)
+        # entries from the included file
+        self.assertTrue(setup_dict["solvers"]["p"]["solver"] == "PCG")
+        self.assertTrue(setup_dict["U"]["solver"] == "PCG")
+        self.assertTrue(setup_dict["U"]["tolerance"] == "1e-8")
+        self.assertTrue(setup_dict["defaults"]["tolerance"] == "1e-6")
+        self.assertTrue(setup_dict["copy"] == "1.5")
+        self.assertTrue(setup_dict["divSchemes"]["div(phi,U)"] == "Gauss linear")
+        self.assertTrue(
+            setup_dict["divSchemes"]["div((nuEff*dev2(T(grad(U)))))"] == "Gauss linear")
+        self.assertTrue(setup_dict["table"] == "((0 1) (1 2))")
+        # scoped references and #calc
+        injector = setup_dict["injector"]
+        self.assertTrue(injector["position2"] == "(1 2 5)")
+        self.assertTrue(injector["nested"]["parent"] == "2")
+        self.assertTrue(injector["nested"]["root"] == "Gauss linear")
+        self.assertTrue(injector["nested"]["scaled"] == "1")
+        self.assertTrue(injector["nested"]["other"] == "2")
+        # rounding functions of the repository blockMeshDict
+        block_mesh = foamIO.read_dict(block_mesh_dict, cache=False)
+        self.assertTrue(block_mesh["xcells"] == "58")
+        self.assertTrue(block_mesh["zcells"] == "98")
+        self.assertTrue(dict_parser._eval_calc("round(-2.5) + floor(1.5)", {}) == -2.0)
+        with self.assertRaises(ValueError) as error:
+            dict_parser._eval_calc("1 + 2 ** 3", {})
+        self.assertTrue("'2 ** 3'" in str(error.exception))
+
+    def test_include_func(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            system_dir = Path(tmp_dir, "system")
+            system_dir.mkdir()
+            with open(str(system_dir / "cellMax"), 'w') as f:
+                f.write("type cellMax;\nfields (U);\n")
+            with open(str(system_dir / "functions"), 'w') as f:
+                f.write("#includeFunc cellMax(name=maxCo, fields=(Co))\n"
+                        "#includeFunc cellMax(p)\n")
+            setup_dict = foamIO.read_dict(system_dir / "functions", cache=False)
+            self.assertTrue(setup_dict["maxCo"]["type"] == "cellMax")
+            self.assertTrue(setup_dict["maxCo"]["fields"] == "(Co)")
+            self.assertTrue(setup_dict["cellMax(p)"]["fields"] == "(p)")
+
+    def test_python_types(self):
+        setup_dict = foamIO.read_dict(macro_dict, python_types=True)
+        table = setup_dict["table"]
+        self.assertTrue(table.shape == (2, 2))
+        self.assertTrue(table[1, 0] == 1 and table[1, 1] == 2)
+        self.assertTrue(setup_dict["dimension"][2] == -1)
+
+        table = foamIO.infer_datatype("table ((0 1e-3) (1 2e-3) (2 3e-3))")
+        self.assertTrue(table.shape == (3, 2))
+        self.assertTrue(table[2, 1] == 3e-3)
+        # ragged and non-numeric lists are kept as strings
+        self.assertTrue(foamIO.infer_datatype("((0 1) (2))") == "((0 1) (2))")
+        self.assertTrue(foamIO.infer_datatype("(liner)") == "(liner)")
+        self.assertTrue(foamIO.infer_datatype("-2") == -2)
+        self.assertTrue(foamIO.infer_datatype("1e-3") == 1e-3)
+        self.assertTrue(foamIO.infer_datatype("off") is False)
+
+    def test_read_lazy(self):
+        lazy_dict = foamIO.read_dict(foam_dict, python_types=True, lazy=True)
+        self.assertTrue(lazy_dict["solvers/p/solver"] == "PCG")
+        self.assertTrue(lazy_dict["PISO"]["nCorrectors"] == 2)
+        self.assertTrue("solvers/p" in lazy_dict)
+        self.assertFalse("solvers/U" in lazy_dict)
+        self.assertTrue(set(foamIO.flatten_dictionary(lazy_dict)) ==
+                        set(foamIO.flatten_dictionary(foamIO.read_dict(foam_dict))))
+
+        # macros and includes fall back to the full parser
+        lazy_dict = foamIO.read_dict(macro_dict, lazy=True)
+        self.assertTrue(lazy_dict.to_dict() == foamIO.read_dict(macro_dict))
+
+    def test_read_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dict_file = Path(tmp_dir, "fvSolution")
+            shutil.copy(str(foam_dict), str(dict_file))
+            foamIO.configure_cache(cache_dir=Path(tmp_dir, "cache"))
+            try:
+                foamIO.clear_cache()
+                setup_dict = foamIO.read_dict(dict_file, python_types=True)
+                setup_dict["PISO"]["nCorrectors"] = 3
+                setup_dict = foamIO.read_dict(dict_file, python_types=True)
+                self.assertTrue(setup_dict["PISO"]["nCorrectors"] == 2)
+                self.assertTrue(foamIO.cache_info()["hits"] == 1)
+                self.assertTrue(foamIO.cache_info()["misses"] == 1)
+
+                # in-memory entry dropped: served from the on-disk store
+                foamIO.clear_cache()
+                setup_dict = foamIO.read_dict(dict_file, python_types=True)
+                self.assertTrue(foamIO.cache_info()["disk_hits"] == 1)
+
+                # modified file invalidates the entry
+                with open(str(dict_file), 'a') as f:
+                    f.write("\nadded 1;\n")
+                setup_dict = foamIO.read_dict(dict_file, python_types=True)
+                self.assertTrue(setup_dict["added"] == 1)
+                self.assertTrue(foamIO.cache_info()["misses"] == 1)
+            finally:
+                foamIO.configure_cache(cache_dir=False)
+                foamIO.clear_cache()
+
+    def test_editor(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dict_file = Path(tmp_dir, "fvSolution")
+            shutil.copy(str(foam_dict), str(dict_file))
+            with foamIO.FoamDictEditor(dict_file) as editor:
+                editor.set("PISO/nCorrectors", 3)
+                editor.set("solvers/p/tolerance", 1e-6)
+                editor.add("solvers/U/solver", "smoothSolver")
+                editor.remove("variable")
+                editor.apply({"vector": [0, 0, 1]})
+
+            setup_dict = foamIO.read_dict(dict_file, python_types=True, cache=False)
+            self.assertTrue(setup_dict["PISO"]["nCorrectors"] == 3)
+            self.assertTrue(setup_dict["solvers"]["p"]["solver"] == "PCG")
+            self.assertTrue(setup_dict["solvers"]["p"]["tolerance"] == 1e-6)
+            self.assertTrue(setup_dict["solvers"]["U"]["solver"] == "smoothSolver")
+            self.assertTrue((setup_dict["vector"] == [0, 0, 1]).all())
+            self.assertFalse("variable" in setup_dict)
+            with open(str(dict_file), 'r') as f:
+                self.assertTrue("// * * * *" in f.read())
+            # new top-level entries precede the trailing directives and the footer
+            functions_file = Path(tmp_dir, "functions")
+            with open(str(functions_file), 'w') as f:
+                f.write("FoamFile\n{\n    format ascii;\n}\n// * * * //\n\n"
+                        "#includeFunc cellMax(p)\n\n// ***** //\n")
+            with foamIO.FoamDictEditor(functions_file) as editor:
+                editor.set("maxCo/type", "cellMax")
+            with open(str(functions_file), 'r') as f:
+                text = f.read()
+            self.assertTrue(text.index("// * * *") < text.index("maxCo") <
+                            text.index("#includeFunc"))
+            self.assertTrue(text.endswith("// ***** //\n"))
+
+    def test_write_table(self):
+        data = np.column_stack((np.linspace(0, 1, 5), np.arange(5)))
+        table = foamIO.format_table(data, row_format='(%.2f %g)')
+        self.assertTrue(table.splitlines()[1] == "(0.25 1)")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output = foamIO.write_table(Path(tmp_dir, "table"), data,
+                                        header="values table\n(\n", footer=");\n")
+            setup_dict = foamIO.read_dict(output, python_types=True, cache=False)
+            self.assertTrue(setup_dict["values"].shape == (5, 2))
+            output_gz = foamIO.write_table(Path(tmp_dir, "table"), data,
+                                           header="values table\n(\n", footer=");\n",
+                                           compress=True)
+            self.assertTrue(output_gz.endswith(".gz"))
+            with gzip.open(output_gz, 'rt') as f_gz, open(output, 'r') as f:
+                self.assertTrue(f_gz.read() == f.read())
+
+
+class TestFoamFields(unittest.TestCase):
+
+    def test_read_ascii(self):
+        field = fields.read_field(field_file)
+        self.assertTrue(field.name == "U")
+        self.assertTrue(field.internal_field.shape == (4, 3))
+        self.assertTrue(field.internal_field[2, 0] == 1.5e-3)
+        self.assertTrue(field.boundary_field["inlet"]["value"].shape == (2, 3))
+        self.assertTrue((field.boundary_field["piston"]["value"] == 0).all())
+        self.assertTrue(field.boundary_field["liner"]["type"] == "noSlip")
+        self.assertTrue(field.dimensions[2] == -1)
+
+    def test_parse_ascii_list(self):
+        # large lists with NaN values and several items per line
+        values = np.arange(30000, dtype=float)
+        values[[5, 20000]] = np.nan
+        data = b"\n".join(b"%r %r %r" % tuple(row) for row in values.reshape(-1, 3).tolist())
+        data = data.replace(b"\n", b" ", 1)
+        parsed = fields.parse_ascii_list(data, len(values))
+        np.testing.assert_array_equal(parsed, values)
+        vectors = b"\n".join(b"(%r %r %r)" % tuple(row) for row in values.reshape(-1, 3).tolist())
+        parsed = fields.parse_ascii_list(vectors, len(values) // 3, 3)
+        np.testing.assert_array_equal(parsed, values.reshape(-1, 3))
+        with self.assertRaises(ValueError):
+            fields.parse_ascii_list(data, len(values) + 1)
+
+    def test_read_binary(self):
+        values = np.arange(12, dtype='<f8').reshape(4, 3)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            binary_file = Path(tmp_dir, "U")
+            with open(str(binary_file), 'wb') as f:
+                f.write(b'FoamFile\n{\n    format binary;\n    arch "LSB;label=32;scalar=64";\n'
+                        b'    class volVectorField;\n    object U;\n}\n'
+                        b'dimensions [0 1 -1 0 0 0 0];\n'
+                        b'internalField nonuniform List<vector> 4(')
+                f.write(values.tobytes())
+                f.write(b');\nboundaryField\n{\n    liner { type noSlip; }\n}\n')
+            field = fields.read_field(binary_file)
+            self.assertTrue((field.internal_field == values).all())
+            self.assertTrue(field.boundary_field["liner"]["type"] == "noSlip")
+            del field
+
+
+class TestPolyMesh(unittest.TestCase):
+
+    def test_read_ascii(self):
+        mesh = polymesh.read_polymesh(cube_mesh)
+        self.assertTrue(mesh.n_cells == 1)
+        self.assertTrue(mesh.n_faces == 6)
+        self.assertTrue(mesh.points.shape == (8, 3))
+        offsets, labels = mesh.faces
+        self.assertTrue((offsets == np.arange(0, 25, 4)).all())
+        self.assertTrue(list(labels[4:8]) == [4, 5, 6, 7])
+        self.assertTrue(len(mesh.neighbour) == 0)
+        self.assertTrue(mesh.boundary["top"]["startFace"] == 4)
+
+    def test_read_binary(self):
+        ascii_mesh = polymesh.read_polymesh(cube_mesh)
+        offsets, labels = ascii_mesh.faces
+        header = ('FoamFile\n{{\n    format binary;\n    arch "LSB;label=32;scalar=64";\n'
+                  '    class {};\n    note "nPoints:8 nCells:1 nFaces:6 nInternalFaces:0";\n'
+                  '    object {};\n}}\n')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mesh_dir = Path(tmp_dir, "meshToMesh_360", "polyMesh")
+            shutil.copytree(str(cube_mesh / "polyMesh"), str(mesh_dir))
+            lists = {
+                "points": ("vectorField", [ascii_mesh.points.astype('<f8')]),
+                "faces": ("faceCompactList", [offsets.astype('<i4'), labels.astype('<i4')]),
+                "owner": ("labelList", [ascii_mesh.owner.astype('<i4')]),
+            }
+            for name, (field_class, arrays) in lists.items():
+                with open(str(mesh_dir / name), 'wb') as f:
+                    f.write(header.format(field_class, name).encode())
+                    for array in arrays:
+                        f.write(b'%d(' % len(array) + array.tobytes() + b')\n')
+
+            mesh = polymesh.read_polymesh(mesh_dir.parent)
+            self.assertTrue(isinstance(mesh.points, np.memmap))
+            self.assertTrue((mesh.points == ascii_mesh.points).all())
+            self.assertTrue((mesh.faces[1] == labels).all())
+            self.assertTrue((mesh.owner == 0).all())
+            info = polymesh.mesh_info(tmp_dir)
+            self.assertTrue(info.loc[360, "nCells"] == 1)
+            # GridPro mesh library layout constant/meshes/<CAD>/polyMesh
+            shutil.copytree(str(mesh_dir), str(Path(tmp_dir, "meshes", "420", "polyMesh")))
+            info = polymesh.mesh_info(tmp_dir)
+            self.assertTrue(list(info.index) == [360, 420])
+            info = polymesh.mesh_info(Path(tmp_dir, "meshes"), pattern='*')
+            self.assertTrue(info.loc[420, "nFaces"] == 6)
+
 
 if __name__ == '__main__':
     unittest.main()